@@ -0,0 +1,110 @@
+"""
+    @author: caitao
+    @feature:
+        * 黄金台信号回测：一次读取信号涉及区间的全市场收盘价，按交易日偏移同时计算多个持有期收益
+        * 买入：信号日次一交易日收盘价；卖出：买入后第N个交易日收盘价
+        * 汇总各持有期的样本数、胜率、平均/中位收益
+"""
+import datetime
+
+import numpy as np
+import pandas as pd
+
+import golden
+from storage import int_to_date
+
+
+def _signal_frame(signals):
+    """
+    :param signals: list of dict('ticker', 'signal')，或含ticker、signal列的pd.DataFrame
+    """
+    frame = pd.DataFrame(signals, columns=['ticker', 'signal']) if not isinstance(signals, pd.DataFrame) \
+        else signals[['ticker', 'signal']].copy()
+    frame['signal_int'] = pd.to_datetime(frame['signal']).dt.strftime('%Y%m%d').astype(np.int64)
+    return frame
+
+
+def forward_returns(signals, windows=(1, 3, 5, 10, 20), store=None, dedup=True):
+    """
+    计算每个信号在各持有期的收益率
+    :param signals: list of dict('ticker', 'signal')，trigger_v2 / goldenFilterThreads的输出
+    :param windows: 持有交易日数
+    :param store: 行情存储，默认golden.store
+    :param dedup: 是否去除相同(ticker, signal)的重复信号
+    :return: pd.DataFrame(columns=['ticker', 'signal', 'entry_date', 'entry_price', 'ret_1', 'ret_3', ...])
+    """
+    store = golden.store if store is None else store
+    windows = sorted(int(w) for w in windows)
+    frame = _signal_frame(signals)
+    if dedup:
+        frame = frame.drop_duplicates(['ticker', 'signal_int'])
+    frame = frame.reset_index(drop=True)
+    _columns = ['ticker', 'signal', 'entry_date', 'entry_price'] + [f"ret_{w}" for w in windows]
+    if frame.empty:
+        return pd.DataFrame(columns=_columns)
+
+    # 一次读取：最早信号日至最晚信号日后留足交易日的收盘价
+    _first = int_to_date([frame['signal_int'].min()])[0]
+    _last = int_to_date([frame['signal_int'].max()])[0] + datetime.timedelta(days=windows[-1] * 2 + 30)
+    price = store.load_arrays(_first, _last, columns=['ticker', 'tradeDate', 'close'])
+    keep = np.isin(price['ticker'], frame['ticker'].unique())
+    ticker, date, close = price['ticker'][keep], price['tradeDate'][keep].astype(np.int64), price['close'][keep]
+    if ticker.size == 0:
+        frame['entry_date'] = None
+        frame['entry_price'] = np.nan
+        for w in windows:
+            frame[f"ret_{w}"] = np.nan
+        return frame[_columns]
+
+    # 股票编码 * 1e8 + 交易日组成有序键，二分定位信号日所在行
+    codes, uniques = pd.factorize(ticker, sort=True)
+    _bounds = np.flatnonzero(np.diff(codes)) + 1
+    _ends = np.r_[_bounds, codes.shape[0]]
+    seg_end = np.repeat(_ends, np.diff(np.r_[0, _ends]))
+    keys = codes.astype(np.int64) * 100000000 + date
+
+    sig_code = pd.Index(uniques).get_indexer(frame['ticker'])
+    sig_key = sig_code.astype(np.int64) * 100000000 + frame['signal_int'].to_numpy()
+    pos = np.searchsorted(keys, sig_key, side='right') - 1
+    found = (sig_code >= 0) & (pos >= 0)
+    found &= np.where(found, codes[np.clip(pos, 0, None)] == sig_code, False)
+
+    # 买入：信号日（或其前最近交易日）的次一交易日
+    entry = pos + 1
+    _end = np.where(found, seg_end[np.clip(pos, 0, None)], 0)
+    valid_entry = found & (entry < _end)
+    frame['entry_date'] = None
+    frame['entry_price'] = np.nan
+    frame.loc[valid_entry, 'entry_date'] = int_to_date(date[entry[valid_entry]])
+    frame.loc[valid_entry, 'entry_price'] = close[entry[valid_entry]]
+
+    for w in windows:
+        _exit = entry + w
+        ok = valid_entry & (_exit < _end)
+        ret = np.full(frame.shape[0], np.nan)
+        ret[ok] = close[_exit[ok]] / close[entry[ok]] - 1
+        frame[f"ret_{w}"] = ret
+    return frame[_columns]
+
+
+def golden_backtest(signals, windows=(1, 3, 5, 10, 20), store=None, dedup=True):
+    """
+    信号回测汇总
+    :return: detail: forward_returns明细, stats: pd.DataFrame(index=window, columns=['count', 'hit_rate', 'mean', 'median', 'std'])
+    """
+    detail = forward_returns(signals, windows, store, dedup)
+    stats = []
+    for w in sorted(int(w) for w in windows):
+        ret = detail[f"ret_{w}"].dropna() if not detail.empty else pd.Series(dtype=float)
+        stats.append({
+            'window': w, 'count': int(ret.shape[0]),
+            'hit_rate': float((ret > 0).mean()) if ret.shape[0] > 0 else np.nan,
+            'mean': ret.mean(), 'median': ret.median(), 'std': ret.std()
+        })
+    return detail, pd.DataFrame(stats).set_index('window')
+
+
+if __name__ == '__main__':
+    _signals = golden.goldenFilterThreads(datetime.date(2024, 1, 1), datetime.date(2024, 12, 31), bulk=True)
+    _detail, _stats = golden_backtest(_signals)
+    print(_stats)
@@ -0,0 +1,169 @@
+"""
+    @author: caitao
+    @feature:
+        * 检测器基准：按多个规模生成合成行情库，分别计时golden_filter、goldenPlatform._kCharacterization、
+          trigger_v2、amplitude_convergence及scanner全市场扫描
+        * 输出吞吐（股票/s、K线/s）、耗时与峰值内存（tracemalloc，单独一轮运行，不计入耗时）
+        * 以植入的黄金台核对识别结果：召回率，以及非植入位置的信号数
+        * trigger_v2、amplitude_convergence另以MarketPanel为输入计时（面板构建耗时单独一行）
+        * 运行：python -m benchmarks.detectors --scales 200x250,1000x500 --sample 200
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import golden
+import scanner
+from benchmarks.synthetic import generate
+from coreScreener import goldenPlatform
+from database import create_engine
+from panel import MarketPanel
+from storage import SQLiteStore, int_to_str
+
+# akshare stock_zh_a_hist列顺序，_kCharacterization按位置取开盘、收盘、振幅
+HIST_COLUMNS = ['tradeDate', 'ticker', 'open', 'close', 'high', 'low', 'volumn', 'amount', 'amplitude',
+                'perf_percent', 'perf_amount', 'turnover']
+
+
+def measure(func):
+    """
+    :return: (func的返回值, 耗时秒, 峰值内存MiB)
+    """
+    _t = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - _t
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def _recall(found, expected):
+    """
+    :param found: 识别出的(ticker, 日期)集合
+    :param expected: 植入的(ticker, 日期)集合
+    :return: (召回率, 非植入位置的信号数)
+    """
+    return len(found & expected) / max(len(expected), 1), len(found - expected)
+
+
+def run_scale(path, tickers, days, sample=200, seed=0):
+    """
+    单个规模的全部基准
+    :return: list of dict，每个检测器一行
+    """
+    planted = generate(path, tickers, days, seed=seed)
+    store = SQLiteStore(create_engine(path, readonly=True))
+    golden.use_store(store)
+    market = store.load_market('1990-01-01', '2100-12-31')
+    dates = int_to_str(np.unique(market['tradeDate'].to_numpy()))
+    start, end = dates[0], dates[-1]
+    _pos = {d: n for n, d in enumerate(dates)}
+    trigger = set(zip(planted['ticker'], planted['trigger_date']))
+    # 黄金台最早在第start_window=5根K线触发，trigger_v2对其后各窗口尺寸（至第10根K线）同样输出信号
+    signal = {(t, dates[_pos[d] + 4]) for t, d in trigger}
+    window_end = {(t, dates[_pos[d] + k]) for t, d in trigger for k in range(4, 10)}
+    rows = []
+
+    def _row(name, units, bars, elapsed, peak, recall=np.nan, spurious=np.nan):
+        rows.append({'scale': f"{tickers}x{days}", 'detector': name, 'units': units, 'bars': bars,
+                     'seconds': round(elapsed, 4), 'units/s': round(units / elapsed, 1),
+                     'bars/s': round(bars / elapsed), 'peak_MiB': round(peak, 2),
+                     'recall': recall, 'spurious': spurious})
+
+    # 植入窗口：涨停日起10根K线
+    market = market.reset_index(drop=True)
+    _row_of = pd.Series(market.index, index=pd.MultiIndex.from_arrays([market['ticker'], market['tradeDate']]))
+    _trigger = pd.to_datetime(planted['trigger_date']).dt.strftime('%Y%m%d').astype(int)
+    _first = _row_of.loc[list(zip(planted['ticker'], _trigger))]
+    windows = [market.iloc[s:s + 10].reset_index(drop=True) for s in _first.to_numpy()]
+
+    result, elapsed, peak = measure(lambda: [golden.golden_filter(w.copy(), 10) for w in windows])
+    _row('golden_filter', len(windows), len(windows) * 10, elapsed, peak, sum(result) / max(len(result), 1))
+
+    _platform = object.__new__(goldenPlatform)
+    _platform.amplitude, _platform.boxrange = 20, 0.1
+    hist = [w[HIST_COLUMNS] for w in windows]
+    result, elapsed, peak = measure(lambda: [_platform._kCharacterization(h) for h in hist])
+    _row('goldenPlatform._kCharacterization', len(hist), len(hist) * 10, elapsed, peak,
+         sum(result) / max(len(result), 1))
+
+    # 逐只股票的检测器：抽样sample只
+    codes = sorted(market['ticker'].unique())
+    codes = [codes[n] for n in np.linspace(0, len(codes) - 1, min(sample, len(codes))).astype(int)]
+    _sampled = set(codes)
+    _bars = int(market['ticker'].isin(codes).sum())
+
+    result, elapsed, peak = measure(lambda: [s for c in codes for s in golden.trigger_v2(c, start, end)])
+    found = {(s['ticker'], s['signal'].strftime('%Y-%m-%d')) for s in result}
+    _row('trigger_v2', len(codes), _bars, elapsed, peak,
+         _recall(found, {(t, d) for t, d in signal if t in _sampled})[0], len(found - window_end))
+
+    result, elapsed, peak = measure(lambda: [golden.amplitude_convergence(c, start, end) for c in codes])
+    records = golden.convergence_records([r for r in result if len(r) > 0])
+    found = set(zip(records['ticker'], records['trigger_date']))
+    _row('amplitude_convergence', len(codes), _bars, elapsed, peak,
+         *_recall(found, {(t, d) for t, d in trigger if t in _sampled}))
+
+    # 同一批股票改由MarketPanel取数
+    panel, elapsed, peak = measure(lambda: MarketPanel.from_store(store, start, end))
+    _row('MarketPanel.from_store', tickers, market.shape[0], elapsed, peak)
+    result, elapsed, peak = measure(lambda: [s for c in codes for s in golden.trigger_v2(c, start, end, panel=panel)])
+    found = {(s['ticker'], s['signal'].strftime('%Y-%m-%d')) for s in result}
+    _row('trigger_v2(panel)', len(codes), _bars, elapsed, peak,
+         _recall(found, {(t, d) for t, d in signal if t in _sampled})[0], len(found - window_end))
+    result, elapsed, peak = measure(lambda: [golden.amplitude_convergence(c, start, end, panel=panel) for c in codes])
+    records = golden.convergence_records([r for r in result if len(r) > 0])
+    _row('amplitude_convergence(panel)', len(codes), _bars, elapsed, peak,
+         *_recall(set(zip(records['ticker'], records['trigger_date'])), {(t, d) for t, d in trigger if t in _sampled}))
+
+    # 全市场单次扫描：读取 + 全部检测器；全量读取 / 经涨停事件表只读取候选窗口
+    for events in (False, True):
+        result, elapsed, peak = measure(lambda: scanner.scan(start, end, store=store, events=events))
+        _row('scanner.scan(events)' if events else 'scanner.scan', tickers, market.shape[0], elapsed, peak)
+        for name in scanner.DETECTORS:
+            _found = result[result['pattern'] == name]
+            rows[-1][f'recall_{name}'], rows[-1][f'spurious_{name}'] = \
+                _recall(set(zip(_found['ticker'], _found['trigger_date'])), trigger)
+
+    store.engine.dispose()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scales', default='200x250,1000x500', help='股票数x交易日数，逗号分隔')
+    parser.add_argument('--sample', type=int, default=200, help='逐只股票检测器的抽样股票数')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--keep', default=None, help='保留合成行情库的目录')
+    parser.add_argument('--output', default=None, help='结果csv文件')
+    args = parser.parse_args()
+
+    _dir = args.keep if args.keep is not None else tempfile.mkdtemp()
+    os.makedirs(_dir, exist_ok=True)
+    rows = []
+    try:
+        for scale in args.scales.split(','):
+            tickers, days = (int(x) for x in scale.lower().split('x'))
+            rows += run_scale(os.path.join(_dir, f"synthetic_{tickers}x{days}.db"), tickers, days, args.sample,
+                              args.seed)
+    finally:
+        if args.keep is None:
+            shutil.rmtree(_dir, ignore_errors=True)
+
+    report = pd.DataFrame(rows)
+    with pd.option_context('display.max_columns', None, 'display.width', 200):
+        print(report.to_string(index=False))
+    if args.output is not None:
+        report.to_csv(args.output, index=False)
+
+
+if __name__ == '__main__':
+    main()
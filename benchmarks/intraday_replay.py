@@ -0,0 +1,112 @@
+"""
+    @author: caitao
+    @feature:
+        * 盘中识别回放核对：合成行情库作为后复权历史，按各股票的换算倍数（1、2、5，即复权因子1、1/2、1/5）生成交易日D的不复权快照并录制为csv，
+          经RecordedSource回放，IntradayScreener识别结果须与全量行情上scanner.scan信号日为D的结果一致，不一致时退出码为1
+        * 对照：快照不经换算直接并入（昨收取历史最后收盘价），统计与全量结果的差异
+        * 运行：python -m benchmarks.intraday_replay --tickers 200 --days 160
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import scanner
+from benchmarks.synthetic import generate
+from database import create_engine
+from intraday import IntradayScreener, RecordedSource
+from storage import SQLiteStore
+
+# 黄金台只判断箱体（tao=0不以收敛补充），极致收敛收紧阈值：合成横盘的上下影距离很小，默认参数下未换算的快照同样命中
+PATTERNS = {'golden': {'tao': 0.0}, 'convergence': {'tao': 0.2}}
+# 不复权快照价格 = 后复权价格 * 倍数
+SCALES = (1, 2, 5)
+
+
+def make_snapshot(market, trade_date, scales):
+    """
+    :param market: 全量行情（load_market的输出）
+    :param scales: dict(ticker -> 倍数)
+    :return: stock_zh_a_spot_em格式的快照，价格为交易日trade_date的行情乘以倍数并保留两位小数
+    """
+    market = market.sort_values(['ticker', 'tradeDate'])
+    market['pre_close'] = market.groupby('ticker')['close'].shift(1)
+    bar = market[market['tradeDate'] == trade_date].dropna(subset=['pre_close'])
+    k = bar['ticker'].map(scales).to_numpy(dtype=np.float64)
+    return pd.DataFrame({
+        '代码': bar['ticker'].to_numpy(), '今开': np.round(bar['open'] * k, 2), '最新价': np.round(bar['close'] * k, 2),
+        '最高': np.round(bar['high'] * k, 2), '最低': np.round(bar['low'] * k, 2), '昨收': np.round(bar['pre_close'] * k, 2),
+        '涨跌额': np.round(bar['perf_amount'] * k, 2), '涨跌幅': bar['perf_percent'].to_numpy(),
+        '振幅': bar['amplitude'].to_numpy(), '成交量': bar['volumn'].to_numpy(), '成交额': bar['amount'].to_numpy(),
+        '换手率': bar['turnover'].to_numpy(),
+    })
+
+
+def _keys(frame):
+    return set(zip(frame['pattern'], frame['ticker'], frame['trigger_date'].astype(str), frame['signal'].astype(str)))
+
+
+def run(path, tickers, days, seed=0):
+    generate(path, tickers, days, plant_rate=0.01, seed=seed)
+    store = SQLiteStore(create_engine(path, readonly=True))
+    market = store.load_market('1990-01-01', '2100-12-31')
+    market['tradeDate'] = pd.to_datetime(market['tradeDate'].astype(str)).dt.strftime('%Y-%m-%d')
+    dates = sorted(market['tradeDate'].unique())
+    # 回放日取历史不少于30根K线且信号最多的交易日
+    _signals = scanner.scan(dates[0], dates[-1], PATTERNS, store=store)['signal'].astype(str)
+    trade_date = _signals[_signals >= dates[30]].value_counts().index[0]
+    # 快照为当日最后一根K线：参照为截至回放日的全量扫描
+    expected = scanner.scan(dates[0], trade_date, PATTERNS, store=store)
+    expected = expected[expected['signal'].astype(str) == trade_date]
+    codes = sorted(market['ticker'].unique())
+    scales = {t: SCALES[n % len(SCALES)] for n, t in enumerate(codes)}
+
+    snapshot = make_snapshot(market, trade_date, scales)
+    _dir = os.path.join(os.path.dirname(path), 'spot')
+    os.makedirs(_dir, exist_ok=True)
+    snapshot.to_csv(os.path.join(_dir, 'spot_replay.csv'), index=False)
+    screener = IntradayScreener(trade_date, PATTERNS, source=RecordedSource(_dir), store=store)
+    found = screener.poll(interval=0, callback=lambda result, elapsed: None)
+    # 对照：昨收取历史最后收盘价，即快照价格不经换算并入
+    _last = market[market['tradeDate'] < trade_date].groupby('ticker')['close'].last()
+    raw = snapshot.assign(昨收=_last.reindex(snapshot['代码']).to_numpy())
+    unscaled = IntradayScreener(trade_date, PATTERNS, store=store).evaluate(raw)
+
+    rows = []
+    for name, frame in (('rescaled', found), ('unscaled', unscaled)):
+        _found, _expected = _keys(frame), _keys(expected)
+        _scaled = {k for k in _expected if scales[k[1]] != 1}
+        rows.append({'merge': name, 'trade_date': trade_date, 'expected': len(_expected),
+                     'expected(倍数≠1)': len(_scaled), 'found': len(_found), 'matched(倍数≠1)': len(_found & _scaled),
+                     'missing': len(_expected - _found), 'spurious': len(_found - _expected)})
+    report = pd.DataFrame(rows)
+    _ok = report.iloc[0]
+    passed = _ok['missing'] == 0 and _ok['spurious'] == 0 and _ok['matched(倍数≠1)'] > 0
+    return report, passed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tickers', type=int, default=200)
+    parser.add_argument('--days', type=int, default=160)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    _dir = tempfile.mkdtemp()
+    try:
+        report, passed = run(os.path.join(_dir, 'synthetic.db'), args.tickers, args.days, args.seed)
+    finally:
+        shutil.rmtree(_dir, ignore_errors=True)
+    with pd.option_context('display.max_columns', None, 'display.width', 200):
+        print(report.to_string(index=False))
+    if not passed:
+        print("盘中识别与全量行情结果不一致")
+        sys.exit(1)
+    print("盘中识别与全量行情结果一致")
+
+
+if __name__ == '__main__':
+    main()
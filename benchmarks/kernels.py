@@ -0,0 +1,128 @@
+"""
+    @author: caitao
+    @feature:
+        * kernels数组内核的基准：合成行情上的全部涨停窗口，原逐窗口实现（列表、all、zip）作为耗时参照
+        * 基准：原实现逐窗口耗时、各可用后端（numba、numpy、python）内核批量判断耗时、golden_filter单窗口调用耗时
+        * 一致性由测试保证：python -m pytest tests/test_kernels_parity.py
+        * 运行：python -m benchmarks.kernels --tickers 300 --days 500
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import golden
+import kernels
+from benchmarks.synthetic import _ticker_bars, make_codes
+
+
+def _legacy_golden_filter(price, start_window, amplitude=15.00, boxrange_bottom=-0.01, boxrange_upper=0.8, v=0.6):
+    """
+    内核化之前的golden_filter，作为基准的耗时参照
+    """
+    if price.shape[0] < start_window:
+        return False
+    amplitude_list = price['amplitude'].to_list()[1:]
+    price['vollage'] = abs(price['open'] - price['close'])
+    if all(_ <= amplitude for _ in amplitude_list):
+        _close1 = price['close'].iloc[0]
+        _open1 = price['open'].iloc[0]
+        _v1 = price['vollage'].iloc[0]
+        a = price['open'].to_list()[1:] + price['close'].to_list()[1:]
+        bottom = _v1 * boxrange_bottom + _open1
+        upper = _v1 * boxrange_upper + _close1
+        b = price['vollage'].to_list()[1:]
+        return (max(a) <= upper) and (min(a) >= bottom) and (max(b) <= _v1 * v) and (_close1 > _open1)
+    return False
+
+
+def _legacy_convergence(high, low, tao=0.5):
+    """
+    内核化之前amplitude_convergence的单窗口收敛判断
+    """
+    _distance = [a - b for a, b in zip(high.tolist()[1:], low.tolist()[1:])]
+    return np.mean(_distance) < tao
+
+
+def make_windows(tickers, days, seed=0, windows=(6, 8, 10)):
+    """
+    :return: 合成行情数组 dict，及全部涨停日起各尺寸窗口的(starts, lengths)
+    """
+    rng = np.random.default_rng(seed)
+    bars, starts, lengths = [], [], []
+    offset = 0
+    for code in make_codes(tickers, seed=seed):
+        _bars, plants = _ticker_bars(rng, code, days, 0.004)
+        bars.append(_bars)
+        # 植入的黄金台及随机选取的同等数量起始日，覆盖命中与未命中
+        _starts = np.r_[plants, rng.integers(0, days, len(plants) + 1)]
+        for w in windows:
+            starts.append(offset + _starts)
+            lengths.append(np.minimum(w, days - _starts))
+        offset += days
+    arrays = {c: np.concatenate([b[c] for b in bars]) for c in ['open', 'close', 'high', 'low', 'amplitude']}
+    return arrays, np.concatenate(starts).astype(np.int64), np.concatenate(lengths).astype(np.int64)
+
+
+def _timed(func, repeat=1):
+    _t = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - _t) / repeat
+
+
+def run(tickers, days, seed=0, tao=0.5):
+    arrays, starts, lengths = make_windows(tickers, days, seed)
+    _o, _c, _h, _l, _a = (arrays[c] for c in ['open', 'close', 'high', 'low', 'amplitude'])
+    frames = [pd.DataFrame({c: v[s:s + n] for c, v in arrays.items()}) for s, n in zip(starts, lengths)]
+    rows = []
+
+    signals, elapsed = _timed(lambda: int(sum(_legacy_golden_filter(f.copy(), 2) for f in frames)))
+    rows.append({'kernel': 'golden', 'backend': 'legacy', 'windows': starts.size, 'seconds': elapsed,
+                 'signals': signals})
+    signals, elapsed = _timed(lambda: int(sum(_legacy_convergence(_h[s:s + n], _l[s:s + n], tao)
+                                              for s, n in zip(starts, lengths))))
+    rows.append({'kernel': 'convergence', 'backend': 'legacy', 'windows': starts.size, 'seconds': elapsed,
+                 'signals': signals})
+
+    for backend in kernels.BACKENDS:
+        if backend == 'numba' and kernels.numba is None:
+            continue
+        kernels.use_backend(backend)
+        # numba首次调用触发编译，不计入耗时
+        kernels.golden_mask(_o, _h, _l, _c, _a, starts[:1], lengths[:1])
+        kernels.convergence_mask(_o, _h, _l, _c, starts[:1], lengths[:1], tao)
+        _repeat = 1 if backend == 'python' else 20
+        mask, elapsed = _timed(lambda: kernels.golden_mask(_o, _h, _l, _c, _a, starts, lengths), _repeat)
+        rows.append({'kernel': 'golden', 'backend': backend, 'windows': starts.size, 'seconds': elapsed,
+                     'signals': int(mask.sum())})
+        mask, elapsed = _timed(lambda: kernels.convergence_mask(_o, _h, _l, _c, starts, lengths, tao), _repeat)
+        rows.append({'kernel': 'convergence', 'backend': backend, 'windows': starts.size, 'seconds': elapsed,
+                     'signals': int(mask.sum())})
+        signals, elapsed = _timed(lambda: int(sum(golden.golden_filter(f, 2) for f in frames)))
+        rows.append({'kernel': 'golden_filter(单窗口)', 'backend': backend, 'windows': starts.size,
+                     'seconds': elapsed, 'signals': signals})
+
+    report = pd.DataFrame(rows)
+    _legacy = report[report['backend'] == 'legacy'].set_index('kernel')['seconds']
+    report['windows/s'] = (report['windows'] / report['seconds']).round(0)
+    _reference = {'golden': 'golden', 'convergence': 'convergence', 'golden_filter(单窗口)': 'golden'}
+    report['speedup'] = (report['kernel'].map(_reference).map(_legacy) / report['seconds']).round(1)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tickers', type=int, default=300)
+    parser.add_argument('--days', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--tao', type=float, default=0.5)
+    args = parser.parse_args()
+    report = run(args.tickers, args.days, args.seed, args.tao)
+    with pd.option_context('display.max_columns', None, 'display.width', 200):
+        print(report.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
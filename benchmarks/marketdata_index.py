@@ -0,0 +1,92 @@
+"""
+    @author: caitao
+    @feature:
+        * 单只股票区间查询耗时对比：marketData_daily建立(ticker, tradeDate)唯一索引前后
+        * 运行：python -m benchmarks.marketdata_index --tickers 5000 --days 750
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import sqlalchemy
+from sqlalchemy.schema import CreateTable
+
+from utilities import Market, migrate_marketdata
+
+QUERY = ("SELECT * FROM marketData_daily WHERE ticker = ? AND ? <= tradeDate AND tradeDate <= ? "
+         "ORDER BY tradeDate")
+
+
+def build_table(path, tickers, days, duplicate=0.01, seed=0):
+    """
+    生成无索引的旧版marketData_daily：tickers只股票 * days个交易日，随机重复duplicate比例的行
+    """
+    rng = np.random.default_rng(seed)
+    engine = sqlalchemy.create_engine(f'sqlite:///{path}')
+    with engine.begin() as conn:
+        conn.execute(CreateTable(Market.__table__))
+    engine.dispose()
+
+    dates = pd.bdate_range('2019-01-02', periods=days).strftime('%Y-%m-%d').to_list()
+    columns = ['tradeDate', 'ticker', 'open', 'close', 'high', 'low', 'amount', 'amplitude', 'perf_percent',
+               'perf_amount', 'createtime', 'updatetime', 'volumn', 'turnover']
+    conn = sqlite3.connect(path)
+    for n in range(tickers):
+        code = f"{n:06d}"
+        close = (10 * np.cumprod(1 + rng.normal(0, 0.02, days))).round(2).tolist()
+        rows = [(d, code, c, c, c, c, 1e6, 2.0, 0.5, 0.05, '', '', 1e4, 1.0) for d, c in zip(dates, close)]
+        rows += [rows[i] for i in np.flatnonzero(rng.random(days) < duplicate)]
+        conn.executemany(f"INSERT INTO marketData_daily ({', '.join(columns)}) "
+                         f"VALUES ({', '.join(['?'] * len(columns))})", rows)
+    conn.commit()
+    conn.close()
+    return dates
+
+
+def time_queries(path, codes, start_date, end_date):
+    """
+    :return: 每次查询耗时（毫秒）
+    """
+    conn = sqlite3.connect(path)
+    cost = []
+    for code in codes:
+        t = time.perf_counter()
+        conn.execute(QUERY, (code, start_date, end_date)).fetchall()
+        cost.append((time.perf_counter() - t) * 1000)
+    conn.close()
+    return np.array(cost)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tickers', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=750)
+    parser.add_argument('--queries', type=int, default=50)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'stockwatcher.db')
+    t = time.perf_counter()
+    dates = build_table(path, args.tickers, args.days)
+    print(f"生成{args.tickers}只股票 * {args.days}个交易日，耗时{time.perf_counter() - t:.1f}s")
+
+    rng = np.random.default_rng(1)
+    codes = [f"{n:06d}" for n in rng.integers(0, args.tickers, args.queries)]
+    start_date, end_date = dates[len(dates) // 3], dates[-1]
+
+    before = time_queries(path, codes, start_date, end_date)
+    t = time.perf_counter()
+    removed = migrate_marketdata(sqlalchemy.create_engine(f'sqlite:///{path}'))
+    print(f"迁移：删除重复行{removed}行，建立索引耗时{time.perf_counter() - t:.1f}s")
+    after = time_queries(path, codes, start_date, end_date)
+
+    for name, cost in (('建索引前', before), ('建索引后', after)):
+        print(f"{name}: 中位数{np.median(cost):.3f}ms, P95 {np.percentile(cost, 95):.3f}ms")
+    print(f"加速比：{np.median(before) / np.median(after):.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+    @author: caitao
+    @feature:
+        * 多线程并发读取吞吐对比：默认配置共享连接 / 默认配置独立连接 / WAL + pragma调优的只读引擎独立连接
+        * 可选后台写线程持续写入行情，对比读写并发时的读取吞吐
+        * 运行：python -m benchmarks.sqlite_concurrency --tickers 2000 --days 750 --threads 8 --seconds 5
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+import sqlalchemy
+from sqlalchemy import text
+
+from benchmarks.marketdata_index import build_table
+from database import create_engine
+from utilities import migrate_marketdata
+
+# 单只股票区间统计：计算在SQLite内完成（执行期间释放GIL），读线程可真正并行
+QUERY = text("SELECT COUNT(*), AVG(close), MAX(high), MIN(low), SUM(amount) FROM marketData_daily "
+             "WHERE ticker = :code AND :start <= tradeDate AND tradeDate <= :end")
+
+def _reader(engine, codes, dates, stop, counts, n, lock=None, shared=None):
+    rng = np.random.default_rng(n)
+    while not stop.is_set():
+        params = {'code': codes[rng.integers(0, len(codes))], 'start': dates[rng.integers(0, len(dates) // 2)],
+                  'end': dates[-1]}
+        if shared is not None:
+            with lock:
+                shared.execute(QUERY, params).fetchall()
+        else:
+            with engine.connect() as conn:
+                conn.execute(QUERY, params).fetchall()
+        counts[n] += 1
+
+
+def _writer(engine, codes, dates, stop, interval=0.005):
+    rng = np.random.default_rng(len(codes))
+    while not stop.is_set():
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE marketData_daily SET turnover = turnover + 0 "
+                              "WHERE ticker = :code AND tradeDate >= :start"),
+                         {'code': codes[rng.integers(0, len(codes))], 'start': dates[-20]})
+        time.sleep(interval)
+
+
+def run(engine, codes, dates, threads, seconds, shared=False, write_engine=None):
+    """
+    :return: 每秒完成的读取查询数
+    """
+    stop = threading.Event()
+    counts = [0] * threads
+    lock = threading.Lock()
+    conn = engine.connect() if shared else None
+    workers = [threading.Thread(target=_reader, args=(engine, codes, dates, stop, counts, n, lock, conn))
+               for n in range(threads)]
+    if write_engine is not None:
+        workers.append(threading.Thread(target=_writer, args=(write_engine, codes, dates, stop)))
+    for w in workers:
+        w.start()
+    time.sleep(seconds)
+    stop.set()
+    for w in workers:
+        w.join()
+    if conn is not None:
+        conn.close()
+    return sum(counts) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tickers', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=750)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    _dir = tempfile.mkdtemp()
+    default_path, tuned_path = os.path.join(_dir, 'default.db'), os.path.join(_dir, 'tuned.db')
+    dates = build_table(default_path, args.tickers, args.days, duplicate=0)
+    migrate_marketdata(sqlalchemy.create_engine(f'sqlite:///{default_path}'))
+    shutil.copy(default_path, tuned_path)
+    codes = [f"{n:06d}" for n in range(args.tickers)]
+
+    default = sqlalchemy.create_engine(f'sqlite:///{default_path}', pool_size=args.threads, max_overflow=args.threads)
+    tuned_write = create_engine(tuned_path, pool_size=2)
+    tuned_read = create_engine(tuned_path, readonly=True, pool_size=args.threads)
+    with tuned_write.connect() as conn:
+        print(f"tuned.db journal_mode = {conn.execute(text('PRAGMA journal_mode')).scalar()}")
+
+    scenarios = [
+        ('默认配置 + 共享连接', default, True, default),
+        ('默认配置 + 独立连接', default, False, default),
+        ('WAL + pragma + 独立连接', tuned_read, False, tuned_write),
+    ]
+    print(f"{args.tickers}只股票 * {args.days}个交易日，{args.threads}个读线程，每项{args.seconds}s")
+    for name, engine, shared, write_engine in scenarios:
+        read_only = run(engine, codes, dates, args.threads, args.seconds, shared)
+        with_writer = run(engine, codes, dates, args.threads, args.seconds, shared, write_engine)
+        print(f"{name}: 只读 {read_only:.0f} 次/s，并发写入时 {with_writer:.0f} 次/s")
+
+
+if __name__ == '__main__':
+    main()
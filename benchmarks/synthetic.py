@@ -0,0 +1,155 @@
+"""
+    @author: caitao
+    @feature:
+        * 合成A股行情：N只股票 * M个交易日，按stockwatcher.db结构写入marketData_daily、security_master
+        * 随机K线涨跌幅限制在涨停区间以下，涨停只出现在植入的形态中：涨停日 + 其后窄幅横盘的黄金台（同时满足极致收敛）
+        * 植入形态记录在synthetic_planted表，供基准测试核对识别结果；写入后重建limitup_events
+        * 运行：python -m benchmarks.synthetic stockwatcher.db --tickers 500 --days 500
+"""
+import argparse
+import datetime
+
+import numpy as np
+import pandas as pd
+import sqlalchemy
+
+from utilities import Base, Market, SecurityMaster, classify_market, classify_quota, rebuild_limitup_events
+
+# 植入形态：涨停日后的横盘K线数量
+PLATFORM_BARS = 9
+
+
+def make_codes(n, radical=0.3, seed=0):
+    """
+    :return: 排序后的股票代码：沪深主板及创业板、科创板，radical为创业板、科创板占比
+    """
+    rng = np.random.default_rng(seed)
+    _radical = rng.random(n) < radical
+    _board = rng.random(n) < 0.5
+    codes = [(f"{300001 + i:06d}" if b else f"{688001 + i:06d}") if r else
+             (f"{600000 + i:06d}" if b else f"{1 + i:06d}") for i, (r, b) in enumerate(zip(_radical, _board))]
+    return sorted(codes)
+
+
+def _ticker_bars(rng, code, days, plant_rate):
+    """
+    单只股票的K线及植入的涨停日位置
+    """
+    limit = 0.2 if classify_quota([code])[0] == 'radical' else 0.1
+    ret = np.clip(rng.normal(0.0003, 0.02, days), -limit + 0.005, limit - 0.005)
+    body = rng.normal(0, 0.008, days)
+    shadow = np.abs(rng.normal(0, 0.01, (2, days)))
+
+    # 植入：涨停日收盘价高于涨停价，随后PLATFORM_BARS根K线窄幅横盘
+    plants = []
+    _gap = PLATFORM_BARS + 12
+    i = 1 + int(rng.integers(0, _gap))
+    while i + PLATFORM_BARS < days:
+        if rng.random() < plant_rate * _gap:
+            plants.append(i)
+            ret[i] = limit + 0.003
+            body[i] = -rng.uniform(0.005, 0.03)
+            ret[i + 1:i + 1 + PLATFORM_BARS] = rng.normal(0, 0.003, PLATFORM_BARS)
+            body[i + 1:i + 1 + PLATFORM_BARS] = rng.normal(0, 0.002, PLATFORM_BARS)
+            shadow[:, i + 1:i + 1 + PLATFORM_BARS] = np.abs(rng.normal(0, 0.001, (2, PLATFORM_BARS)))
+            i += _gap
+        else:
+            i += 1 + int(rng.integers(0, _gap))
+
+    close = np.round(rng.uniform(8, 40) * np.cumprod(1 + ret), 2)
+    prev = np.r_[close[0] / (1 + ret[0]), close[:-1]]
+    _open = np.round(prev * (1 + ret) * (1 + body), 2)
+    # 涨停日开盘价不高于前收盘价的103%
+    _open[plants] = np.round(prev[plants] * (1 + np.minimum(ret[plants] + body[plants], 0.03)), 2)
+    high = np.round(np.maximum(_open, close) * (1 + shadow[0]), 2)
+    low = np.round(np.minimum(_open, close) * (1 - shadow[1]), 2)
+    # 横盘K线上下影距离按绝对值封顶（柱体0.15、影线各0.05），高价股同样满足极致收敛tao=0.5
+    flat = (np.asarray(plants, dtype=np.int64)[:, None] + np.arange(1, PLATFORM_BARS + 1)[None, :]).ravel()
+    _open[flat] = np.clip(_open[flat], close[flat] - 0.15, close[flat] + 0.15)
+    high[flat] = np.minimum(high[flat], np.maximum(_open[flat], close[flat]) + 0.05)
+    low[flat] = np.maximum(low[flat], np.minimum(_open[flat], close[flat]) - 0.05)
+    return {
+        'open': _open, 'close': close, 'high': high, 'low': low,
+        'amplitude': np.round((high - low) / prev * 100, 2),
+        'perf_percent': np.round((close / prev - 1) * 100, 2),
+        'perf_amount': np.round(close - prev, 2),
+        'volumn': np.round(rng.uniform(1e4, 1e6, days)),
+        'turnover': np.round(rng.uniform(0.2, 8, days), 2),
+    }, plants
+
+
+def generate(path, tickers=500, days=500, start_date='2022-01-04', plant_rate=0.004, seed=0):
+    """
+    生成合成行情库，已存在的行情、证券主表、植入记录会被清空
+    :param plant_rate: 每只股票每个交易日植入黄金台的概率
+    :return: 植入形态 pd.DataFrame(columns=['ticker', 'trigger_date', 'bars'])
+    """
+    rng = np.random.default_rng(seed)
+    codes = make_codes(tickers, seed=seed)
+    dates = pd.bdate_range(start_date, periods=days).strftime('%Y-%m-%d').to_list()
+    now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    engine = sqlalchemy.create_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(engine, tables=[Market.__table__, SecurityMaster.__table__])
+    columns = ['tradeDate', 'ticker', 'open', 'close', 'high', 'low', 'amount', 'amplitude', 'perf_percent',
+               'perf_amount', 'volumn', 'turnover', 'createtime', 'updatetime']
+    planted = []
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM marketData_daily")
+        cursor.execute("DELETE FROM security_master")
+        for code in codes:
+            bars, plants = _ticker_bars(rng, code, days, plant_rate)
+            bars['amount'] = np.round(bars['volumn'] * bars['close'] * 100, 2)
+            cursor.executemany(
+                f"INSERT INTO marketData_daily ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})",
+                list(zip(dates, [code] * days, *[bars[c].tolist() for c in columns[2:-2]],
+                         [now] * days, [now] * days))
+            )
+            planted += [(code, dates[i], PLATFORM_BARS + 1) for i in plants]
+        cursor.executemany(
+            "INSERT INTO security_master (code, name, market, quota, list_date, createtime, updatetime) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            list(zip(codes, [f"合成{c}" for c in codes], classify_market(codes).tolist(),
+                     classify_quota(codes).tolist(), [dates[0]] * len(codes), [now] * len(codes),
+                     [now] * len(codes)))
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    planted = pd.DataFrame(planted, columns=['ticker', 'trigger_date', 'bars'])
+    planted.to_sql('synthetic_planted', engine, if_exists='replace', index=False)
+    rebuild_limitup_events(engine)
+    engine.dispose()
+    return planted
+
+
+def load_planted(path):
+    """
+    :return: generate写入的植入形态
+    """
+    engine = sqlalchemy.create_engine(f'sqlite:///{path}')
+    with engine.connect() as conn:
+        planted = pd.read_sql(sqlalchemy.text("SELECT * FROM synthetic_planted"), conn)
+    engine.dispose()
+    return planted
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('path')
+    parser.add_argument('--tickers', type=int, default=500)
+    parser.add_argument('--days', type=int, default=500)
+    parser.add_argument('--start', default='2022-01-04')
+    parser.add_argument('--plant-rate', type=float, default=0.004)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    planted = generate(args.path, args.tickers, args.days, args.start, args.plant_rate, args.seed)
+    print(f"{args.path}: {args.tickers}只股票 * {args.days}个交易日，植入黄金台{planted.shape[0]}个，"
+          f"平均每只股票{planted.shape[0] / max(args.tickers, 1):.2f}个")
+
+
+if __name__ == '__main__':
+    main()
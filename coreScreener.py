@@ -2,23 +2,41 @@
     * @Author: caitao
     * @Date: 2024-10-26
     * @Project: 股票筛选器
+    * @update:
+        * 个股行情经hist_cache读穿缓存：优先读取本地行情库，只请求缺失的尾部交易日，内存TTL + LRU缓存
 
 """
 import datetime
 import math
 
-import akshare as ak
-from utilities import MyThread
+from database import get_engine
+from hist_cache import HistCache
+from storage import SQLiteStore
+from utilities import MyThread, get_universe
+from trade_calendar import get_calendar
 from tqdm import tqdm
 
+engine = get_engine()
+# 各goldenPlatform实例及识别线程共用的行情缓存
+hist_cache = HistCache(SQLiteStore(engine))
+
 
 def get_share():
     """
     获取当前沪深京股票列表
     :return: pd.DataFrame(column=['代码', '名称'])
     """
-    a = ak.stock_zh_a_spot_em()
-    return a[['代码', '名称']]
+    a = get_universe(engine, include_bj=True)
+    return a[['code', 'name']].rename(columns={'code': '代码', 'name': '名称'})
+
+
+def get_stockpool():
+    """
+    沪深股票池（过滤北交所），附涨跌幅标志
+    :return: pd.DataFrame(column=['代码', '名称', 'market', 'qutoa'])
+    """
+    a = get_universe(engine)
+    return a[['code', 'name', 'market', 'quota']].rename(columns={'code': '代码', 'name': '名称', 'quota': 'qutoa'})
 
 
 def get_tradingPeriod(date1, n):
@@ -28,24 +46,27 @@ def get_tradingPeriod(date1, n):
     :param date1: datetime.date
     :return: start_date, end_date
     """
-    tradings = ak.tool_trade_date_hist_sina()
-    if date1 in tradings:
-        end_date = date1
-
-    else:
-        tradings = tradings[tradings['trade_date'] < date1]
-        tradings['delta'] = tradings['trade_date'] - date1
-        end_date = tradings.iloc[
-            tradings[tradings['delta'] == tradings['delta'].max()].index[0], 0
-        ]
-
-    start_date = tradings.iloc[
-        tradings[tradings['trade_date'] == end_date].index[0] - n + 1,
-        0
-    ]
+    calendar = get_calendar()
+    # 截止日取早于date1的最近交易日
+    end_date = calendar.previous(date1)
+    start_date = calendar.shift(end_date, -(n - 1))
     return start_date, end_date
 
 
+def get_limitupPool(date1, floor=9.9):
+    """
+    本地涨停事件表中date1涨幅超过floor的股票，用于跳过首日未涨停股票的行情请求
+    ** 覆盖按股票判断：本地行情有date1当日K线的股票才在covered中；同步中断、取消，或date1停牌的股票仍需请求
+    :param date1: "YYYYmmdd"
+    :return: limitup: 涨停股票代码集合, covered: 本地行情有date1当日K线的股票代码集合；未建立事件表时返回None
+    """
+    store = SQLiteStore(engine)
+    if not store.has_events():
+        return None
+    covered = set(store.load_arrays(date1, date1, columns=['ticker'])['ticker'].tolist())
+    return set(store.load_events(date1, date1, floor=floor)['ticker'].tolist()), covered
+
+
 def stockIncrease_type(code):
     """
     根据股票代码判断涨跌停办要求
@@ -73,10 +94,11 @@ def stock_markert(code):
 
 
 class goldenPlatform:
-    def __init__(self, stockpool, amplitude=20, boxrange=0.1):
+    def __init__(self, stockpool, amplitude=20, boxrange=0.1, cache=None):
         self.amplitude = amplitude
         self.boxrange = boxrange
         self.stockpool = stockpool
+        self.cache = hist_cache if cache is None else cache
 
         today = datetime.date.today()
         start_date, end_date = get_tradingPeriod(today, 10)
@@ -115,9 +137,8 @@ class goldenPlatform:
         :return:
         """
         try:
-            stockprice = ak.stock_zh_a_hist(symbol=code, period='daily', start_date=self.start_date,
-                                            end_date=self.end_date,
-                                            adjust='hfq', timeout=30)  # 后复权、超时设置为30s
+            stockprice = self.cache.get(code, self.start_date, self.end_date,
+                                        adjust='hfq', timeout=30)  # 后复权、超时设置为30s
         except Exception as e:
             print(e)
             return False
@@ -147,9 +168,14 @@ class goldenPlatform:
         :return:
         """
         result = []
+        # 本地行情已覆盖首个交易日的股票，首日未涨停时跳过请求；未覆盖的股票照常请求
+        pool = get_limitupPool(self.start_date)
+        limitup, covered = (set(), set()) if pool is None else pool
         for i in tqdm(range(self.stockpool.shape[0])):
             _temp = self.stockpool.iloc[i, :]['qutoa']
             _code = self.stockpool.iloc[i, 0]
+            if _code in covered and _code not in limitup:
+                continue
             if self._stockFilter(code=_code, increaseType=_temp):
                 result.append(_code)
             else:
@@ -164,12 +190,7 @@ def multi_goldenRegcon(threds=20):
         :return:
         """
     results = []
-    stock = ak.stock_zh_a_spot_em()[['代码', '名称']]
-    # 过滤北交所
-    stock['market'] = stock['代码'].apply(lambda x: stock_markert(x))
-    stock = stock[stock['market'] != 'bj']
-    # 设置涨跌幅标志
-    stock['qutoa'] = stock['代码'].apply(lambda x: stockIncrease_type(x))
+    stock = get_stockpool()
 
     f = locals()
     for i in range(10):
@@ -192,12 +213,7 @@ def multi_goldenRegcon(threds=20):
 
 
 def only_goldenRegcon():
-    stock = ak.stock_zh_a_spot_em()[['代码', '名称']]
-    # 过滤北交所
-    stock['market'] = stock['代码'].apply(lambda x: stock_markert(x))
-    stock = stock[stock['market'] != 'bj']
-    # 设置涨跌幅标志
-    stock['qutoa'] = stock['代码'].apply(lambda x: stockIncrease_type(x))
+    stock = get_stockpool()
 
     test = goldenPlatform(stock)
     return test.golden_recon()
@@ -0,0 +1,100 @@
+"""
+    @author: caitao
+    @feature:
+        * streamlit各页面共用的缓存：引擎、行情存储、交易日历按进程缓存（cache_resource），各次rerun、各会话共用
+        * 最新行情日期、结果版本、识别结果、形态扫描按参数缓存（cache_data），控件交互不再重复查询或计算；同步完成后clear_data()
+        * 后台同步任务按进程保存（jobs()），刷新或切换页面后仍可查看进度、取消
+"""
+import streamlit as st
+from sqlalchemy import text
+
+import scanner
+from database import get_engine
+from storage import SQLiteStore, int_to_date
+from trade_calendar import get_calendar
+from utilities import load_results, migrate_golden_results, migrate_limitup_events, migrate_marketdata
+
+
+@st.cache_resource
+def load_engine():
+    """
+    连接本地数据库：引擎及迁移检查在进程内只执行一次，各次rerun、各会话共用
+    """
+    _engine = get_engine()
+    migrate_marketdata(_engine)
+    migrate_limitup_events(_engine)
+    return _engine
+
+
+@st.cache_resource
+def load_store():
+    return SQLiteStore(load_engine())
+
+
+@st.cache_resource
+def load_calendar():
+    """
+    交易日历：本地缓存文件过期后才重新下载
+    """
+    return get_calendar()
+
+
+@st.cache_resource
+def jobs():
+    """
+    :return: dict，进程内的后台任务，如{'sync': sync_job.SyncJob}
+    """
+    return {}
+
+
+@st.cache_data(ttl=600)
+def latest_date():
+    """
+    :return: datetime.date，行情库最新交易日；无行情时为None
+    """
+    store = load_store()
+    with store.engine.connect() as conn:
+        _last = conn.execute(text(f"SELECT MAX(tradeDate) FROM {store.table}")).scalar()
+    if _last is None:
+        return None
+    return int_to_date([int(str(_last)[:10].replace('-', ''))])[0]
+
+
+@st.cache_data(ttl=600)
+def result_versions():
+    """
+    :return: list，golden_results中已有结果的版本号
+    """
+    engine = load_engine()
+    migrate_golden_results(engine)
+    with engine.connect() as conn:
+        return [r[0] for r in conn.execute(text("SELECT DISTINCT version FROM golden_results ORDER BY version"))]
+
+
+@st.cache_data(ttl=600, show_spinner="查询识别结果...")
+def results(versions, start_date, end_date, tickers=None):
+    """
+    :param versions: tuple，版本号
+    :param tickers: tuple，股票代码，为None时不限
+    """
+    return load_results(load_engine(), list(versions), start_date, end_date,
+                        None if tickers is None else list(tickers))
+
+
+@st.cache_data(max_entries=16, show_spinner="扫描中...")
+def scan(start_date, end_date, patterns, codes=None):
+    """
+    :param patterns: dict(检测器名称 -> 参数dict)
+    :param codes: tuple，股票代码，为None时扫描全市场
+    """
+    return scanner.scan(start_date, end_date, patterns, None if codes is None else list(codes), store=load_store())
+
+
+def clear_data():
+    """
+    行情或结果写入后使缓存数据失效
+    """
+    latest_date.clear()
+    result_versions.clear()
+    results.clear()
+    scan.clear()
@@ -0,0 +1,66 @@
+"""
+    @author: caitao
+    @feature:
+        * SQLite连接层：WAL日志模式，每个新连接设置cache_size、mmap_size、synchronous等pragma
+        * 读引擎设置query_only；线程各自从连接池取得独立连接，进程按pid各自建立引擎
+        * get_engine进程内缓存引擎，streamlit页面经st.cache_resource跨rerun共用
+        * 并发读取对比：python -m benchmarks.sqlite_concurrency
+"""
+import os
+import threading
+
+import sqlalchemy
+from sqlalchemy import event
+
+DB_PATH = 'stockwatcher.db'
+
+# WAL下读写互不阻塞，synchronous=NORMAL只在检查点时刷盘；cache_size为负数时单位为KiB
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -65536,
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+    'busy_timeout': 30000,
+}
+
+
+def create_engine(path=DB_PATH, readonly=False, pool_size=20, echo=False, **pragmas):
+    """
+    :param path: 数据库文件
+    :param readonly: 读引擎：设置query_only，不修改journal_mode
+    :param pool_size: 连接池大小，溢出连接数与之相同
+    :param pragmas: 覆盖默认pragma，值为None时不设置，如cache_size=-262144
+    :return: sqlalchemy engine
+    """
+    _pragmas = dict(PRAGMAS, **pragmas)
+    if readonly:
+        _pragmas['journal_mode'] = None
+        _pragmas['query_only'] = 'ON'
+    engine = sqlalchemy.create_engine(f'sqlite:///{path}', echo=echo, pool_size=pool_size, max_overflow=pool_size)
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in _pragmas.items():
+            if value is not None:
+                cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+    return engine
+
+
+_engines = {}
+_lock = threading.Lock()
+
+
+def get_engine(path=DB_PATH, readonly=False, **kwargs):
+    """
+    进程内共享的引擎：按(数据库文件, 读写, 进程号)缓存，fork出的工作进程首次调用时建立自己的连接池
+    :param kwargs: 同create_engine，仅首次创建时生效
+    """
+    key = (os.path.abspath(path), readonly, os.getpid())
+    with _lock:
+        if key not in _engines:
+            _engines[key] = create_engine(path, readonly, **kwargs)
+        return _engines[key]
@@ -5,23 +5,56 @@
         * 通过本地数据库取数，进行黄金台识别
     @update:
         * 修改匹配方法，先过滤涨停日期行索引，再判断后续规则
+        * 新增全市场批量模式：一次读取区间行情，按股票分段后以数组运算完成涨停及窗口判断
+        * trigger_v2滑动窗口改为增量累计计算，不再逐窗口复制DataFrame
+        * 全市场识别改用可插拔执行器（线程/进程/串行），单只股票异常以结构化错误返回
+        * 行情经storage读取：只取分析字段，交易日为整数，仅对输出信号转换日期
+        * 数据库连接经database创建：WAL及pragma调优，行情读取使用只读引擎
+        * 分段计时与计数经profiling记录，默认关闭
+        * 已建立涨停事件表时，区间内无涨停（涨幅）事件的股票不再读取行情
+        * golden_filter、trigger_v2、amplitude_convergence可传入panel.MarketPanel（或其series窗口），按字段名取数组
+        * 箱体及收敛判断经kernels数组内核：已安装numba时编译执行，否则numpy向量化
 """
 import datetime
+import functools
 
 import pandas as pd
-import math
-import sqlalchemy
 import numpy as np
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import and_
-from utilities import Market, MyThread
-from tqdm import tqdm
+from sqlalchemy.orm import sessionmaker, scoped_session
+import kernels
+import profiling
+from database import get_engine
+from utilities import EVENT_FLOOR, run_tasks, get_universe, classify_quota
+from storage import SQLiteStore, int_to_date, int_to_str
 
 num_threads = 20
 
-engine = sqlalchemy.create_engine('sqlite:///stockwatcher.db', echo=False, max_overflow=20, pool_size=20)
+engine = get_engine(pool_size=num_threads)
 Session = sessionmaker(bind=engine)
-session = Session()
+# 线程本地session，每个工作线程使用独立的数据库连接
+session = scoped_session(Session)
+# 行情读取使用只读引擎，与结果写入互不阻塞
+store = SQLiteStore(get_engine(readonly=True, pool_size=num_threads))
+# trigger_v2、amplitude_convergence读取的字段
+DETECT_COLUMNS = ['tradeDate', 'open', 'close', 'high', 'low', 'amplitude', 'perf_percent']
+
+
+def use_store(new_store):
+    """
+    切换行情存储，如storage.ParquetStore；trigger_v2、amplitude_convergence、get_stocks等均经此读取
+    """
+    global store
+    store = new_store
+
+
+def init_worker():
+    """
+    工作进程初始化：丢弃从父进程继承的连接池，进程内重新建立SQLite连接
+    """
+    engine.dispose(close=False)
+    if isinstance(store, SQLiteStore):
+        store.engine.dispose(close=False)
+    session.remove()
 
 
 def stockIncrease_type(code):
@@ -38,167 +71,269 @@ def stockIncrease_type(code):
 
 def get_stocks():
     """
-    return: list of tuple('ticker'，)
+    股票池：证券主表（含已退市，按主表顺序）并上行情库内的其余股票（排序后追加）
+    ** 主表未刷新或不完整时，行情库内已有的股票同样参与识别，与批量模式扫描的股票一致
+    return: pd.DataFrame(column=['ticker'])
+    """
+    codes = get_universe(engine, include_delisted=True, refresh=False)['code'].tolist()
+    _master = set(codes)
+    codes += sorted(t for t in store.tickers() if t not in _master)
+    return pd.DataFrame({'ticker': codes})
+
+
+def no_events(code, start_date, end_date, floor):
     """
-    return pd.read_sql(session.query(Market.ticker.distinct()).statement, session.bind)
+    :return: 行情存储已建立涨停事件表，且区间内该股票无涨幅超过floor的K线时为True，可跳过行情读取
+    """
+    if floor < EVENT_FLOOR or not hasattr(store, 'has_events') or not store.has_events():
+        return False
+    if store.load_events(start_date, end_date, code, floor)['ticker'].size > 0:
+        return False
+    profiling.count('events.skipped')
+    return True
 
 
 def golden_filter(price, start_window, amplitude=15.00, boxrange_bottom=-0.01, boxrange_upper=0.8, v=0.6):
+    """
+    :param price: 涨停日起的窗口行情，pd.DataFrame（字段顺序同PRICE_COLUMNS）或MarketPanel.series(...).window(...)
+    """
+    profiling.count('golden_filter.windows')
     if price.shape[0] < start_window:
         return False
-    # 振幅合集
-    amplitude_list = price.iloc[1:, 7].to_list()
-    price['vollage'] = abs(price['open'] - price['close'])
-    if all(_ <= amplitude for _ in amplitude_list):
-        # 确定箱体上下界
-        _close1 = price.iloc[0, 3]
-        _open1 = price.iloc[0, 2]
-        _v1 = price.iloc[0, -1]
-        # 2-窗口末尾 K线柱的开盘价、收盘价合集
-        a = price.iloc[1:, 2].to_list() + price.iloc[1:, 3].to_list()
-        # 箱体上下限
-        bottom = _v1 * boxrange_bottom + _open1
-        upper = _v1 * boxrange_upper + _close1
-        # 柱体大小限制
-        vollage = _v1 * v
-        # 2-10K线柱体大小
-        b = price.iloc[1:, -1].to_list()
-        if (max(a) <= upper) and (min(a) >= bottom) and (max(b) <= vollage) and (_close1 > _open1):
-            return True
-        else:
-            return False
-    else:
-        return False
+    # 第一根K线柱确定箱体上下界及柱体大小限制，2-窗口末尾K线的振幅、开收盘价、柱体大小逐一判断
+    return bool(kernels.golden_mask(price['open'], price['high'], price['low'], price['close'], price['amplitude'],
+                                    [0], price.shape[0], amplitude, boxrange_bottom, boxrange_upper, v)[0])
 
 
+def window_signals(_open, _close, _high, _low, _amplitude, cand, remain,
+                   amplitude=15.00, boxrange_bottom=-0.01, boxrange_upper=0.8, v=0.6,
+                   tao=0.5, start_window=5, end_window=11, distance=None, body=None):
+    """
+        滑动窗口增量计算：与逐窗口golden_filter + 收敛判断结果一致
+        ** 以涨停日为起点，沿窗口方向累计开收盘最大/最小值、柱体最大值、振幅最大值及上下影距离累计和
+        ** 每个窗口尺寸只需按窗口长度取累计值，额外开销O(1)
+        :param cand: 涨停日行索引
+        :param remain: 涨停日起（含）所在股票剩余K线数量，窗口超出时截断
+        :param distance: 可选，预先计算的high - low，多个检测器共用
+        :param body: 可选，预先计算的|open - close|，多个检测器共用
+        :return: hit: bool矩阵(涨停日, 窗口尺寸)，length: 对应的实际窗口长度
+    """
+    windows = np.arange(int(start_window), int(end_window))
+    cand = np.asarray(cand, dtype=np.int64)
+    remain = np.asarray(remain, dtype=np.int64)
+    if windows.size == 0 or cand.size == 0:
+        return np.zeros((cand.size, windows.size), dtype=bool), np.zeros((cand.size, windows.size), dtype=np.int64)
+    if kernels.current() == 'numba':
+        # 编译内核逐窗口判断，不构造(涨停日, 最大窗口)矩阵
+        length = np.minimum(remain[:, None], windows[None, :])
+        _starts, _lengths = np.repeat(cand, windows.size), length.ravel()
+        hit = kernels.golden_mask(_open, _high, _low, _close, _amplitude, _starts, _lengths,
+                                  amplitude, boxrange_bottom, boxrange_upper, v) | \
+            kernels.convergence_mask(_open, _high, _low, _close, _starts, _lengths, tao, zero=True)
+        return (length >= start_window) & (length >= 2) & hit.reshape(length.shape), length
+    distance = _high - _low if distance is None else distance
+    body = np.abs(_open - _close) if body is None else body
+
+    # 窗口第2根至最大窗口末尾的行索引，超出股票分段的位置用掩码剔除
+    offset = np.arange(1, max(int(windows[-1]), 2))
+    inside = offset[None, :] < remain[:, None]
+    idx = np.where(inside, cand[:, None] + offset[None, :], cand[:, None])
+
+    _o, _c = _open[idx], _close[idx]
+    oc_max = np.maximum.accumulate(np.where(inside, np.maximum(_o, _c), -np.inf), axis=1)
+    oc_min = np.minimum.accumulate(np.where(inside, np.minimum(_o, _c), np.inf), axis=1)
+    body_max = np.maximum.accumulate(np.where(inside, body[idx], -np.inf), axis=1)
+    amp_max = np.maximum.accumulate(np.where(inside, _amplitude[idx], -np.inf), axis=1)
+    _distance = np.where(inside, distance[idx], 0.0)
+    dist_sum = np.cumsum(_distance, axis=1)
+    dist_nonzero = np.logical_or.accumulate(_distance != 0, axis=1)
+
+    # 各窗口尺寸的实际长度，及累计值所在列
+    length = np.minimum(remain[:, None], windows[None, :])
+    valid = (length >= start_window) & (length >= 2)
+    col = np.clip(length - 2, 0, offset.size - 1)
+
+    def _take(x):
+        return np.take_along_axis(x, col, axis=1)
+
+    # 黄金台2-10柱体逻辑判断：第一根K线柱确定箱体上下界及柱体大小限制
+    _v1 = body[cand][:, None]
+    bottom = _v1 * boxrange_bottom + _open[cand][:, None]
+    upper = _v1 * boxrange_upper + _close[cand][:, None]
+    _x = (_take(amp_max) <= amplitude) & (_take(oc_max) <= upper) & (_take(oc_min) >= bottom) & \
+         (_take(body_max) <= _v1 * v) & (_close[cand] > _open[cand])[:, None]
+
+    # 是否收敛判断：均值贴近阈值时按np.mean重算，避免累计和与逐窗口求和的舍入差异
+    _mean = _take(dist_sum) / np.maximum(length - 1, 1)
+    _zero = ~_take(dist_nonzero)
+    _c = _zero | (_mean < tao)
+    for r, k in zip(*np.nonzero(valid & (np.abs(_mean - tao) <= 1e-9 * max(1.0, abs(tao))))):
+        _s = cand[r] + 1
+        _e = cand[r] + length[r, k]
+        _c[r, k] = _zero[r, k] or np.mean(_high[_s:_e] - _low[_s:_e]) < tao
+
+    return valid & (_x | _c), length
+
+
+@profiling.timed('trigger_v2')
 def trigger_v2(code, start_date, end_date, main_bottom=9.97, main_upper=11.00, star_bottom=19.97,
                star_upper=21.00,
                amplitude=15.00, boxrange_bottom=-0.01, boxrange_upper=0.8, v=0.6,
-               tao=0.5, start_window=5, end_window=11):
-
-    start_date = pd.to_datetime(start_date).date().strftime('%Y-%m-%d')
-    end_date = pd.to_datetime(end_date).date().strftime('%Y-%m-%d')
-
-    # 获取历史数据
-    _stockprice = pd.read_sql(
-        session.query(Market).filter(
-            and_(Market.ticker == code, start_date <= Market.tradeDate, Market.tradeDate <= end_date)
-        ).order_by(Market.tradeDate).statement,
-        session.bind
-    )
-
-    _stockprice.drop(columns=['id', 'createtime', 'updatetime'], inplace=True)
-    _stockprice.reset_index(drop=True, inplace=True)
-    _stockprice['tradeDate'] = pd.to_datetime(_stockprice['tradeDate'])
-    _stockprice['tradeDate'] = _stockprice['tradeDate'].dt.date
+               tao=0.5, start_window=5, end_window=11, panel=None):
+    """
+        :param panel: panel.MarketPanel，传入时从面板取数，不再读取行情存储
+    """
 
     # 过滤涨停
     _temp = stockIncrease_type(code)
+    if panel is None and no_events(code, start_date, end_date, main_bottom if _temp == 'normal' else star_bottom):
+        return []
 
-    def _core(_stockprice, _temp):
-        _results = []
-        if _temp == 'normal':
-            _raw = _stockprice[
-                (_stockprice['perf_percent'] > main_bottom) & (_stockprice['perf_percent'] < main_upper)].index
-        else:
-            _raw = _stockprice[
-                (_stockprice['perf_percent'] > star_bottom) & (_stockprice['perf_percent'] < star_upper)].index
-        if _raw.empty:
-            return _results
-        else:
-            for i in _raw:
-                # 定义滑动窗口
-                for w in range(int(start_window), int(end_window), 1):
-                    _e = i + w
-                    _price = _stockprice.iloc[i:_e, :].copy()
-
-                    if len(_price) < start_window:
-                        continue
-                    else:
-                        # 黄金台2-10柱体逻辑判断，固定窗口
-                        _x = golden_filter(_price, start_window, amplitude, boxrange_bottom, boxrange_upper, v)
-                        # 是否收敛判断
-                        _upper = _price['high'].to_list()[1:]
-                        _low = _price.iloc[1:, 5].to_list()
-                        _distance = [a - b for a, b in zip(_upper, _low)]
-                        if all(item == 0 for item in _distance):
-                            _c = True
-                        elif np.mean(_distance) < tao:
-                            _c = True
-                        else:
-                            _c = False
-                        # 判断条件：黄金台或者极致收敛任意触发
-                        if _x or _c:
-                            _results.append({'ticker': code, 'signal': _price.iloc[-1, 0]})
-                            # print(f"---黄金台信号---{code}, 信号日：{_price.iloc[_e, 0]}")
-                            continue
-                        else:
-                            continue
-            return _results
-
-    _result = _core(_stockprice, _temp)
-    return _result
-
-
-def goldenFilter_pool(codelist, start_date, end_date,
-                      main_bottom=9.97, main_upper=11.00, star_bottom=19.97, star_upper=21.00,
-                      amplitude=15.00, boxrange_bottom=-0.01, boxrange_upper=0.8, v=0.6,
-                      tao=0.5, start_window=5, end_window=11):
-    results = []
-    for i in codelist:
-        # try:
-        #     _a = trigger_v2(i, start_date, end_date, main_bottom, main_upper, star_bottom, star_upper,
-        #                     amplitude, boxrange_bottom, boxrange_upper, v,
-        #                     tao, start_window, end_window)
-        #     if len(_a) > 0:
-        #         results.extend(_a)
-        #     else:
-        #         continue
-        # except Exception as e:
-        #     print(f"{i}, 错误码{e}")
-        #     continue
-        _a = trigger_v2(i, start_date, end_date, main_bottom, main_upper, star_bottom, star_upper,
-                        amplitude, boxrange_bottom, boxrange_upper, v,
-                        tao, start_window, end_window)
-        if len(_a) > 0:
-            results.extend(_a)
-        else:
-            continue
-    return results
+    # 获取历史数据
+    _stockprice = (store if panel is None else panel).load_arrays(start_date, end_date, code, DETECT_COLUMNS)
+    _perf = _stockprice['perf_percent']
+
+    if _temp == 'normal':
+        _raw = np.flatnonzero((_perf > main_bottom) & (_perf < main_upper))
+    else:
+        _raw = np.flatnonzero((_perf > star_bottom) & (_perf < star_upper))
+    profiling.count('trigger_v2.limit_up', _raw.size)
+    if _raw.size == 0:
+        return []
+
+    # 滑动窗口：每个涨停日的各窗口尺寸增量计算，判断条件：黄金台或者极致收敛任意触发
+    with profiling.stage('trigger_v2.windows'):
+        hit, length = window_signals(
+            _stockprice['open'], _stockprice['close'], _stockprice['high'], _stockprice['low'],
+            _stockprice['amplitude'],
+            _raw, _perf.size - _raw,
+            amplitude, boxrange_bottom, boxrange_upper, v, tao, start_window, end_window
+        )
+    profiling.count('trigger_v2.windows', hit.size)
+    _i, _w = np.nonzero(hit)
+    with profiling.stage('trigger_v2.dates'):
+        _signal = int_to_date(_stockprice['tradeDate'][_raw[_i] + length[_i, _w] - 1])
+    profiling.count('trigger_v2.signals', len(_signal))
+    return [{'ticker': code, 'signal': _s} for _s in _signal]
 
 
 def goldenFilterThreads(start_date: datetime.date, end_date: datetime.date,
                         main_bottom=9.97, main_upper=11.00, star_bottom=19.97, star_upper=21.00,
                         amplitude=15.00, boxrange_bottom=-0.01, boxrange_upper=0.8, v=0.6,
-                        tao=0.5, start_window=5, end_window=11):
-    stock = get_stocks()
-    results = []
-    f = locals()
-    for thread in range(num_threads):
-        delta = math.ceil(stock.shape[0] / num_threads)
-        _stocklist = stock['ticker'].to_list()[thread * delta: (thread + 1) * delta]
-        f['n_' + str(thread)] = MyThread(goldenFilter_pool, args=(_stocklist, start_date, end_date,
-                                                                  main_bottom, main_upper, star_bottom, star_upper,
-                                                                  amplitude, boxrange_bottom, boxrange_upper, v,
-                                                                  tao, start_window, end_window
-                                                                  ))
-
-    for t in range(num_threads):
-        f['n_' + str(t)].start()
-
-    for t in range(num_threads):
-        f['n_' + str(t)].join()
-
-    # 获取结果
-    for t in range(num_threads):
-        _result = f['n_' + str(t)].get_result()
-        results.extend(_result)
-
+                        tao=0.5, start_window=5, end_window=11, bulk=False,
+                        backend='thread', workers=num_threads, chunksize=None, progress=None, with_errors=False,
+                        sink=None, panel=None):
+    """
+        全市场黄金台识别
+        :param bulk: 是否使用全市场批量模式
+        :param backend: 执行模式 'thread' / 'process' / 'serial'
+        :param workers: 工作线程/进程数量
+        :param chunksize: 每个分片的股票数量
+        :param progress: 进度回调 progress(done, total)
+        :param with_errors: 为True时返回(results, errors)，errors为单只股票的结构化错误
+        :param sink: 结果写入回调 sink(records)，如utilities.ResultWriter(engine, version).write，在调用线程中执行
+        :param panel: panel.MarketPanel，process模式下先share()放入共享内存，工作进程挂载后不复制行情
+    """
+    if bulk:
+        results = goldenFilterBulk(start_date, end_date, main_bottom, main_upper, star_bottom, star_upper,
+                                   amplitude, boxrange_bottom, boxrange_upper, v,
+                                   tao, start_window, end_window, panel)
+        if sink is not None:
+            sink(results)
+        return (results, []) if with_errors else results
+    with profiling.stage('goldenFilterThreads.universe'):
+        stock = get_stocks()
+    task = functools.partial(trigger_v2, start_date=start_date, end_date=end_date,
+                             main_bottom=main_bottom, main_upper=main_upper,
+                             star_bottom=star_bottom, star_upper=star_upper,
+                             amplitude=amplitude, boxrange_bottom=boxrange_bottom, boxrange_upper=boxrange_upper,
+                             v=v, tao=tao, start_window=start_window, end_window=end_window, panel=panel)
+    with profiling.stage('goldenFilterThreads.run'):
+        _results, errors = run_tasks(task, stock['ticker'].to_list(), backend=backend, workers=workers,
+                                     chunksize=chunksize, initializer=init_worker, progress=progress,
+                                     on_result=None if sink is None else lambda code, _r: sink(_r))
+    results = [_s for _r in _results for _s in _r]
+
+    if with_errors:
+        return results, errors
     return results
 
 
+def load_market(start_date, end_date, panel=None):
+    """
+    一次列式扫描读取区间内全市场行情，按股票代码、交易日排序
+    :param start_date: datetime.date / "YYYY-MM-DD"
+    :param end_date: datetime.date / "YYYY-MM-DD"
+    :param panel: panel.MarketPanel，传入时从面板取数
+    :return: pd.DataFrame(columns=['ticker', 'tradeDate', 'open', 'close', 'high', 'low', 'amplitude', 'perf_percent'])，
+             tradeDate为整数yyyymmdd
+    """
+    return (store if panel is None else panel).load_market(start_date, end_date, columns=[
+        'ticker', 'tradeDate', 'open', 'close', 'high', 'low', 'amplitude', 'perf_percent'])
+
+
+def goldenFilterBulk(start_date: datetime.date, end_date: datetime.date,
+                     main_bottom=9.97, main_upper=11.00, star_bottom=19.97, star_upper=21.00,
+                     amplitude=15.00, boxrange_bottom=-0.01, boxrange_upper=0.8, v=0.6,
+                     tao=0.5, start_window=5, end_window=11, panel=None):
+    """
+        全市场批量模式：与goldenFilterThreads返回完全一致的[{'ticker', 'signal'}]列表
+        ** 一次读取区间内全部行情，按股票分段为连续的numpy数组
+        ** 涨停过滤、窗口内黄金台及收敛判断，对所有股票的涨停日同时做数组运算
+    """
+    stock = get_stocks()
+    with profiling.stage('goldenFilterBulk.read'):
+        price = load_market(start_date, end_date, panel)
+    if price.empty:
+        return []
+
+    ticker = price['ticker'].to_numpy()
+    _open = price['open'].to_numpy(dtype=np.float64)
+    _close = price['close'].to_numpy(dtype=np.float64)
+    _high = price['high'].to_numpy(dtype=np.float64)
+    _low = price['low'].to_numpy(dtype=np.float64)
+    _amplitude = price['amplitude'].to_numpy(dtype=np.float64)
+    _perf = price['perf_percent'].to_numpy(dtype=np.float64)
+    n = ticker.shape[0]
+
+    # 按股票分段：每行所在分段的结束位置
+    _bounds = np.flatnonzero(ticker[1:] != ticker[:-1]) + 1
+    _starts = np.r_[0, _bounds]
+    _ends = np.r_[_bounds, n]
+    seg_end = np.repeat(_ends, _ends - _starts)
+
+    # 过滤涨停：创业板、科创板使用star区间，其余使用main区间
+    radical = np.repeat(classify_quota(ticker[_starts]) == 'radical', _ends - _starts)
+    limit_up = np.where(radical,
+                        (_perf > star_bottom) & (_perf < star_upper),
+                        (_perf > main_bottom) & (_perf < main_upper))
+    cand = np.flatnonzero(limit_up)
+    if cand.size == 0:
+        return []
+    remain = seg_end[cand] - cand
+
+    # 滑动窗口：所有股票的涨停日同时计算
+    with profiling.stage('goldenFilterBulk.windows'):
+        hit, length = window_signals(_open, _close, _high, _low, _amplitude, cand, remain,
+                                     amplitude, boxrange_bottom, boxrange_upper, v, tao, start_window, end_window)
+    profiling.count('goldenFilterBulk.windows', hit.size)
+    _i, _w = np.nonzero(hit)
+    if _i.size == 0:
+        return []
+
+    # 结果顺序与多线程模式一致：股票顺序 -> 涨停日 -> 窗口尺寸
+    rank = pd.Series(np.arange(stock.shape[0]), index=stock['ticker'].to_list())
+    _rows = cand[_i]
+    order = np.lexsort((_w, _rows, rank.reindex(ticker[_rows]).to_numpy()))
+    _rows = _rows[order]
+    _signal_rows = _rows + length[_i, _w][order] - 1
+    signal = int_to_date(price['tradeDate'].to_numpy()[_signal_rows])
+    return [{'ticker': t, 'signal': s} for t, s in zip(ticker[_rows], signal)]
+
+
+@profiling.timed('amplitude_convergence')
 def amplitude_convergence(code, start_date: str, end_date: str, increase_range=9.9, min_window=6, max_window=10,
-                          tao=0.5):
+                          tao=0.5, panel=None):
     """
         识别窗口内股票是否出现极致压缩收敛的情况
         从阈值涨跌幅开始识别: 最新窗口尺寸计算累计收敛情况
@@ -213,42 +348,38 @@ def amplitude_convergence(code, start_date: str, end_date: str, increase_range=9
         :param min_window: 窗口参数下限
         :param max_window: 窗口参数上限
         :param tao: 收敛阈值参数
+        :param panel: panel.MarketPanel，传入时从面板取数，不再读取行情存储
     """
-    _stockprice = pd.read_sql(
-        session.query(Market).filter(
-            and_(Market.ticker == code, start_date <= Market.tradeDate, Market.tradeDate <= end_date)
-        ).order_by(Market.tradeDate).statement,
-        session.bind
-    )
-    _stockprice.drop(columns=['id', 'createtime', 'updatetime'], inplace=True)
+    if panel is None and no_events(code, start_date, end_date, increase_range):
+        return {}
+    _stockprice = (store if panel is None else panel).load_arrays(start_date, end_date, code, DETECT_COLUMNS)
+    _date, _high, _low = _stockprice['tradeDate'], _stockprice['high'], _stockprice['low']
 
     # 过滤满足条件的出始索引
-    _raw = _stockprice[_stockprice['perf_percent'] > increase_range].index
-    if _raw.empty:
-        pass
+    _raw = np.flatnonzero(_stockprice['perf_percent'] > increase_range)
+    profiling.count('amplitude_convergence.rise', len(_raw))
+    if _raw.size == 0:
         return {}
     else:
+        # 各起始日的全部窗口尺寸一次判断，窗口超出行情末尾时截断；每个起始日取首个收敛的窗口
+        _windows = np.arange(min_window, max_window)
+        if _windows.size == 0:
+            return {}
+        length = np.minimum((_date.size - _raw)[:, None], _windows[None, :])
+        valid = length >= min_window - 1
+        below = valid & kernels.convergence_mask(_stockprice['open'], _high, _low, _stockprice['close'],
+                                                 np.repeat(_raw, _windows.size), length.ravel(), tao) \
+            .reshape(length.shape)
+        first = np.argmax(below, axis=1)
+        windows = int((valid & (np.arange(_windows.size)[None, :] <= np.where(below.any(axis=1), first,
+                                                                                _windows.size)[:, None])).sum())
         signals = []
-        for s in _raw:
-            results = {}
-            _sdate = _stockprice.iloc[s, 0]
-            for e in range(min_window, max_window, 1):
-                _price = _stockprice.iloc[s:s + e, :].copy()  # 截取收敛判断
-                _price.reset_index(drop=True, inplace=True)
-                if _price.shape[0] < min_window - 1:
-                    continue
-                else:
-                    _upper = _price['high'].to_list()[1:]
-                    _low = _price.iloc[1:, 5].to_list()
-                    _distance = [a - b for a, b in zip(_upper, _low)]
-                    if np.mean(_distance) < tao:
-                        _signal = _price.iloc[-1, 0]
-                        results.update({_signal: np.mean(_distance)})
-                        break
-                    else:
-                        continue
-            if len(results) > 0:
-                signals.append({_sdate: results})
+        for r in np.flatnonzero(below.any(axis=1)):
+            s, _end = _raw[r], _raw[r] + length[r, first[r]]
+            _signal = int_to_str([_date[_end - 1]])[0]
+            signals.append({int_to_str([_date[s]])[0]: {_signal: np.mean(_high[s + 1:_end] - _low[s + 1:_end])}})
+        profiling.count('amplitude_convergence.windows', windows)
+        profiling.count('amplitude_convergence.signals', len(signals))
 
         if len(signals) > 0:
             return {code: signals}
@@ -256,6 +387,47 @@ def amplitude_convergence(code, start_date: str, end_date: str, increase_range=9
             return {}
 
 
+def convergence_records(results):
+    """
+        极致收敛结果展开为golden_results记录，一次构造DataFrame
+        :param results: amplitude_convergence的输出或convergenceFilter的输出列表
+        :return: pd.DataFrame(columns=['ticker', 'trigger_date', 'signal', 'metric'])，metric为上下影距离均值
+    """
+    results = [results] if isinstance(results, dict) else results
+    rows = [(code, trigger, signal, metric)
+            for _r in results for code, signals in _r.items()
+            for _s in signals for trigger, _signal in _s.items()
+            for signal, metric in _signal.items()]
+    return pd.DataFrame(rows, columns=['ticker', 'trigger_date', 'signal', 'metric'])
+
+
+def convergenceFilter(start_date: str, end_date: str, increase_range=9.9, min_window=6, max_window=10, tao=0.5,
+                      backend='thread', workers=num_threads, chunksize=None, progress=None, with_errors=False,
+                      sink=None, panel=None):
+    """
+        全市场极致收敛识别
+        :param sink: 结果写入回调 sink(records)，如utilities.ResultWriter(engine, 'convergence').write，
+                     传入convergence_records展开后的DataFrame
+        :param panel: panel.MarketPanel，同goldenFilterThreads
+        :return: list of dict({code: signals})，仅保留识别到信号的股票
+    """
+    with profiling.stage('convergenceFilter.universe'):
+        stock = get_stocks()
+    task = functools.partial(amplitude_convergence, start_date=start_date, end_date=end_date,
+                             increase_range=increase_range, min_window=min_window, max_window=max_window, tao=tao,
+                             panel=panel)
+    with profiling.stage('convergenceFilter.run'):
+        _results, errors = run_tasks(task, stock['ticker'].to_list(), backend=backend, workers=workers,
+                                     chunksize=chunksize, initializer=init_worker, progress=progress,
+                                     on_result=None if sink is None else
+                                     lambda code, _r: sink(convergence_records(_r)))
+    results = [_r for _r in _results if len(_r) > 0]
+
+    if with_errors:
+        return results, errors
+    return results
+
+
 if __name__ == '__main__':
     a = trigger_v2('001239', datetime.date(2024, 10, 8), datetime.date(2024, 12, 23))
     for i in a:
@@ -0,0 +1,160 @@
+"""
+    @author: caitao
+    @feature:
+        * ak.stock_zh_a_hist的读穿缓存：按(股票代码, 复权方式, 区间)缓存，返回与ak.stock_zh_a_hist相同的字段及顺序
+        * 后复权（hfq）优先读取本地marketData_daily，只向数据源请求本地最新交易日之后缺失的尾部交易日
+        * 内存热数据：TTL过期 + LRU淘汰，线程安全，供coreScreener多线程识别共用
+        * 可选回写：请求到的尾部行情经MarketWriter写入本地库
+        * 可选本地复权：前复权（qfq）、不复权（''）由marketData_raw及adj_factor在本地换算，本地不完整时整体请求数据源
+"""
+import collections
+import threading
+import time
+
+import akshare as ak
+import pandas as pd
+
+from storage import int_to_date
+from trade_calendar import get_calendar
+from utilities import MARKET_COLUMNS, MarketWriter, format_marketdata
+
+HIST_COLUMNS = list(MARKET_COLUMNS.keys())
+
+
+def _to_date(date):
+    return pd.to_datetime(date).date()
+
+
+class HistCache:
+    """
+    :param store: 本地行情SQLiteStore，为None时只使用内存缓存及数据源
+    :param source: 同ak.stock_zh_a_hist签名的数据源
+    :param ttl: 内存缓存有效期（秒）
+    :param maxsize: 内存缓存条目上限，超过后淘汰最久未使用的条目
+    :param calendar: 交易日历，默认trade_calendar.get_calendar()，首次需要判断缺失交易日时加载
+    :param write_back: 是否将请求到的后复权尾部行情写入本地库
+    :param raw: 是否由本地不复权行情及复权因子提供前复权、不复权行情
+    """
+
+    def __init__(self, store=None, source=ak.stock_zh_a_hist, ttl=600, maxsize=4096, calendar=None,
+                 write_back=False, raw=False):
+        self.store = store
+        self.source = source
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._calendar = calendar
+        self.write_back = write_back
+        self.raw = raw
+        self._adjusted = {}
+        self.stats = {'memory': 0, 'local': 0, 'fetch': 0, 'fetch_rows': 0}
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._writer = None
+
+    @property
+    def calendar(self):
+        if self._calendar is None:
+            self._calendar = get_calendar()
+        return self._calendar
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.stats[name] += n
+
+    def _lookup(self, key):
+        with self._lock:
+            item = self._cache.get(key)
+            if item is None:
+                return None
+            if item[0] < time.monotonic():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            self.stats['memory'] += 1
+            return item[1]
+
+    def _insert(self, key, frame):
+        with self._lock:
+            self._cache[key] = (time.monotonic() + self.ttl, frame)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def _fetch(self, code, start, end, adjust, timeout):
+        price = self.source(symbol=code, period='daily', start_date=start.strftime('%Y%m%d'),
+                            end_date=end.strftime('%Y%m%d'), adjust=adjust, timeout=timeout)
+        self._count('fetch')
+        if price is None or price.empty:
+            return pd.DataFrame(columns=HIST_COLUMNS)
+        price = price.copy()
+        if '股票代码' not in price.columns:
+            price.insert(1, '股票代码', code)
+        price['日期'] = pd.to_datetime(price['日期']).dt.date
+        self._count('fetch_rows', price.shape[0])
+        return price[HIST_COLUMNS]
+
+    def _local(self, code, start, end, adjust='hfq'):
+        store = self.store
+        if adjust != 'hfq':
+            _adjust = 'qfq' if adjust == 'qfq' else 'raw'
+            with self._lock:
+                if _adjust not in self._adjusted:
+                    self._adjusted[_adjust] = self.store.adjusted(_adjust)
+                store = self._adjusted[_adjust]
+        price = store.load_price(code, start, end)
+        if price.empty:
+            return pd.DataFrame(columns=HIST_COLUMNS)
+        price['tradeDate'] = int_to_date(price['tradeDate'].to_numpy())
+        return price.rename(columns={v: k for k, v in MARKET_COLUMNS.items()})[HIST_COLUMNS]
+
+    def _write(self, price):
+        with self._lock:
+            if self._writer is None:
+                self._writer = MarketWriter(self.store.engine)
+        self._writer.write(format_marketdata(price))
+        self._writer.flush()
+
+    def get(self, code, start_date, end_date, adjust='hfq', timeout=30):
+        """
+        :param start_date: "YYYYmmdd" / datetime.date
+        :param end_date: "YYYYmmdd" / datetime.date
+        :return: pd.DataFrame，字段同ak.stock_zh_a_hist，日期为datetime.date，按日期升序
+        """
+        start, end = _to_date(start_date), _to_date(end_date)
+        key = (code, adjust, start, end)
+        price = self._lookup(key)
+        if price is not None:
+            return price.copy()
+
+        if self.store is None or (adjust != 'hfq' and not (self.raw and adjust in ('qfq', ''))):
+            price = self._fetch(code, start, end, adjust, timeout)
+        elif adjust != 'hfq':
+            price = self._local(code, start, end, adjust)
+            _last = self.calendar.floor(end)
+            # 前复权价格随除权整体变化，本地缺少尾部交易日时不拼接，整体向数据源请求
+            if price.empty or (_last is not None and price['日期'].iloc[-1] < _last):
+                price = self._fetch(code, start, end, adjust, timeout)
+            else:
+                self._count('local')
+        else:
+            price = self._local(code, start, end)
+            # 本地最新交易日之后、区间内的交易日需向数据源请求
+            _last = self.calendar.floor(end)
+            if price.empty:
+                price = self._fetch(code, start, end, adjust, timeout)
+                _tail = price
+            elif _last is not None and price['日期'].iloc[-1] < _last:
+                _tail = self._fetch(code, self.calendar.next(price['日期'].iloc[-1]), end, adjust, timeout)
+                price = pd.concat([price, _tail], ignore_index=True) if not _tail.empty else price
+            else:
+                _tail = None
+                self._count('local')
+            if self.write_back and _tail is not None and not _tail.empty:
+                self._write(_tail)
+        price = price.sort_values('日期').drop_duplicates('日期', keep='last').reset_index(drop=True)
+        self._insert(key, price)
+        return price.copy()
@@ -0,0 +1,191 @@
+"""
+    @author: caitao
+    @feature:
+        * 盘中识别：定时拉取全市场实时快照（stock_zh_a_spot_em一次请求），作为当日临时K线并入内存中的历史尾部
+        * 每次快照对全市场重新运行scanner中的检测器（黄金台、极致收敛），只输出信号日为当日的信号
+        * 快照为不复权价格：按历史最后收盘价 / 昨收换算至历史行情的复权口径（如后复权）后再并入
+        * 数据源可插拔：实时快照、录制的快照回放，便于离线测试
+        * 录制：python intraday.py record 快照目录 [次数] [间隔秒]；回放：python intraday.py replay 快照目录 [交易日]
+"""
+import datetime
+import os
+import sys
+import time
+
+import akshare as ak
+import numpy as np
+import pandas as pd
+
+import golden
+from scanner import DETECTORS, RECORD_COLUMNS, ScanContext
+from storage import ADJUST_COLUMNS, date_to_int, int_to_str
+
+# 实时快照字段 -> 行情字段
+SPOT_COLUMNS = {
+    '代码': 'ticker', '今开': 'open', '最新价': 'close', '最高': 'high', '最低': 'low', '成交额': 'amount',
+    '振幅': 'amplitude', '涨跌幅': 'perf_percent', '涨跌额': 'perf_amount', '成交量': 'volumn', '换手率': 'turnover',
+    '昨收': 'pre_close'
+}
+SCAN_COLUMNS = ['ticker', 'tradeDate', 'open', 'close', 'high', 'low', 'amplitude', 'perf_percent']
+
+
+def format_spot(snapshot):
+    """
+    :param snapshot: stock_zh_a_spot_em格式的快照
+    :return: pd.DataFrame(index=ticker)，剔除停牌等无报价的股票；缺少昨收时按最新价 - 涨跌额补充
+    """
+    spot = snapshot.rename(columns=SPOT_COLUMNS).reindex(columns=list(SPOT_COLUMNS.values()))
+    spot['ticker'] = spot['ticker'].astype(str).str.zfill(6)
+    for c in spot.columns[1:]:
+        spot[c] = pd.to_numeric(spot[c], errors='coerce')
+    spot['pre_close'] = spot['pre_close'].fillna(spot['close'] - spot['perf_amount'])
+    return spot.dropna(subset=['open', 'close', 'high', 'low']).drop_duplicates('ticker').set_index('ticker')
+
+
+class RecordedSource:
+    """
+    录制快照回放：每次调用返回下一份快照，全部返回后抛出StopIteration
+    :param snapshots: 快照目录（按文件名顺序读取csv），或pd.DataFrame列表
+    """
+
+    def __init__(self, snapshots):
+        if isinstance(snapshots, str):
+            snapshots = [os.path.join(snapshots, f) for f in sorted(os.listdir(snapshots)) if f.endswith('.csv')]
+        self.snapshots = list(snapshots)
+        self.position = 0
+
+    def __call__(self):
+        if self.position >= len(self.snapshots):
+            raise StopIteration
+        snapshot = self.snapshots[self.position]
+        self.position += 1
+        if isinstance(snapshot, str):
+            return pd.read_csv(snapshot, dtype={'代码': str})
+        return snapshot
+
+
+def record(path, ticks=1, interval=60, source=ak.stock_zh_a_spot_em):
+    """
+    录制实时快照至目录，文件名为spot_YYYYmmdd_HHMMSS.csv
+    """
+    os.makedirs(path, exist_ok=True)
+    for n in range(ticks):
+        if n > 0:
+            time.sleep(interval)
+        _file = os.path.join(path, f"spot_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+        source().to_csv(_file, index=False)
+        print(f"已录制{_file}")
+
+
+class IntradayScreener:
+    """
+    :param trade_date: 盘中交易日，快照作为该日的临时K线
+    :param patterns: dict(检测器名称 -> 参数dict)，默认golden、convergence使用默认参数
+    :param bars: 每只股票保留的历史K线数量，需不少于各检测器的最大窗口
+    :param source: 快照数据源，返回stock_zh_a_spot_em格式的pd.DataFrame
+    :param store: 行情存储，默认golden.store
+    """
+
+    def __init__(self, trade_date=None, patterns=None, bars=30, source=ak.stock_zh_a_spot_em, store=None):
+        self.trade_date = datetime.date.today() if trade_date is None else pd.to_datetime(trade_date).date()
+        self.patterns = {'golden': {}, 'convergence': {}} if patterns is None else patterns
+        self.bars = bars
+        self.source = source
+        self.store = golden.store if store is None else store
+        self.history = None
+        self._tickers = None
+        self._seg_end = None
+
+    def load_history(self):
+        """
+        读取各股票交易日前最近bars根K线，常驻内存
+        """
+        _end = self.trade_date - datetime.timedelta(days=1)
+        since = {t: _end for t in self.store.last_dates(_end)}
+        self.history = self.store.load_tail(since, self.bars, _end, SCAN_COLUMNS)
+        ticker = self.history['ticker']
+        _bounds = np.flatnonzero(ticker[1:] != ticker[:-1]) + 1
+        self._tickers = ticker[np.r_[0, _bounds]] if ticker.size > 0 else ticker
+        self._seg_end = np.r_[_bounds, ticker.size].astype(np.int64) if ticker.size > 0 else np.array([], np.int64)
+        return self
+
+    def merge(self, snapshot):
+        """
+        快照作为各股票的临时K线追加至历史尾部
+        ** 快照价格不复权，历史为行情存储的复权口径：开高低收乘以 历史最后收盘价 / 昨收，并保留两位小数；
+           除权除息日的昨收为除权参考价，换算比例即为当日的复权因子；振幅、涨跌幅为比例，无需换算
+        :return: ScanContext
+        """
+        if self.history is None:
+            self.load_history()
+        spot = format_spot(snapshot).reindex(self._tickers)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = self.history['close'][self._seg_end - 1] / spot['pre_close'].to_numpy(dtype=np.float64)
+        quoted = spot['close'].notna().to_numpy() & np.isfinite(ratio) & (ratio > 0)
+        _pos = self._seg_end[quoted]
+        arrays = {}
+        for c in SCAN_COLUMNS:
+            if c == 'ticker':
+                _value = self._tickers[quoted]
+            elif c == 'tradeDate':
+                _value = np.full(_pos.size, date_to_int(self.trade_date), dtype=np.int32)
+            elif c in ADJUST_COLUMNS:
+                _value = np.round(spot[c].to_numpy(dtype=np.float64)[quoted] * ratio[quoted], 2)
+            else:
+                _value = spot[c].to_numpy(dtype=np.float64)[quoted]
+            arrays[c] = np.insert(self.history[c], _pos, _value)
+        return ScanContext(arrays)
+
+    def evaluate(self, snapshot):
+        """
+        :return: pd.DataFrame(columns=['pattern', 'ticker', 'trigger_date', 'signal', 'metric', 'price'])，信号日为当日
+        """
+        ctx = self.merge(snapshot)
+        _today = int_to_str([date_to_int(self.trade_date)])[0]
+        frames = []
+        for name, params in self.patterns.items():
+            frame = pd.DataFrame(DETECTORS[name](ctx, **params), columns=RECORD_COLUMNS)
+            frame = frame[frame['signal'] == _today]
+            frame.insert(0, 'pattern', name)
+            frames.append(frame)
+        result = pd.concat(frames, ignore_index=True)
+        result['price'] = format_spot(snapshot)['close'].reindex(result['ticker']).to_numpy()
+        return result
+
+    def poll(self, interval=60, ticks=None, callback=None):
+        """
+        按间隔拉取快照并识别，数据源抛出StopIteration或达到ticks次后停止
+        :param callback: callback(result, elapsed)，默认打印信号
+        :return: 最后一次识别结果
+        """
+        if self.history is None:
+            self.load_history()
+        result, n = None, 0
+        while ticks is None or n < ticks:
+            if n > 0:
+                time.sleep(interval)
+            try:
+                snapshot = self.source()
+            except StopIteration:
+                break
+            _t = time.perf_counter()
+            result = self.evaluate(snapshot)
+            elapsed = time.perf_counter() - _t
+            if callback is not None:
+                callback(result, elapsed)
+            else:
+                print(f"{datetime.datetime.now().strftime('%H:%M:%S')} 识别耗时{elapsed:.3f}s，"
+                      f"信号{result.groupby('pattern').size().to_dict()}")
+            n += 1
+        return result
+
+
+if __name__ == '__main__':
+    if len(sys.argv) >= 3 and sys.argv[1] == 'record':
+        record(sys.argv[2], int(sys.argv[3]) if len(sys.argv) >= 4 else 1,
+               float(sys.argv[4]) if len(sys.argv) >= 5 else 60)
+    elif len(sys.argv) >= 3 and sys.argv[1] == 'replay':
+        IntradayScreener(sys.argv[3] if len(sys.argv) >= 4 else None,
+                         source=RecordedSource(sys.argv[2])).poll(interval=0)
+    else:
+        IntradayScreener().poll()
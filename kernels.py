@@ -0,0 +1,178 @@
+"""
+    @author: caitao
+    @feature:
+        * 黄金台箱体及极致收敛判断的数组内核，签名统一为 (开高低收等数组, 起始行索引starts, 窗口长度lengths, 参数) -> 信号掩码
+        * 窗口为行区间[starts[i], starts[i] + lengths[i])，第一根K线为涨停（起始）日，判断第2根起的K线
+        * 后端运行时选择：已安装numba时为@njit编译的逐窗口循环，否则为numpy向量化实现；
+          'python'为未编译的同一循环，用于一致性核对；环境变量STOCKWATCHER_KERNELS或use_backend可指定
+        * 收敛均值贴近阈值时按np.mean重算，各后端结果与逐窗口np.mean判断一致
+        * 一致性测试：python -m pytest tests/test_kernels_parity.py；基准：python -m benchmarks.kernels
+"""
+import os
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+BACKENDS = ('numba', 'numpy', 'python')
+
+
+def _golden_loop(_open, _close, _amplitude, starts, lengths, amplitude, boxrange_bottom, boxrange_upper, v):
+    mask = np.zeros(starts.shape[0], dtype=np.bool_)
+    for i in range(starts.shape[0]):
+        s = starts[i]
+        if lengths[i] < 2 or not _close[s] > _open[s]:
+            continue
+        # 第一根K线柱确定箱体上下界及柱体大小限制
+        _v1 = abs(_open[s] - _close[s])
+        bottom = _v1 * boxrange_bottom + _open[s]
+        upper = _v1 * boxrange_upper + _close[s]
+        vollage = _v1 * v
+        ok = True
+        for j in range(s + 1, s + lengths[i]):
+            o, c = _open[j], _close[j]
+            if not (_amplitude[j] <= amplitude and o <= upper and c <= upper and o >= bottom and c >= bottom
+                    and abs(o - c) <= vollage):
+                ok = False
+                break
+        mask[i] = ok
+    return mask
+
+
+def _distance_loop(_high, _low, starts, lengths):
+    mean = np.full(starts.shape[0], np.nan)
+    nonzero = np.zeros(starts.shape[0], dtype=np.bool_)
+    for i in range(starts.shape[0]):
+        s = starts[i]
+        if lengths[i] < 2:
+            continue
+        total = 0.0
+        for j in range(s + 1, s + lengths[i]):
+            d = _high[j] - _low[j]
+            total += d
+            if d != 0:
+                nonzero[i] = True
+        mean[i] = total / (lengths[i] - 1)
+    return mean, nonzero
+
+
+def _gather(starts, lengths):
+    """
+    窗口行索引矩阵(窗口, 最大长度)，超出窗口的位置指向起始行并以掩码剔除；rest为第2根起的K线
+    """
+    width = max(int(lengths.max()) if lengths.size > 0 else 0, 1)
+    offset = np.arange(width)
+    inside = offset[None, :] < lengths[:, None]
+    idx = np.where(inside, starts[:, None] + offset[None, :], starts[:, None])
+    rest = inside & (offset[None, :] >= 1)
+    return idx, rest
+
+
+def _golden_numpy(_open, _close, _amplitude, starts, lengths, amplitude, boxrange_bottom, boxrange_upper, v):
+    idx, rest = _gather(starts, lengths)
+    _o, _c = _open[idx], _close[idx]
+    _o1, _c1 = _open[starts], _close[starts]
+    _v1 = np.abs(_o1 - _c1)
+    bottom = (_v1 * boxrange_bottom + _o1)[:, None]
+    upper = (_v1 * boxrange_upper + _c1)[:, None]
+    ok = (_amplitude[idx] <= amplitude) & (np.maximum(_o, _c) <= upper) & (np.minimum(_o, _c) >= bottom) & \
+         (np.abs(_o - _c) <= (_v1 * v)[:, None])
+    return (lengths >= 2) & (_c1 > _o1) & np.all(ok | ~rest, axis=1)
+
+
+def _distance_numpy(_high, _low, starts, lengths):
+    idx, rest = _gather(starts, lengths)
+    _distance = np.where(rest, _high[idx] - _low[idx], 0.0)
+    mean = np.where(lengths >= 2, _distance.sum(axis=1) / np.maximum(lengths - 1, 1), np.nan)
+    return mean, (_distance != 0).any(axis=1)
+
+
+_KERNELS = {
+    'numpy': (_golden_numpy, _distance_numpy),
+    'python': (_golden_loop, _distance_loop),
+}
+backend = None
+
+
+def use_backend(name=None):
+    """
+    :param name: 'numba' / 'numpy' / 'python'，为None时按环境变量STOCKWATCHER_KERNELS，其次已安装numba时使用numba
+    :return: 实际使用的后端
+    """
+    global backend
+    name = name or os.environ.get('STOCKWATCHER_KERNELS') or ('numba' if numba is not None else 'numpy')
+    if name not in BACKENDS:
+        raise ValueError(f"内核后端只支持{BACKENDS}：{name}")
+    if name == 'numba':
+        if numba is None:
+            raise ImportError("numba后端需先安装numba：pip install numba")
+        if 'numba' not in _KERNELS:
+            _KERNELS['numba'] = (numba.njit(cache=True)(_golden_loop), numba.njit(cache=True)(_distance_loop))
+    backend = name
+    return backend
+
+
+def current():
+    """
+    :return: 当前后端，首次调用时按use_backend()的默认规则选择
+    """
+    if backend is None:
+        use_backend()
+    return backend
+
+
+def _arrays(*arrays):
+    return [np.ascontiguousarray(a, dtype=np.float64) for a in arrays]
+
+
+def _index(starts, lengths):
+    starts = np.ascontiguousarray(starts, dtype=np.int64)
+    return starts, np.ascontiguousarray(np.broadcast_to(lengths, starts.shape), dtype=np.int64)
+
+
+def golden_mask(_open, _high, _low, _close, _amplitude, starts, lengths,
+                amplitude=15.00, boxrange_bottom=-0.01, boxrange_upper=0.8, v=0.6):
+    """
+    黄金台箱体判断，同golden.golden_filter：起始日收阳，第2根起振幅不超过amplitude，开收盘价位于箱体内，柱体不超过起始日的v倍
+    :param starts: 起始行索引
+    :param lengths: 窗口长度（含起始日），标量或与starts等长；长度不足2的窗口为False
+    :return: bool数组，与starts等长
+    """
+    starts, lengths = _index(starts, lengths)
+    _open, _close, _amplitude = _arrays(_open, _close, _amplitude)
+    return _KERNELS[current()][0](_open, _close, _amplitude, starts, lengths,
+                                float(amplitude), float(boxrange_bottom), float(boxrange_upper), float(v))
+
+
+def distance_mean(_high, _low, starts, lengths):
+    """
+    :return: mean: 窗口第2根起上下影距离（high - low）均值，长度不足2为nan；nonzero: 距离是否不全为0
+    """
+    starts, lengths = _index(starts, lengths)
+    _high, _low = _arrays(_high, _low)
+    return _KERNELS[current()][1](_high, _low, starts, lengths)
+
+
+def convergence_mask(_open, _high, _low, _close, starts, lengths, tao=0.5, zero=False, mean=None):
+    """
+    极致收敛判断：窗口第2根起上下影距离均值小于tao
+    :param zero: 为True时距离全为0的窗口同样判定收敛（trigger_v2的规则）
+    :param mean: 可选，预先计算的distance_mean输出，避免重复计算
+    :return: bool数组，与starts等长
+    """
+    starts, lengths = _index(starts, lengths)
+    _high, _low = _arrays(_high, _low)
+    _mean, nonzero = distance_mean(_high, _low, starts, lengths) if mean is None else mean
+    with np.errstate(invalid='ignore'):
+        mask = _mean < tao
+        near = np.flatnonzero((lengths >= 2) & (np.abs(_mean - tao) <= 1e-9 * max(1.0, abs(tao))))
+    # 累计和与np.mean舍入方式不同：均值贴近阈值时按np.mean重算
+    for i in near:
+        s, e = starts[i] + 1, starts[i] + lengths[i]
+        mask[i] = np.mean(_high[s:e] - _low[s:e]) < tao
+    if zero:
+        mask |= (lengths >= 2) & ~nonzero
+    return mask
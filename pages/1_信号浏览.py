@@ -0,0 +1,36 @@
+"""
+    @author: caitao
+    @feature:
+        * 浏览golden_results中的识别结果：按版本、信号日区间、股票代码筛选，查询结果按条件缓存
+"""
+import datetime
+
+import streamlit as st
+
+from dashboard import result_versions, results
+
+st.set_page_config(page_title="信号浏览")
+st.header("识别结果浏览", divider=True)
+
+versions = result_versions()
+if len(versions) == 0:
+    st.info("golden_results中暂无识别结果")
+    st.stop()
+
+# 表单提交前的控件变化不触发查询
+with st.form('results'):
+    version = st.multiselect("版本", versions, default=versions[:1])
+    _left, _right = st.columns(2)
+    start_date = _left.date_input("信号日起", datetime.date.today() - datetime.timedelta(days=90))
+    end_date = _right.date_input("信号日止", datetime.date.today())
+    tickers = st.text_input("股票代码（逗号分隔，留空为全部）")
+    st.form_submit_button("查询")
+
+codes = tuple(sorted({t.strip() for t in tickers.replace('，', ',').split(',') if t.strip()}))
+frame = results(tuple(version), start_date, end_date, codes if len(codes) > 0 else None)
+st.write(f"共{frame.shape[0]}个信号，{frame['ticker'].nunique()}只股票")
+if frame.shape[0] > 0:
+    st.bar_chart(frame.groupby('signal').size().rename('信号数'))
+st.dataframe(frame, use_container_width=True, hide_index=True)
+st.download_button("下载CSV", frame.to_csv(index=False).encode('utf-8-sig'), file_name="golden_results.csv",
+                   mime="text/csv")
@@ -0,0 +1,50 @@
+"""
+    @author: caitao
+    @feature:
+        * 按需运行scanner多形态扫描：选择检测器及参数、区间、股票代码，提交后扫描
+        * 扫描结果按条件缓存，其余控件交互及重复提交相同条件时不重新计算
+"""
+import datetime
+import inspect
+
+import streamlit as st
+
+import scanner
+from dashboard import latest_date, scan
+
+st.set_page_config(page_title="形态扫描")
+st.header("形态扫描", divider=True)
+
+names = st.multiselect("检测器", list(scanner.DETECTORS), default=list(scanner.DETECTORS))
+_last = latest_date() or datetime.date.today()
+
+with st.form('scan'):
+    _left, _right = st.columns(2)
+    start_date = _left.date_input("区间起", _last - datetime.timedelta(days=120))
+    end_date = _right.date_input("区间止", _last)
+    tickers = st.text_input("股票代码（逗号分隔，留空为全市场）")
+    # 各检测器参数，默认值取自检测器签名
+    patterns = {}
+    for name in names:
+        with st.expander(f"{name}参数"):
+            params = [p for p in inspect.signature(scanner.DETECTORS[name]).parameters.values()
+                      if p.default is not inspect.Parameter.empty]
+            _columns = st.columns(3)
+            patterns[name] = {
+                p.name: _columns[n % 3].number_input(p.name, value=p.default, key=f"{name}.{p.name}",
+                                                     step=1 if isinstance(p.default, int) else 0.01)
+                for n, p in enumerate(params)
+            }
+    submitted = st.form_submit_button("扫描")
+
+if submitted:
+    codes = tuple(sorted({t.strip() for t in tickers.replace('，', ',').split(',') if t.strip()}))
+    st.session_state['scan_args'] = (start_date, end_date, patterns, codes if len(codes) > 0 else None)
+
+if 'scan_args' in st.session_state and len(st.session_state['scan_args'][2]) > 0:
+    frame = scan(*st.session_state['scan_args'])
+    st.write(f"共{frame.shape[0]}个信号")
+    st.dataframe(frame.groupby('pattern').size().rename('信号数'))
+    st.dataframe(frame, use_container_width=True, hide_index=True)
+    st.download_button("下载CSV", frame.to_csv(index=False).encode('utf-8-sig'), file_name="scan.csv",
+                       mime="text/csv")
@@ -0,0 +1,298 @@
+"""
+    @author: caitao
+    @feature:
+        * MarketPanel：全市场行情的紧凑内存结构，价格字段float32、交易日int32，列数组按股票代码、交易日排序，
+          股票偏移索引offsets定位各股票的行区间
+        * 按名称访问字段：panel['close']为整列视图；panel.series('000001')返回单只股票序列，字段为数组视图，不复制
+        * 读取接口与SQLiteStore一致（load_arrays / load_price / load_market / tickers），可直接golden.use_store(panel)
+        * 跨进程共享：share()放入共享内存，进程池传递时只序列化共享内存名称及布局；save()/load()以内存映射读取.npy文件
+        * float32约7位有效数字：读取时按decimals（行情均为两位小数）还原为float64，价格绝对值小于65536时与数据库读取完全一致；
+          需要更高精度时float_dtype=np.float64
+"""
+import datetime
+import json
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from storage import PRICE_COLUMNS, date_to_int
+
+# 检测器所需字段；成交额、成交量数值较大，float32无法按两位小数还原，默认不载入
+PANEL_COLUMNS = ['tradeDate', 'open', 'close', 'high', 'low', 'amplitude', 'perf_percent', 'perf_amount', 'turnover']
+
+
+def _date_int(date):
+    if isinstance(date, (int, np.integer)):
+        return int(date)
+    if isinstance(date, datetime.date):
+        return date.year * 10000 + date.month * 100 + date.day
+    return date_to_int(date)
+
+
+def _layout(arrays):
+    """
+    :return: layout: list of (名称, dtype, shape, 字节偏移)，各数组按64字节对齐；size: 总字节数
+    """
+    layout, size = [], 0
+    for name, a in arrays.items():
+        size = (size + 63) // 64 * 64
+        layout.append((name, a.dtype.str, a.shape, size))
+        size += a.nbytes
+    return layout, max(size, 1)
+
+
+def _views(buffer, layout):
+    return {name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=buffer, offset=offset)
+            for name, dtype, shape, offset in layout}
+
+
+def _attach(name, layout, decimals):
+    """
+    工作进程内按名称挂载共享内存中的MarketPanel，不复制数据
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    views = _views(shm.buf, layout)
+    panel = MarketPanel(views.pop('_tickers'), views.pop('_offsets'), views, decimals)
+    panel._shm = shm
+    return panel
+
+
+class TickerSeries:
+    """
+    单只股票的行情序列：series['close'] / series.close 为按decimals还原的float64数组，series.raw('close')为面板视图
+    """
+    __slots__ = ('panel', 'ticker', 'start', 'end')
+
+    def __init__(self, panel, ticker, start, end):
+        self.panel = panel
+        self.ticker = ticker
+        self.start = start
+        self.end = end
+
+    def __len__(self):
+        return self.end - self.start
+
+    @property
+    def shape(self):
+        return self.end - self.start, len(self.panel.columns)
+
+    def __getitem__(self, name):
+        return self.panel.values(name, self.start, self.end)
+
+    def __getattr__(self, name):
+        if name in TickerSeries.__slots__ or name.startswith('_'):
+            raise AttributeError(name)
+        if name not in self.panel.columns:
+            raise AttributeError(f"MarketPanel无字段{name}")
+        return self[name]
+
+    def raw(self, name):
+        return self.panel[name][self.start:self.end]
+
+    def window(self, offset, length):
+        """
+        :return: 自第offset根K线起、最多length根K线的子序列
+        """
+        start = min(self.start + offset, self.end)
+        return TickerSeries(self.panel, self.ticker, start, min(start + length, self.end))
+
+    def arrays(self, columns=None):
+        """
+        :return: dict(column -> np.ndarray)，同SQLiteStore.load_arrays单只股票的输出
+        """
+        columns = self.panel.columns if columns is None else columns
+        arrays = {}
+        for c in columns:
+            arrays[c] = np.full(len(self), self.ticker, dtype=object) if c == 'ticker' else self[c]
+        return arrays
+
+    def to_frame(self, columns=None):
+        return pd.DataFrame(self.arrays(columns))
+
+
+class MarketPanel:
+    """
+    :param codes: 股票代码数组（定长unicode），升序
+    :param offsets: int64数组，长度len(codes) + 1，第i只股票的行区间为[offsets[i], offsets[i + 1])
+    :param data: dict(column -> np.ndarray)，tradeDate为int32 yyyymmdd，其余为float32 / float64
+    :param decimals: float32字段读取时还原的小数位数，为None时不取整
+    """
+    __slots__ = ('codes', 'offsets', 'columns', 'decimals', '_data', '_index', '_shm', '_path')
+
+    def __init__(self, codes, offsets, data, decimals=2):
+        self.codes = codes
+        self.offsets = offsets
+        self._data = data
+        self.columns = list(data)
+        self.decimals = decimals
+        self._index = {t: i for i, t in enumerate(codes.tolist())}
+        self._shm = None
+        self._path = None
+
+    @classmethod
+    def from_arrays(cls, arrays, columns=PANEL_COLUMNS, float_dtype=np.float32, decimals=2):
+        """
+        :param arrays: dict(column -> np.ndarray)，需含ticker、tradeDate，按股票代码、交易日排序（同load_arrays的输出）
+        """
+        columns = list(dict.fromkeys(['tradeDate'] + [c for c in columns if c != 'ticker']))
+        ticker = arrays['ticker']
+        n = ticker.size
+        _starts = np.r_[0, np.flatnonzero(ticker[1:] != ticker[:-1]) + 1] if n > 0 else np.array([], dtype=np.int64)
+        codes = np.array(ticker[_starts].tolist(), dtype=str) if n > 0 else np.array([], dtype='<U6')
+        offsets = np.r_[_starts, n].astype(np.int64)
+        data = {c: np.ascontiguousarray(arrays[c], dtype=np.int32 if c == 'tradeDate' else float_dtype)
+                for c in columns}
+        return cls(codes, offsets, data, decimals)
+
+    @classmethod
+    def from_store(cls, store, start_date, end_date, columns=PANEL_COLUMNS, float_dtype=np.float32, decimals=2):
+        """
+        一次读取区间内全市场行情构建面板
+        :param store: SQLiteStore / ParquetStore
+        """
+        _columns = list(dict.fromkeys(['ticker', 'tradeDate'] + list(columns)))
+        return cls.from_arrays(store.load_arrays(start_date, end_date, columns=_columns), columns, float_dtype,
+                               decimals)
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def __contains__(self, code):
+        return code in self._index
+
+    def __getitem__(self, name):
+        return self._data[name]
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self._data.values()) + self.codes.nbytes + self.offsets.nbytes
+
+    def values(self, name, start=0, end=None):
+        """
+        :return: 字段第[start, end)行，float32字段按decimals还原为float64
+        """
+        v = self._data[name][start:end]
+        if name == 'tradeDate' or v.dtype == np.float64:
+            return v
+        v = v.astype(np.float64)
+        return v if self.decimals is None else np.round(v, self.decimals)
+
+    def bounds(self, code, start_date=None, end_date=None):
+        """
+        :return: (start, end)，该股票区间内K线的行区间，股票不存在时为(0, 0)
+        """
+        i = self._index.get(code)
+        if i is None:
+            return 0, 0
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        dates = self._data['tradeDate'][start:end]
+        _start = start + (0 if start_date is None else int(np.searchsorted(dates, _date_int(start_date), 'left')))
+        _end = start + (end - start if end_date is None else int(np.searchsorted(dates, _date_int(end_date), 'right')))
+        return _start, max(_start, _end)
+
+    def series(self, code, start_date=None, end_date=None):
+        return TickerSeries(self, code, *self.bounds(code, start_date, end_date))
+
+    def _requested(self, columns):
+        if columns is None:
+            return [c for c in PRICE_COLUMNS if c == 'ticker' or c in self.columns]
+        return list(columns)
+
+    def load_arrays(self, start_date, end_date, code=None, columns=None):
+        """
+        同SQLiteStore.load_arrays；columns为None时返回面板内全部字段
+        """
+        columns = self._requested(columns)
+        if code is not None:
+            return self.series(code, start_date, end_date).arrays(columns)
+        dates = self._data['tradeDate']
+        rows = np.flatnonzero((dates >= _date_int(start_date)) & (dates <= _date_int(end_date)))
+        arrays = {}
+        for c in columns:
+            if c == 'ticker':
+                arrays[c] = np.repeat(self.codes.astype(object), np.diff(self.offsets))[rows]
+            else:
+                v = self._data[c][rows]
+                arrays[c] = v if c == 'tradeDate' or v.dtype == np.float64 or self.decimals is None \
+                    else np.round(v.astype(np.float64), self.decimals)
+        return arrays
+
+    def load_price(self, code, start_date, end_date, columns=None):
+        return pd.DataFrame(self.load_arrays(start_date, end_date, code, columns))
+
+    def load_market(self, start_date, end_date, columns=None):
+        return pd.DataFrame(self.load_arrays(start_date, end_date, None, columns))
+
+    def tickers(self):
+        """
+        :return: list，面板内全部股票代码
+        """
+        return self.codes.tolist()
+
+    def _arrays(self):
+        return {'_tickers': self.codes, '_offsets': self.offsets, **self._data}
+
+    def share(self):
+        """
+        复制到共享内存，返回共享内存上的MarketPanel；进程池传递时工作进程按名称挂载，不复制数据
+        创建方用完后需调用unlink()释放
+        """
+        arrays = self._arrays()
+        layout, size = _layout(arrays)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        views = _views(shm.buf, layout)
+        for name, a in arrays.items():
+            views[name][...] = a
+        panel = MarketPanel(views.pop('_tickers'), views.pop('_offsets'), views, self.decimals)
+        panel._shm = shm
+        return panel
+
+    def close(self):
+        """
+        释放本进程对共享内存的映射，此后不可再访问面板数据
+        """
+        if self._shm is not None:
+            self._data, self.codes, self.offsets = {}, np.array([], dtype='<U6'), np.zeros(1, dtype=np.int64)
+            self._shm.close()
+            self._shm = None
+
+    def unlink(self):
+        """
+        创建方释放共享内存
+        """
+        if self._shm is not None:
+            shm = self._shm
+            self.close()
+            shm.unlink()
+
+    def save(self, path):
+        """
+        写入目录：每个字段一个.npy文件及meta.json，load时以内存映射读取
+        """
+        os.makedirs(path, exist_ok=True)
+        for name, a in self._arrays().items():
+            np.save(os.path.join(path, f"{name}.npy"), a)
+        with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'columns': self.columns, 'decimals': self.decimals}, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        mode = 'r' if mmap else None
+
+        def _load(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)
+        panel = cls(_load('_tickers'), _load('_offsets'), {c: _load(c) for c in meta['columns']}, meta['decimals'])
+        panel._path = path if mmap else None
+        return panel
+
+    def __reduce__(self):
+        # 共享内存 / 内存映射的面板只传递名称或路径，工作进程重新挂载
+        if self._shm is not None:
+            return _attach, (self._shm.name, _layout(self._arrays())[0], self.decimals)
+        if self._path is not None:
+            return MarketPanel.load, (self._path, True)
+        return MarketPanel, (self.codes, self.offsets, self._data, self.decimals)
@@ -0,0 +1,162 @@
+"""
+    @author: caitao
+    @feature:
+        * 识别及同步流程的分段计时与计数：stage('名称')累计耗时，count('名称', n)累计数量，timed装饰器记录单只股票耗时
+        * 默认关闭：关闭时stage返回共享的空上下文，count、observe直接返回，开销接近于零
+        * summary()汇总各阶段调用次数及耗时、计数、单只股票耗时分位数，to_json输出JSON
+        * 线程安全；process模式下工作进程内的统计不回传主进程，分析时请使用thread或serial模式
+        * 用法：with profiling.profile('profile.json'): goldenFilterThreads(...)
+"""
+import contextlib
+import functools
+import json
+import threading
+import time
+
+import numpy as np
+
+_enabled = False
+_lock = threading.Lock()
+# 阶段名称 -> [调用次数, 累计秒数]
+_stages = {}
+_counters = {}
+# 名称 -> 单次耗时秒数列表
+_latency = {}
+_NULL = contextlib.nullcontext()
+
+
+def enabled():
+    return _enabled
+
+
+def enable(reset=True):
+    global _enabled
+    if reset:
+        clear()
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def clear():
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+        _latency.clear()
+
+
+class _Stage:
+    __slots__ = ('name', '_start')
+
+    def __init__(self, name):
+        self.name = name
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self._start
+        with _lock:
+            _stage = _stages.setdefault(self.name, [0, 0.0])
+            _stage[0] += 1
+            _stage[1] += elapsed
+        return False
+
+
+def stage(name):
+    """
+    阶段计时：with stage('sqlite.query'): ...
+    """
+    if not _enabled:
+        return _NULL
+    return _Stage(name)
+
+
+def count(name, n=1):
+    """
+    累计计数，如读取行数、评估窗口数、输出信号数
+    """
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def observe(name, seconds):
+    """
+    记录单次耗时，汇总时计算分位数
+    """
+    if not _enabled:
+        return
+    with _lock:
+        _latency.setdefault(name, []).append(seconds)
+
+
+def timed(name):
+    """
+    装饰器：开启时记录每次调用耗时（如单只股票识别耗时），关闭时直接调用
+    """
+    def _decorator(func):
+        @functools.wraps(func)
+        def _wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            _start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - _start)
+        return _wrapper
+    return _decorator
+
+
+def summary():
+    """
+    :return: dict(stages: 名称 -> 调用次数/累计秒数/平均毫秒, counters: 名称 -> 数量,
+                  latency: 名称 -> 次数/平均及p50、p90、p99、最大毫秒)
+    """
+    with _lock:
+        stages = {k: list(v) for k, v in _stages.items()}
+        counters = dict(_counters)
+        latency = {k: np.array(v) * 1000 for k, v in _latency.items()}
+    return {
+        'stages': {k: {'calls': n, 'seconds': round(s, 6), 'mean_ms': round(s / n * 1000, 4)}
+                   for k, (n, s) in sorted(stages.items(), key=lambda x: -x[1][1])},
+        'counters': counters,
+        'latency': {k: {'count': int(v.size), 'mean_ms': round(float(v.mean()), 4),
+                        'p50_ms': round(float(np.percentile(v, 50)), 4),
+                        'p90_ms': round(float(np.percentile(v, 90)), 4),
+                        'p99_ms': round(float(np.percentile(v, 99)), 4),
+                        'max_ms': round(float(v.max()), 4)} for k, v in latency.items() if v.size > 0},
+    }
+
+
+def to_json(path=None, indent=2):
+    """
+    :param path: 输出文件，为None时只返回JSON字符串
+    """
+    _json = json.dumps(summary(), ensure_ascii=False, indent=indent)
+    if path is not None:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(_json)
+    return _json
+
+
+@contextlib.contextmanager
+def profile(path=None):
+    """
+    代码块内开启分析，退出后关闭；统计保留至下次开启，可继续调用summary
+    :param path: 退出时写入的JSON文件
+    """
+    enable()
+    try:
+        yield
+    finally:
+        disable()
+        if path is not None:
+            to_json(path)
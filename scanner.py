@@ -0,0 +1,261 @@
+"""
+    @author: caitao
+    @feature:
+        * 多形态单次扫描：区间行情只读取一次，各检测器共用涨停掩码、上下影距离、柱体大小等中间数组
+        * 检测器注册：@register('名称') 装饰 detector(ctx, **params)，返回golden_results格式的记录
+        * 内置检测器：golden（黄金台，同trigger_v2）、convergence（极致收敛，同amplitude_convergence）
+        * 扫描结果为单个DataFrame，pattern列标记信号来源
+        * 检测器声明起始日涨幅阈值及窗口参数时，全市场扫描经涨停事件表只读取各事件日起的候选窗口
+"""
+import datetime
+import inspect
+
+import numpy as np
+import pandas as pd
+
+import golden
+import profiling
+from storage import int_to_str
+from utilities import EVENT_FLOOR, classify_quota
+
+RECORD_COLUMNS = ['ticker', 'trigger_date', 'signal', 'metric']
+SCAN_COLUMNS = ['ticker', 'tradeDate', 'open', 'close', 'high', 'low', 'amplitude', 'perf_percent']
+
+# 检测器注册表：名称 -> detector(ctx, **params)
+DETECTORS = {}
+# 可经涨停事件表定位候选的检测器：名称 -> (起始日涨幅阈值参数名, 窗口长度上限参数名)
+EVENT_PARAMS = {}
+
+
+def register(name, thresholds=None, window=None):
+    """
+    注册检测器，detector(ctx, **params) 返回 dict(ticker, trigger_date, signal, metric -> list)
+    :param thresholds: 起始日涨幅阈值的参数名；检测器只从涨幅超过阈值的K线起判断时声明，可经事件表只读取候选窗口
+    :param window: 起始日起窗口K线数量上限（不含）的参数名
+    """
+    def _register(func):
+        DETECTORS[name] = func
+        if thresholds is not None and window is not None:
+            EVENT_PARAMS[name] = (tuple(thresholds), window)
+        return func
+    return _register
+
+
+def event_plan(patterns):
+    """
+    :param patterns: dict(名称 -> 参数dict)
+    :return: (窗口K线数量, 涨幅下限)；存在未声明事件参数的检测器或阈值低于EVENT_FLOOR时返回None
+    """
+    bars, floor = 0, np.inf
+    for name, params in patterns.items():
+        if name not in EVENT_PARAMS:
+            return None
+        thresholds, window = EVENT_PARAMS[name]
+        _params = {k: p.default for k, p in inspect.signature(DETECTORS[name]).parameters.items()
+                   if p.default is not inspect.Parameter.empty}
+        _params.update(params)
+        floor = min([floor] + [float(_params[t]) for t in thresholds])
+        bars = max(bars, int(_params[window]))
+    if len(patterns) == 0 or floor < EVENT_FLOOR:
+        return None
+    return bars, floor
+
+
+class ScanContext:
+    """
+    一次读取的行情数组及共享中间结果，按股票代码、交易日排序
+    :param arrays: dict(column -> np.ndarray)，store.load_arrays的输出
+    """
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self._cache = {}
+        ticker = arrays['ticker']
+        n = ticker.shape[0]
+        _bounds = np.flatnonzero(ticker[1:] != ticker[:-1]) + 1
+        _starts = np.r_[0, _bounds] if n > 0 else np.array([], dtype=np.int64)
+        _ends = np.r_[_bounds, n] if n > 0 else np.array([], dtype=np.int64)
+        # 每行所在股票分段的结束位置，及是否创业板、科创板
+        self.seg_end = np.repeat(_ends, _ends - _starts)
+        self.radical = np.repeat(classify_quota(ticker[_starts]) == 'radical', _ends - _starts)
+
+    def __getitem__(self, column):
+        return self.arrays[column]
+
+    def __len__(self):
+        return self.arrays['ticker'].shape[0]
+
+    def shared(self, key, func):
+        """
+        按key缓存中间结果，首次访问时计算
+        """
+        if key not in self._cache:
+            self._cache[key] = func()
+        return self._cache[key]
+
+    @property
+    def distance(self):
+        """
+        上下影距离 high - low
+        """
+        return self.shared('distance', lambda: self['high'] - self['low'])
+
+    @property
+    def distance_cumsum(self):
+        """
+        上下影距离前缀和，首位补0：行[a, b)的距离和为cumsum[b] - cumsum[a]
+        """
+        return self.shared('distance_cumsum', lambda: np.r_[0.0, np.cumsum(self.distance)])
+
+    @property
+    def body(self):
+        """
+        柱体大小 |open - close|
+        """
+        return self.shared('body', lambda: np.abs(self['open'] - self['close']))
+
+    def limit_up(self, main_bottom=9.97, main_upper=11.00, star_bottom=19.97, star_upper=21.00):
+        """
+        :return: 涨停日行索引：创业板、科创板使用star区间，其余使用main区间
+        """
+        def _limit_up():
+            _perf = self['perf_percent']
+            return np.flatnonzero(np.where(self.radical,
+                                           (_perf > star_bottom) & (_perf < star_upper),
+                                           (_perf > main_bottom) & (_perf < main_upper)))
+        return self.shared(('limit_up', main_bottom, main_upper, star_bottom, star_upper), _limit_up)
+
+    def rise(self, increase_range=9.9):
+        """
+        :return: 涨幅超过increase_range的行索引
+        """
+        return self.shared(('rise', increase_range), lambda: np.flatnonzero(self['perf_percent'] > increase_range))
+
+    def records(self, rows, trigger, metric):
+        """
+        :param rows: 信号日行索引
+        :param trigger: 对应的起始（涨停）日行索引
+        :param metric: 对应的指标值
+        :return: dict(ticker, trigger_date, signal, metric -> list)
+        """
+        _date = self['tradeDate']
+        return {'ticker': self['ticker'][rows].tolist(), 'trigger_date': int_to_str(_date[trigger]),
+                'signal': int_to_str(_date[rows]), 'metric': np.asarray(metric, dtype=np.float64).tolist()}
+
+
+@register('golden', thresholds=('main_bottom', 'star_bottom'), window='end_window')
+def golden_detector(ctx, main_bottom=9.97, main_upper=11.00, star_bottom=19.97, star_upper=21.00,
+                    amplitude=15.00, boxrange_bottom=-0.01, boxrange_upper=0.8, v=0.6,
+                    tao=0.5, start_window=5, end_window=11):
+    """
+    黄金台：与trigger_v2的信号日一致，同一股票同一信号日只保留一次，取最早的涨停日；metric为涨停日至信号日的K线数量
+    """
+    cand = ctx.limit_up(main_bottom, main_upper, star_bottom, star_upper)
+    hit, length = golden.window_signals(ctx['open'], ctx['close'], ctx['high'], ctx['low'], ctx['amplitude'],
+                                        cand, ctx.seg_end[cand] - cand,
+                                        amplitude, boxrange_bottom, boxrange_upper, v, tao, start_window, end_window,
+                                        distance=ctx.distance, body=ctx.body)
+    _i, _w = np.nonzero(hit)
+    rows, first = np.unique(cand[_i] + length[_i, _w] - 1, return_index=True)
+    trigger = cand[_i][first]
+    return ctx.records(rows, trigger, rows - trigger + 1)
+
+
+@register('convergence', thresholds=('increase_range',), window='max_window')
+def convergence_detector(ctx, increase_range=9.9, min_window=6, max_window=10, tao=0.5):
+    """
+    极致收敛：与amplitude_convergence一致，每个起始日取首个均值低于tao的窗口；metric为上下影距离均值
+    """
+    cand = ctx.rise(increase_range)
+    windows = np.arange(int(min_window), int(max_window))
+    if cand.size == 0 or windows.size == 0:
+        return ctx.records([], [], [])
+
+    # 窗口[s, s + length)内第2根起的上下影距离均值
+    length = np.minimum((ctx.seg_end[cand] - cand)[:, None], windows[None, :])
+    valid = length >= min_window - 1
+    _n = length - 1
+    _cumsum = ctx.distance_cumsum
+    _sum = _cumsum[cand[:, None] + length] - _cumsum[cand[:, None] + 1]
+    _mean = np.where(_n > 0, _sum / np.maximum(_n, 1), np.nan)
+    below = valid & (_mean < tao)
+
+    # 前缀和与逐窗口np.mean存在舍入差异，均值贴近阈值时按np.mean重算
+    _distance = ctx.distance
+    for r, k in zip(*np.nonzero(valid & (_n > 0) & (np.abs(_mean - tao) <= 1e-7 * max(1.0, abs(tao))))):
+        below[r, k] = np.mean(_distance[cand[r] + 1:cand[r] + length[r, k]]) < tao
+
+    hit = np.flatnonzero(below.any(axis=1))
+    k = np.argmax(below[hit], axis=1)
+    trigger = cand[hit]
+    rows = trigger + length[hit, k] - 1
+    metric = [np.mean(_distance[s + 1:e + 1]) for s, e in zip(trigger, rows)]
+    return ctx.records(rows, trigger, metric)
+
+
+def load_context(start_date, end_date, codes=None, store=None):
+    """
+    :param codes: 股票代码或代码列表，为None时读取全市场
+    :return: ScanContext
+    """
+    store = golden.store if store is None else store
+    if isinstance(codes, str):
+        return ScanContext(store.load_arrays(start_date, end_date, codes, SCAN_COLUMNS))
+    arrays = store.load_arrays(start_date, end_date, None, SCAN_COLUMNS)
+    if codes is not None:
+        keep = np.isin(arrays['ticker'], list(codes))
+        arrays = {c: v[keep] for c, v in arrays.items()}
+    return ScanContext(arrays)
+
+
+def load_event_context(start_date, end_date, bars, codes=None, store=None, floor=EVENT_FLOOR):
+    """
+    只读取区间内各涨停事件日起的bars根K线；窗口不超过bars的检测器结果与load_context一致
+    :param floor: 事件涨幅下限
+    :return: ScanContext
+    """
+    store = golden.store if store is None else store
+    events = store.load_events(start_date, end_date, codes, floor)
+    return ScanContext(store.load_windows(events, bars, end_date, SCAN_COLUMNS))
+
+
+def scan(start_date, end_date, patterns=None, codes=None, store=None, sink=None, events=None):
+    """
+    单次读取行情，依次运行各检测器
+    :param patterns: dict(名称 -> 参数dict) 或名称列表，默认全部已注册检测器使用默认参数
+    :param codes: 股票代码或代码列表，为None时扫描全市场
+    :param sink: 结果写入回调 sink(pattern, records)，如 lambda p, r: ResultWriter(engine, p).write(r)
+    :param events: 是否经涨停事件表只读取候选窗口；为None时行情存储已建立事件表且各检测器支持即启用
+    :return: pd.DataFrame(columns=['pattern', 'ticker', 'trigger_date', 'signal', 'metric'])
+    """
+    patterns = {name: {} for name in DETECTORS} if patterns is None else patterns
+    patterns = {name: {} for name in patterns} if not isinstance(patterns, dict) else patterns
+    store = golden.store if store is None else store
+    plan = event_plan(patterns)
+    if events is None:
+        events = plan is not None and hasattr(store, 'has_events') and store.has_events()
+    elif events and plan is None:
+        raise ValueError(f"检测器未声明事件参数或涨幅阈值低于{EVENT_FLOOR}，无法经涨停事件表扫描")
+    with profiling.stage('scan.read'):
+        if events:
+            ctx = load_event_context(start_date, end_date, plan[0], codes, store, plan[1])
+        else:
+            ctx = load_context(start_date, end_date, codes, store)
+    frames = []
+    for name, params in patterns.items():
+        with profiling.stage(f'scan.{name}'):
+            records = DETECTORS[name](ctx, **params)
+        profiling.count(f'scan.{name}.signals', len(records['ticker']))
+        if sink is not None:
+            sink(name, records)
+        frame = pd.DataFrame(records, columns=RECORD_COLUMNS)
+        frame.insert(0, 'pattern', name)
+        frames.append(frame)
+    if len(frames) == 0:
+        return pd.DataFrame(columns=['pattern'] + RECORD_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+if __name__ == '__main__':
+    _signals = scan(datetime.date(2024, 1, 1), datetime.date(2024, 12, 31))
+    print(_signals.groupby('pattern').size())
@@ -1,99 +1,94 @@
 import datetime
-import time
 
-import sqlalchemy
 import streamlit as st
 import pandas as pd
-import akshare as ak
-from sqlalchemy.orm import sessionmaker
-from utilities import Market, stock_markert, get_price
+import profiling
+from dashboard import clear_data, jobs, latest_date, load_calendar, load_engine
+from sync_job import SyncJob
+
+
+def show_profile(summary):
+    """
+    展示profiling.summary()：各阶段耗时、计数、单只股票耗时分位数，及JSON下载
+    """
+    st.markdown("### 性能分析")
+    if len(summary['stages']) > 0:
+        st.dataframe(pd.DataFrame(summary['stages']).T)
+    if len(summary['latency']) > 0:
+        st.dataframe(pd.DataFrame(summary['latency']).T)
+    if len(summary['counters']) > 0:
+        st.dataframe(pd.Series(summary['counters'], name='count'))
+    with st.expander("JSON"):
+        st.json(summary)
+    st.download_button("下载性能分析JSON", profiling.to_json(), file_name="profile.json", mime="application/json")
+
+
+def show_job(job):
+    """
+    同步任务状态：进行中显示进度及取消按钮，结束后显示写入行数、失败股票及新增信号
+    """
+    state = job.snapshot()
+    if state['status'] == 'running':
+        st.progress(state['done'] / max(state['total'], 1),
+                    text=f"{state['stage']}：{state['done']}/{state['total']}，已写入{state['rows']}行")
+        if st.button("取消同步"):
+            job.cancel()
+            st.info("已取消，正在写入已抓取的行情...")
+        st.session_state['sync_watch'] = id(job)
+        return
+    # 任务结束后使缓存的最新行情日期、识别结果失效（进程内一次），观察进度的会话整页重新运行一次
+    if jobs().get('sync_cleared') != id(job):
+        jobs()['sync_cleared'] = id(job)
+        clear_data()
+    if st.session_state.pop('sync_watch', None) == id(job):
+        st.rerun()
+    if state['status'] == 'failed':
+        st.error(f"同步失败，已写入{state['rows']}行，再次更新时跳过已提交的股票")
+        st.code(state['error'])
+    elif state['status'] == 'cancelled':
+        st.warning(f"同步已取消，已写入{state['rows']}行，再次更新时跳过已提交的股票")
+    else:
+        st.success(f"行情数据下载完成, 共写入{state['rows']}行数据")
+    for e in state['errors']:
+        st.write(f"{e['item']}: {e['error']}")
+    for version, n in state['counts'].items():
+        st.write(f"{version}: 新增信号{n}个")
+    if state['profile'] is not None:
+        show_profile(state['profile'])
 
-# 连接本地数据库
-st.session_state['engine'] = sqlalchemy.create_engine('sqlite:///stockwatcher.db', echo=False)
-Session = sessionmaker(bind=st.session_state['engine'])
-st.session_state['session'] = Session()
 
 st.set_page_config(page_title="更新行情数据")
+st.session_state['engine'] = load_engine()
 # st.sidebar.success("可切换不同页面，进行不同分析")
 
 st.header("欢迎使用股票监控器！", divider=True)
 
 # 行情数据处理
 st.markdown("### 行情数据准备")
-# 查询最新行情日期
-last_date = pd.to_datetime(
-    st.session_state['session'].query(Market.tradeDate).order_by(Market.tradeDate.desc()).first()[0],
-    format="%Y-%m-%d").date()
+# 查询最新行情日期（缓存，同步完成后失效）
+last_date = latest_date()
 st.write(f"最新行情数据日期为：{last_date}")
 # 获取交易日
-trade = ak.tool_trade_date_hist_sina()['trade_date']
-start_date = trade[trade[trade == last_date].index + 1].item()  # datetime.date
+start_date = load_calendar().next(last_date) if last_date is not None else None  # datetime.date
 end_date = datetime.datetime.today().date()
 
-if start_date > end_date:
-    getTrade = st.button("更新行情数据", disabled=True, )
-else:
-    getTrade = st.button("更新行情数据")
-# 执行数据同步
-if getTrade:
-    with st.spinner(f"等待爬虫抓取全A[{start_date} 至 {end_date}]数据，请勿关闭页面，约耗时1h..."):
-        # marketdata, _ = update_marketdata_daily(start_date.strftime("%Y%m%d"), end_date.strftime("%Y%m%d"))
-        stock = ak.stock_zh_a_spot_em()[['代码', '名称']]
-        stock['market'] = stock['代码'].apply(lambda x: stock_markert(x))
-        stock = stock[stock['market'] != 'bj']
-        my_bar = st.progress(0, text="行情数据爬取中")
-
-        results = []
-        error_p = []
-        error = []
-        for percent, i in enumerate(stock['代码'].to_list()):
-            try:
-                _b = get_price(i, start_date.strftime("%Y%m%d"), end_date.strftime("%Y%m%d"))
-                results.append(_b)
-            except Exception as e:
-                error.append(i)
-                error_p.append({'code': i, 'start': start_date, 'end': end_date, 'error': e})
-            _p = percent / len(stock['代码'].to_list())
-            my_bar.progress(_p, text='行情数据爬取中')
-
-        time.sleep(0.5)
-        my_bar.empty()
-
-        if len(error) > 0:
-            time.sleep(10)
-            for code in error:
-                try:
-                    _b = get_price(i, start_date.strftime("%Y%m%d"), end_date.strftime("%Y%m%d"))
-                    results.append(_b)
-                except Exception as e:
-                    st.write(code)
-        marketdata = pd.concat(results)
-        marketdata = marketdata.rename(columns={
-            '日期': 'tradeDate', '股票代码': 'ticker', '开盘': 'open', '收盘': 'close',
-            '最高': 'high', '最低': 'low', '成交量': 'volumn', '成交额': 'amount',
-            '振幅': 'amplitude', '涨跌幅': 'perf_percent', '涨跌额': 'perf_amount',
-            '换手率': 'turnover'
-        })
-        marketdata['createtime'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        marketdata['updatetime'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        d_type = {
-            'tradeDate': sqlalchemy.types.Text, 'ticker': sqlalchemy.types.Text, 'open': sqlalchemy.types.REAL,
-            'close': sqlalchemy.types.REAL, 'high': sqlalchemy.types.REAL, 'low': sqlalchemy.types.REAL,
-            'volumn': sqlalchemy.types.REAL, 'amount': sqlalchemy.types.REAL, 'amplitude': sqlalchemy.types.REAL,
-            'perf_percent': sqlalchemy.types.REAL, 'perf_amount': sqlalchemy.types.REAL,
-            'turnover': sqlalchemy.types.REAL,
-            'createtime': sqlalchemy.types.Text, 'updatetime': sqlalchemy.types.Text
-        }
-        try:
-            marketdata.to_sql('marketData_daily', st.session_state['engine'], if_exists='append', index=False,
-                              dtype=d_type,
-                              chunksize=100000)
-            st.success(f"行情数据下载完成, 共写入{marketdata.shape[0]}行数据")
-        except Exception as e:
-            print(e)
-st.divider()
-
+job = jobs().get('sync')
+running = job is not None and job.running
+getTrade = st.button("更新行情数据", disabled=running or start_date is None or start_date > end_date)
+profile = st.checkbox("记录性能分析（抓取、写入、增量识别各阶段耗时）", disabled=running)
+# 后台执行数据同步：抓取、分批写入及增量识别不阻塞页面，中断后再次更新时跳过已提交的股票
+if getTrade and not running:
+    job = SyncJob(st.session_state['engine'], start_date, end_date, profile=profile).start()
+    jobs()['sync'] = job
+    running = True
 
 
+@st.fragment(run_every=1.0 if running else None)
+def sync_status():
+    _job = jobs().get('sync')
+    if _job is not None:
+        show_job(_job)
 
 
+sync_status()
+st.divider()
@@ -0,0 +1,540 @@
+"""
+    @author: caitao
+    @feature:
+        * 行情读取层：只读取分析所需字段（不含id、审计字段），交易日统一返回整数yyyymmdd
+        * 可选紧凑存储marketData_daily_int：交易日存为整数，读取时免去日期字符串解析
+        * 转换工具：python storage.py convert [stockwatcher.db]
+        * 列式存储ParquetStore：按年份分区，内存映射读取，交易日/股票代码谓词下推，与SQLiteStore接口一致
+        * 导出/导入工具：python storage.py export stockwatcher.db parquet目录 / python storage.py import parquet目录 stockwatcher.db
+        * 增量读取：last_dates各股票最新交易日，load_tail各股票水位之后的新K线及水位前bars根K线
+        * 读取计时（查询、解析）及读取行数经profiling记录
+        * 涨停事件索引：load_events读取limitup_events，load_windows只读取各事件日起的若干根K线
+        * 本地复权：SQLiteStore(engine, adjust='qfq'/'hfq'/'raw')读取marketData_raw，按adj_factor向量化换算价格
+"""
+import datetime
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+import sqlalchemy
+from sqlalchemy import inspect, text
+
+import profiling
+from utilities import (EVENT_FLOOR, AdjFactor, Base, LimitUpEvent, Market, MarketRaw, MarketTyped, MarketWriter,
+                       migrate_marketdata)
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# 分析所用字段，顺序与原先删除id、createtime、updatetime后的行情一致
+PRICE_COLUMNS = ['tradeDate', 'ticker', 'open', 'close', 'high', 'low', 'amount', 'amplitude',
+                 'perf_percent', 'perf_amount', 'volumn', 'turnover']
+# 随复权换算的价格字段；振幅、涨跌幅为比例，成交量、成交额、换手率不受复权影响
+ADJUST_COLUMNS = ['open', 'close', 'high', 'low', 'perf_amount']
+
+
+def date_to_int(date):
+    """
+    :param date: datetime.date / "YYYY-MM-DD" / "YYYYMMDD"
+    :return: int yyyymmdd
+    """
+    return int(pd.to_datetime(date).strftime('%Y%m%d'))
+
+
+def int_to_date(values):
+    """
+    整数交易日转换为datetime.date列表，仅用于输出信号等少量行
+    """
+    return [datetime.date(int(v) // 10000, int(v) // 100 % 100, int(v) % 100) for v in values]
+
+
+def int_to_str(values):
+    """
+    整数交易日转换为"YYYY-MM-DD"列表
+    """
+    return [f"{int(v) // 10000:04d}-{int(v) // 100 % 100:02d}-{int(v) % 100:02d}" for v in values]
+
+
+def adjust_arrays(arrays, factors, adjust):
+    """
+    不复权行情按复权因子换算：后复权 = 不复权 * 因子，前复权 = 不复权 * 因子 / 该股票最新因子
+    各K线取生效日不晚于其交易日的最后一个因子，早于首个因子或无因子的K线因子视为1
+    :param arrays: dict(column -> np.ndarray)，需含ticker、tradeDate
+    :param factors: dict(ticker, tradeDate, factor -> np.ndarray)，按股票代码、生效日排序
+    :param adjust: 'hfq' / 'qfq' / 'raw'
+    :return: dict(column -> np.ndarray)，ADJUST_COLUMNS换算后的新数组，其余字段不变
+    """
+    if adjust not in ('hfq', 'qfq', 'raw'):
+        raise ValueError(f"adjust只支持'hfq'、'qfq'、'raw'：{adjust}")
+    ticker = arrays['ticker']
+    if adjust == 'raw' or ticker.size == 0:
+        return arrays
+    codes = np.unique(np.concatenate([ticker, factors['ticker']]))
+    _row = np.searchsorted(codes, ticker).astype(np.int64)
+    _code = np.searchsorted(codes, factors['ticker']).astype(np.int64)
+    # (股票序号, 交易日)合成单调键，一次searchsorted定位各K线的生效因子
+    _key = _code * 100000000 + factors['tradeDate'].astype(np.int64)
+    pos = np.searchsorted(_key, _row * 100000000 + arrays['tradeDate'].astype(np.int64), side='right') - 1
+    _pos = np.maximum(pos, 0)
+    valid = (pos >= 0) & (_code[_pos] == _row) if _key.size > 0 else np.zeros(ticker.size, dtype=bool)
+    factor = np.where(valid, factors['factor'][_pos] if _key.size > 0 else 1.0, 1.0)
+    if adjust == 'qfq':
+        latest = np.ones(codes.size)
+        _last = np.r_[_code[1:] != _code[:-1], True] if _code.size > 0 else np.array([], dtype=bool)
+        latest[_code[_last]] = factors['factor'][_last]
+        factor = factor / latest[_row]
+    adjusted = dict(arrays)
+    for c in ADJUST_COLUMNS:
+        if c in adjusted:
+            adjusted[c] = adjusted[c] * factor
+    return adjusted
+
+
+class SQLiteStore:
+    """
+    SQLite行情读取
+    :param engine: sqlalchemy engine
+    :param schema: 'text' 读取marketData_daily；'int' 读取marketData_daily_int；None 按是否已转换自动选择
+    :param adjust: None 读取marketData_daily（后复权下载）；'hfq' / 'qfq' / 'raw' 读取marketData_raw，
+                   按adj_factor在读取时换算为后复权 / 前复权 / 不复权价格
+    """
+
+    def __init__(self, engine, schema=None, adjust=None):
+        if adjust not in (None, 'hfq', 'qfq', 'raw'):
+            raise ValueError(f"adjust只支持None、'hfq'、'qfq'、'raw'：{adjust}")
+        self.engine = engine
+        self.adjust = adjust
+        self._schema = 'text' if adjust is not None else schema
+        self._events = False
+        self._factors = False
+
+    @property
+    def schema(self):
+        if self._schema is None:
+            self._schema = 'int' if inspect(self.engine).has_table(MarketTyped.__tablename__) else 'text'
+        return self._schema
+
+    @property
+    def table(self):
+        if self.adjust is not None:
+            return MarketRaw.__tablename__
+        return MarketTyped.__tablename__ if self.schema == 'int' else Market.__tablename__
+
+    def adjusted(self, adjust):
+        """
+        :return: 共用engine、按adjust读取marketData_raw的SQLiteStore
+        """
+        return SQLiteStore(self.engine, adjust=adjust)
+
+    def _select(self, columns):
+        # 复权换算需按股票代码、交易日匹配因子
+        if self.adjust in ('hfq', 'qfq'):
+            return list(dict.fromkeys(list(columns) + ['ticker', 'tradeDate']))
+        return list(columns)
+
+    def _bound(self, date):
+        if isinstance(date, datetime.date):
+            return int(date.strftime('%Y%m%d')) if self.schema == 'int' else date.strftime('%Y-%m-%d')
+        if self.schema == 'int':
+            return date_to_int(date)
+        return pd.to_datetime(date).date().strftime('%Y-%m-%d')
+
+    def load_arrays(self, start_date, end_date, code=None, columns=PRICE_COLUMNS):
+        """
+        读取区间行情为numpy数组，按股票代码、交易日排序
+        :param code: 股票代码，为None时读取全市场
+        :return: dict(column -> np.ndarray)，tradeDate为int32 yyyymmdd，价格字段为float64
+        """
+        requested = list(columns)
+        columns = self._select(requested)
+        sql = (f"SELECT {', '.join(columns)} FROM {self.table} "
+               f"WHERE :start <= tradeDate AND tradeDate <= :end")
+        params = {'start': self._bound(start_date), 'end': self._bound(end_date)}
+        if code is not None:
+            sql += " AND ticker = :code ORDER BY tradeDate"
+            params['code'] = code
+        else:
+            sql += " ORDER BY ticker, tradeDate"
+        with profiling.stage('read.sqlite'), self.engine.connect() as conn:
+            rows = conn.execute(text(sql), params).fetchall()
+        return self._to_arrays(rows, columns, requested)
+
+    def _to_arrays(self, rows, columns, requested=None):
+        profiling.count('rows_read', len(rows))
+        with profiling.stage('read.parse'):
+            arrays = self._parse(rows, columns)
+        if self.adjust in ('hfq', 'qfq'):
+            _codes = np.unique(arrays['ticker'])
+            factors = self.load_factors(_codes[0] if _codes.size == 1 else None)
+            with profiling.stage('read.adjust'):
+                arrays = adjust_arrays(arrays, factors, self.adjust)
+        if requested is not None:
+            arrays = {c: arrays[c] for c in requested}
+        return arrays
+
+    def _parse(self, rows, columns):
+        values = list(zip(*rows)) if rows else [()] * len(columns)
+        arrays = {}
+        for c, v in zip(columns, values):
+            if c == 'tradeDate':
+                if self.schema == 'int':
+                    arrays[c] = np.array(v, dtype=np.int32)
+                else:
+                    arrays[c] = pd.Series(v, dtype=object).str[:10].str.replace('-', '', regex=False) \
+                        .to_numpy(dtype=np.int32)
+            elif c == 'ticker':
+                arrays[c] = np.array(v, dtype=object)
+            else:
+                arrays[c] = np.array(v, dtype=np.float64)
+        return arrays
+
+    def load_price(self, code, start_date, end_date, columns=PRICE_COLUMNS):
+        """
+        :return: pd.DataFrame(columns=columns)，单只股票区间行情，按交易日排序
+        """
+        return pd.DataFrame(self.load_arrays(start_date, end_date, code, columns))
+
+    def load_market(self, start_date, end_date, columns=PRICE_COLUMNS):
+        """
+        :return: pd.DataFrame(columns=columns)，全市场区间行情，按股票代码、交易日排序
+        """
+        return pd.DataFrame(self.load_arrays(start_date, end_date, None, columns))
+
+    def tickers(self):
+        """
+        :return: list，库内全部股票代码
+        """
+        with self.engine.connect() as conn:
+            return [r[0] for r in conn.execute(text(f"SELECT DISTINCT ticker FROM {self.table}")).fetchall()]
+
+    def last_dates(self, end_date=None):
+        """
+        :return: dict(ticker -> int yyyymmdd)，各股票不晚于end_date的最新交易日
+        """
+        sql = f"SELECT ticker, MAX(tradeDate) FROM {self.table}"
+        params = {}
+        if end_date is not None:
+            sql += " WHERE tradeDate <= :end"
+            params['end'] = self._bound(end_date)
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(sql + " GROUP BY ticker"), params).fetchall()
+        if self.schema == 'text':
+            return {t: int(d[:10].replace('-', '')) for t, d in rows}
+        return {t: int(d) for t, d in rows}
+
+    def load_tail(self, since, bars, end_date, columns=PRICE_COLUMNS):
+        """
+        增量读取：各股票晚于水位的K线，及水位当日（含）之前的bars根K线；每只股票走(ticker, tradeDate)索引
+        :param since: dict(ticker -> 水位日期 datetime.date)
+        :param bars: 水位前回看的K线数量
+        :return: dict(column -> np.ndarray)，按股票代码、交易日排序
+        """
+        requested = list(columns)
+        columns = self._select(requested)
+        sql = text(f"SELECT {', '.join(columns)} FROM {self.table} "
+                   f"WHERE ticker = :code AND tradeDate <= :end AND tradeDate >= COALESCE("
+                   f"(SELECT MIN(tradeDate) FROM (SELECT tradeDate FROM {self.table} "
+                   f"WHERE ticker = :code AND tradeDate <= :since ORDER BY tradeDate DESC LIMIT :bars)), :after) "
+                   f"ORDER BY tradeDate")
+        _end = self._bound(end_date)
+        rows = []
+        with profiling.stage('read.sqlite'), self.engine.connect() as conn:
+            for code in sorted(since):
+                rows += conn.execute(sql, {'code': code, 'since': self._bound(since[code]), 'bars': int(bars),
+                                           'after': self._bound(since[code] + datetime.timedelta(days=1)),
+                                           'end': _end}).fetchall()
+        return self._to_arrays(rows, columns, requested)
+
+    def load_factors(self, codes=None):
+        """
+        :param codes: 股票代码或代码列表，为None时读取全部
+        :return: dict(ticker, tradeDate, factor -> np.ndarray)，按股票代码、生效日排序；未建立adj_factor时为空
+        """
+        if not self._factors:
+            self._factors = inspect(self.engine).has_table(AdjFactor.__tablename__)
+        rows = []
+        if self._factors:
+            sql = "SELECT ticker, tradeDate, factor FROM adj_factor"
+            params = {}
+            if isinstance(codes, str):
+                sql += " WHERE ticker = :code"
+                params['code'] = codes
+            with profiling.stage('read.factors'), self.engine.connect() as conn:
+                rows = conn.execute(text(sql + " ORDER BY ticker, tradeDate"), params).fetchall()
+        values = list(zip(*rows)) if rows else [()] * 3
+        factors = {'ticker': np.array(values[0], dtype=object), 'tradeDate': np.array(values[1], dtype=np.int32),
+                   'factor': np.array(values[2], dtype=np.float64)}
+        if codes is not None and not isinstance(codes, str):
+            keep = np.isin(factors['ticker'], list(codes))
+            factors = {c: v[keep] for c, v in factors.items()}
+        return factors
+
+    def has_events(self):
+        """
+        :return: 是否已建立limitup_events（建表时按已有行情回填，此后随MarketWriter写入维护）
+        """
+        if not self._events:
+            self._events = inspect(self.engine).has_table(LimitUpEvent.__tablename__)
+        return self._events
+
+    def load_events(self, start_date, end_date, codes=None, floor=EVENT_FLOOR):
+        """
+        :param codes: 股票代码或代码列表，为None时读取全市场
+        :param floor: 涨幅下限，不低于EVENT_FLOOR时结果完整
+        :return: dict(ticker, tradeDate, quota, perf_percent -> np.ndarray)，按股票代码、交易日排序
+        """
+        sql = ("SELECT ticker, tradeDate, quota, perf_percent FROM limitup_events "
+               "WHERE :start <= tradeDate AND tradeDate <= :end AND perf_percent > :floor")
+        params = {'start': date_to_int(start_date), 'end': date_to_int(end_date), 'floor': float(floor)}
+        if isinstance(codes, str):
+            sql += " AND ticker = :code"
+            params['code'] = codes
+        with profiling.stage('read.events'), self.engine.connect() as conn:
+            rows = conn.execute(text(sql + " ORDER BY ticker, tradeDate"), params).fetchall()
+        values = list(zip(*rows)) if rows else [()] * 4
+        events = {'ticker': np.array(values[0], dtype=object), 'tradeDate': np.array(values[1], dtype=np.int32),
+                  'quota': np.array(values[2], dtype=object), 'perf_percent': np.array(values[3], dtype=np.float64)}
+        if codes is not None and not isinstance(codes, str):
+            keep = np.isin(events['ticker'], list(codes))
+            events = {c: v[keep] for c, v in events.items()}
+        return events
+
+    def load_windows(self, events, bars, end_date, columns=PRICE_COLUMNS):
+        """
+        只读取各事件日（含）起不晚于end_date的bars根K线，同一股票重叠的窗口合并
+        :param events: load_events的输出
+        :return: dict(column -> np.ndarray)，按股票代码、交易日排序；不同事件的窗口之间可能不连续
+        """
+        columns = list(dict.fromkeys(list(columns) + ['ticker', 'tradeDate']))
+        sql = text(f"SELECT {', '.join(columns)} FROM {self.table} "
+                   f"WHERE ticker = :code AND :date <= tradeDate AND tradeDate <= :end ORDER BY tradeDate LIMIT :bars")
+        _end = self._bound(end_date)
+        _dates = events['tradeDate'] if self.schema == 'int' else int_to_str(events['tradeDate'])
+        rows = []
+        with profiling.stage('read.sqlite'), self.engine.connect() as conn:
+            for code, date in zip(events['ticker'], _dates):
+                rows += conn.execute(sql, {'code': code, 'date': int(date) if self.schema == 'int' else date,
+                                           'end': _end, 'bars': int(bars)}).fetchall()
+        arrays = self._to_arrays(rows, columns)
+        # 事件按股票代码、交易日有序：窗口重叠时按(ticker, tradeDate)去重
+        ticker, date = arrays['ticker'], arrays['tradeDate']
+        order = np.lexsort((date, ticker))
+        ticker, date = ticker[order], date[order]
+        keep = np.r_[True, (ticker[1:] != ticker[:-1]) | (date[1:] != date[:-1])] if order.size > 0 \
+            else np.array([], dtype=bool)
+        return {c: v[order][keep] for c, v in arrays.items()}
+
+
+class ParquetStore:
+    """
+    Parquet列式行情存储，目录结构 root/year=YYYY/part-0.parquet，文件内按股票代码、交易日排序
+    :param root: 存储目录
+    :param memory_map: 是否以内存映射方式读取
+    """
+    schema = 'int'
+
+    def __init__(self, root, memory_map=True):
+        if pa is None:
+            raise ImportError("ParquetStore依赖pyarrow，请先安装：pip install pyarrow")
+        self.root = root
+        self.memory_map = memory_map
+        self._dataset = None
+        self._tickers = None
+
+    @property
+    def dataset(self):
+        if self._dataset is None:
+            self._dataset = ds.dataset(self.root, format='parquet', partitioning='hive',
+                                       filesystem=pyarrow.fs.LocalFileSystem(use_mmap=self.memory_map))
+        return self._dataset
+
+    def load_arrays(self, start_date, end_date, code=None, columns=PRICE_COLUMNS):
+        """
+        读取区间行情为numpy数组，按股票代码、交易日排序；年份分区裁剪，交易日、股票代码按行组统计信息过滤
+        :param code: 股票代码，为None时读取全市场
+        :return: dict(column -> np.ndarray)，tradeDate为int32 yyyymmdd，价格字段为float64
+        """
+        columns = list(columns)
+        start, end = date_to_int(start_date), date_to_int(end_date)
+        _filter = (ds.field('year') >= start // 10000) & (ds.field('year') <= end // 10000) & \
+                  (ds.field('tradeDate') >= start) & (ds.field('tradeDate') <= end)
+        if code is not None:
+            _filter = _filter & (ds.field('ticker') == code)
+        with profiling.stage('read.parquet'):
+            table = self.dataset.to_table(columns=list(dict.fromkeys(columns + ['ticker', 'tradeDate'])),
+                                          filter=_filter)
+            table = table.sort_by([('ticker', 'ascending'), ('tradeDate', 'ascending')])
+        profiling.count('rows_read', table.num_rows)
+
+        arrays = {}
+        for c in columns:
+            if c == 'ticker':
+                arrays[c] = np.array(table.column(c).to_pylist(), dtype=object)
+            elif c == 'tradeDate':
+                arrays[c] = table.column(c).to_numpy().astype(np.int32)
+            else:
+                arrays[c] = table.column(c).to_numpy().astype(np.float64)
+        return arrays
+
+    def load_price(self, code, start_date, end_date, columns=PRICE_COLUMNS):
+        """
+        :return: pd.DataFrame(columns=columns)，单只股票区间行情，按交易日排序
+        """
+        return pd.DataFrame(self.load_arrays(start_date, end_date, code, columns))
+
+    def load_market(self, start_date, end_date, columns=PRICE_COLUMNS):
+        """
+        :return: pd.DataFrame(columns=columns)，全市场区间行情，按股票代码、交易日排序
+        """
+        return pd.DataFrame(self.load_arrays(start_date, end_date, None, columns))
+
+    def tickers(self):
+        """
+        :return: list，库内全部股票代码
+        """
+        if self._tickers is None:
+            self._tickers = sorted(set(self.dataset.to_table(columns=['ticker']).column('ticker').to_pylist()))
+        return self._tickers
+
+    def last_dates(self, end_date=None):
+        """
+        :return: dict(ticker -> int yyyymmdd)，各股票不晚于end_date的最新交易日
+        """
+        _filter = None if end_date is None else ds.field('tradeDate') <= date_to_int(end_date)
+        table = self.dataset.to_table(columns=['ticker', 'tradeDate'], filter=_filter)
+        table = table.group_by('ticker').aggregate([('tradeDate', 'max')])
+        return dict(zip(table.column('ticker').to_pylist(), table.column('tradeDate_max').to_pylist()))
+
+    def load_tail(self, since, bars, end_date, columns=PRICE_COLUMNS):
+        """
+        增量读取：各股票晚于水位的K线，及水位当日（含）之前的bars根K线；列式扫描后按股票分段截取
+        :param since: dict(ticker -> 水位日期 datetime.date)
+        :param bars: 水位前回看的K线数量
+        :return: dict(column -> np.ndarray)，按股票代码、交易日排序
+        """
+        columns = list(columns)
+        _columns = list(dict.fromkeys(columns + ['ticker', 'tradeDate']))
+        with profiling.stage('read.parquet'):
+            table = self.dataset.to_table(columns=_columns,
+                                          filter=ds.field('ticker').isin(pa.array(sorted(since), type=pa.string())))
+            table = table.sort_by([('ticker', 'ascending'), ('tradeDate', 'ascending')])
+        profiling.count('rows_read', table.num_rows)
+        ticker = np.array(table.column('ticker').to_pylist(), dtype=object)
+        date = table.column('tradeDate').to_numpy()
+
+        # 水位及之前的K线位于各分段前部：保留水位之后的K线及水位前最后bars根
+        _since = pd.Series({k: int(v.strftime('%Y%m%d')) for k, v in since.items()}, dtype=np.int64) \
+            .reindex(ticker).to_numpy()
+        before = date <= _since
+        _bounds = np.flatnonzero(ticker[1:] != ticker[:-1]) + 1
+        _starts = np.r_[0, _bounds] if ticker.size > 0 else np.array([], dtype=np.int64)
+        _ends = np.r_[_bounds, ticker.size] if ticker.size > 0 else np.array([], dtype=np.int64)
+        _count = np.add.reduceat(before.astype(np.int64), _starts) if ticker.size > 0 else _starts
+        pos = np.arange(ticker.size) - np.repeat(_starts, _ends - _starts)
+        keep = (~before | (pos >= np.repeat(_count, _ends - _starts) - int(bars))) & (date <= date_to_int(end_date))
+
+        arrays = {}
+        for c in columns:
+            if c == 'ticker':
+                arrays[c] = ticker[keep]
+            elif c == 'tradeDate':
+                arrays[c] = date[keep].astype(np.int32)
+            else:
+                arrays[c] = table.column(c).to_numpy().astype(np.float64)[keep]
+        return arrays
+
+
+def export_parquet(engine, root, row_group_size=65536):
+    """
+    marketData_daily导出为ParquetStore目录，按年份分区覆盖写入
+    :return: 导出行数
+    """
+    if pa is None:
+        raise ImportError("ParquetStore依赖pyarrow，请先安装：pip install pyarrow")
+    source = SQLiteStore(engine)
+    with engine.connect() as conn:
+        first, last = conn.execute(text(f"SELECT MIN(tradeDate), MAX(tradeDate) FROM {source.table}")).fetchone()
+    if first is None:
+        return 0
+    rows = 0
+    for year in range(date_to_int(first) // 10000, date_to_int(last) // 10000 + 1):
+        arrays = source.load_arrays(f"{year}-01-01", f"{year}-12-31")
+        if arrays['tradeDate'].size == 0:
+            continue
+        _dir = os.path.join(root, f"year={year}")
+        shutil.rmtree(_dir, ignore_errors=True)
+        os.makedirs(_dir)
+        table = pa.table({c: pa.array(arrays[c], type=pa.string() if c == 'ticker' else None)
+                          for c in PRICE_COLUMNS})
+        pq.write_table(table, os.path.join(_dir, 'part-0.parquet'), row_group_size=row_group_size,
+                       use_dictionary=['ticker'])
+        rows += table.num_rows
+    return rows
+
+
+def import_parquet(root, engine, batch_rows=50000):
+    """
+    ParquetStore目录导入marketData_daily，按(ticker, tradeDate)覆盖
+    :return: 导入行数
+    """
+    source = ParquetStore(root)
+    writer = MarketWriter(engine, batch_rows=batch_rows)
+    years = sorted(int(d.split('=')[1]) for d in os.listdir(root) if d.startswith('year='))
+    for year in years:
+        price = source.load_market(f"{year}-01-01", f"{year}-12-31")
+        price['tradeDate'] = int_to_str(price['tradeDate'].to_numpy())
+        now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        price['createtime'] = now
+        price['updatetime'] = now
+        writer.write(price)
+    writer.flush()
+    return writer.rows
+
+
+def open_store(uri):
+    """
+    按地址打开行情存储：'sqlite:///stockwatcher.db' 或 'parquet:///data/market'
+    """
+    if uri.startswith('parquet://'):
+        return ParquetStore(uri[len('parquet://'):])
+    return SQLiteStore(sqlalchemy.create_engine(uri))
+
+
+def convert_marketdata(engine):
+    """
+    将marketData_daily转换写入marketData_daily_int（可重复执行，按(ticker, tradeDate)覆盖）
+    :return: marketData_daily_int行数
+    """
+    migrate_marketdata(engine)
+    Base.metadata.create_all(engine, tables=[MarketTyped.__table__])
+    _columns = [c for c in PRICE_COLUMNS if c != 'tradeDate']
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"INSERT INTO marketData_daily_int (tradeDate, {', '.join(_columns)}) "
+            f"SELECT CAST(REPLACE(SUBSTR(tradeDate, 1, 10), '-', '') AS INTEGER), {', '.join(_columns)} "
+            f"FROM marketData_daily WHERE true "
+            f"ON CONFLICT (ticker, tradeDate) DO UPDATE SET "
+            f"{', '.join(f'{c} = excluded.{c}' for c in _columns if c != 'ticker')}"
+        ))
+        return conn.execute(text("SELECT COUNT(*) FROM marketData_daily_int")).scalar()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) >= 2 and sys.argv[1] == 'convert':
+        _path = sys.argv[2] if len(sys.argv) >= 3 else 'stockwatcher.db'
+        print(f"marketData_daily_int共{convert_marketdata(sqlalchemy.create_engine(f'sqlite:///{_path}'))}行")
+    elif len(sys.argv) == 4 and sys.argv[1] == 'export':
+        print(f"导出{export_parquet(sqlalchemy.create_engine(f'sqlite:///{sys.argv[2]}'), sys.argv[3])}行")
+    elif len(sys.argv) == 4 and sys.argv[1] == 'import':
+        print(f"导入{import_parquet(sys.argv[2], sqlalchemy.create_engine(f'sqlite:///{sys.argv[3]}'))}行")
+    else:
+        print("用法：python storage.py convert [stockwatcher.db]\n"
+              "      python storage.py export stockwatcher.db parquet目录\n"
+              "      python storage.py import parquet目录 stockwatcher.db")
@@ -0,0 +1,235 @@
+"""
+    @author: caitao
+    @feature:
+        * 黄金台参数寻优：读取golden_version中的参数版本，一次加载区间行情，多进程并行评估各版本
+        * 行情、上下影距离、柱体大小及涨停日索引缓存在scanner.ScanContext，涨停区间相同的版本共享
+        * 信号按版本写入golden_results；已完成的版本记录在sync_progress，重复执行时跳过，可断点续跑
+        * 每日增量识别：golden_watermark记录各版本、各股票已识别至的交易日，同步后只读取有新K线股票的尾部
+          （水位前end_window + lookback根K线及新K线），追加水位之后的信号
+"""
+import datetime
+import functools
+import itertools
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+import golden
+import profiling
+from scanner import RECORD_COLUMNS, ScanContext, golden_detector, load_context
+from storage import date_to_int, int_to_date, int_to_str
+from utilities import Base, GoldenVersion, GoldenResults, GoldenWatermark, SyncProgress, run_tasks, \
+    migrate_golden_results, upsert_results
+
+# golden_version字段 -> trigger_v2参数
+VERSION_PARAMS = {
+    'main_bottom': 'main_bottom', 'main_upper': 'main_upper', 'star_bottom': 'star_bottom',
+    'star_upper': 'star_upper', 'amplitude': 'amplitude', 'v': 'v', 'box_bottom': 'boxrange_bottom',
+    'box_upper': 'boxrange_upper', 'start_window': 'start_window', 'end_window': 'end_window', 'tao': 'tao'
+}
+
+# 进程内缓存：区间行情ScanContext，含各涨停区间的涨停日索引，fork出的工作进程直接继承
+_context = {}
+
+
+def load_versions(engine, versions=None):
+    """
+    :param versions: 版本号列表，为None时读取全部版本
+    :return: list of dict('version', trigger_v2参数...)
+    """
+    Base.metadata.create_all(engine, tables=[GoldenVersion.__table__])
+    query = select(GoldenVersion)
+    if versions is not None:
+        query = query.where(GoldenVersion.version.in_(list(versions)))
+    with engine.connect() as conn:
+        rows = conn.execute(query).mappings().fetchall()
+    return [dict({'version': r['version']}, **{p: r[c] for c, p in VERSION_PARAMS.items()}) for r in rows]
+
+
+def build_grid(engine, prefix='grid', **grid):
+    """
+    按参数网格生成版本并写入golden_version，未指定的参数取trigger_v2默认值
+    :param grid: 参数名 -> 取值列表，参数名同golden_version字段，如amplitude=[10, 15], tao=[0.3, 0.5]
+    :return: 新增的版本号列表
+    """
+    default = {'main_bottom': 9.97, 'main_upper': 11.00, 'star_bottom': 19.97, 'star_upper': 21.00,
+               'amplitude': 15.00, 'v': 0.6, 'box_bottom': -0.01, 'box_upper': 0.8,
+               'start_window': 5, 'end_window': 11, 'tao': 0.5}
+    Base.metadata.create_all(engine, tables=[GoldenVersion.__table__])
+    now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    keys = list(grid.keys())
+    rows = []
+    for values in itertools.product(*[grid[k] for k in keys]):
+        params = dict(default, **dict(zip(keys, values)))
+        version = prefix + '_' + '_'.join(f"{k}{v}" for k, v in zip(keys, values))
+        rows.append(dict(params, version=version, createtime=now, updatetime=now))
+    with engine.begin() as conn:
+        existing = {r[0] for r in conn.execute(select(GoldenVersion.version)).fetchall()}
+        rows = [r for r in rows if r['version'] not in existing]
+        if len(rows) > 0:
+            conn.execute(GoldenVersion.__table__.insert(), rows)
+    return [r['version'] for r in rows]
+
+
+def _load_context(start_date, end_date):
+    key = (str(start_date), str(end_date))
+    if key not in _context:
+        _context.clear()
+        _context[key] = load_context(start_date, end_date)
+    return _context[key]
+
+
+def _params(config):
+    return {p: config[p] for p in VERSION_PARAMS.values()}
+
+
+def evaluate_version(config, start_date, end_date):
+    """
+    评估单个参数版本
+    :param config: load_versions返回的单个版本
+    :return: dict(ticker, trigger_date, signal, metric -> list)，同一股票同一信号日只保留一次
+    """
+    return golden_detector(_load_context(start_date, end_date), **_params(config))
+
+
+def completed_versions(engine, start_date, end_date):
+    """
+    :return: 当前区间已完成评估的版本号集合
+    """
+    Base.metadata.create_all(engine, tables=[SyncProgress.__table__])
+    with engine.connect() as conn:
+        rows = conn.execute(select(SyncProgress.ticker).where(
+            SyncProgress.job == _job(start_date, end_date))).fetchall()
+    return {r[0] for r in rows}
+
+
+def _job(start_date, end_date):
+    return f"golden_sweep:{start_date}-{end_date}"
+
+
+def _save(engine, start_date, end_date, version, signals):
+    """
+    单个事务内覆盖写入版本信号并标记该版本完成：只删除本区间内的旧信号，其他区间及增量识别写入的信号保留
+    """
+    now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    _start, _end = int_to_str([date_to_int(start_date), date_to_int(end_date)])
+    with engine.begin() as conn:
+        conn.execute(GoldenResults.__table__.delete().where(
+            GoldenResults.version == version, GoldenResults.signal >= _start, GoldenResults.signal <= _end))
+        rows = upsert_results(conn, version, signals)
+        conn.exec_driver_sql(
+            "INSERT INTO sync_progress (job, ticker, rows, createtime) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (job, ticker) DO UPDATE SET rows = excluded.rows, createtime = excluded.createtime",
+            (_job(start_date, end_date), version, rows, now)
+        )
+
+
+def golden_sweep(start_date, end_date, versions=None, engine=None, backend='process', workers=4, progress=None):
+    """
+    参数寻优：评估golden_version中的各版本并写入golden_results，已完成的版本跳过
+    :param versions: 版本号列表，为None时评估全部版本
+    :param engine: 参数、结果所在数据库，默认golden.engine
+    :return: dict(version -> 信号数量), errors
+    """
+    engine = golden.engine if engine is None else engine
+    migrate_golden_results(engine)
+    done = completed_versions(engine, start_date, end_date)
+    configs = [c for c in load_versions(engine, versions) if c['version'] not in done]
+    if len(configs) == 0:
+        return {}, []
+
+    # 父进程预先加载行情、共享中间数组及涨停日索引，工作进程继承后不再重复读取
+    ctx = _load_context(start_date, end_date)
+    _ = (ctx.distance, ctx.body)
+    for c in configs:
+        ctx.limit_up(c['main_bottom'], c['main_upper'], c['star_bottom'], c['star_upper'])
+
+    counts = {}
+
+    def _on_result(config, signals):
+        _save(engine, start_date, end_date, config['version'], signals)
+        counts[config['version']] = len(signals['signal'])
+
+    _, errors = run_tasks(functools.partial(evaluate_version, start_date=start_date, end_date=end_date), configs,
+                          backend=backend, workers=workers, chunksize=1, progress=progress, on_result=_on_result)
+    return counts, errors
+
+
+def load_watermarks(engine, versions=None):
+    """
+    :return: dict((version, ticker) -> int yyyymmdd)
+    """
+    Base.metadata.create_all(engine, tables=[GoldenWatermark.__table__])
+    query = select(GoldenWatermark.version, GoldenWatermark.ticker, GoldenWatermark.tradeDate)
+    if versions is not None:
+        query = query.where(GoldenWatermark.version.in_(list(versions)))
+    with engine.connect() as conn:
+        return {(v, t): d for v, t, d in conn.execute(query).fetchall()}
+
+
+def golden_incremental(end_date=None, versions=None, start_date=datetime.date(1990, 1, 1), lookback=5,
+                       engine=None, store=None):
+    """
+    每日增量识别：只计算水位之后新K线上的信号并追加写入golden_results
+    ** 信号日为涨停日起第L根K线（L < end_window），新K线上的信号只依赖水位前end_window - 2根及之后的K线
+    ** 无水位的版本、股票自start_date起全量识别，此后每次只读取尾部
+    :param end_date: 识别截止日，默认行情库最新交易日
+    :param versions: 版本号列表，为None时识别全部版本
+    :param lookback: 水位前额外回看的K线数量
+    :param engine: 参数、结果所在数据库，默认golden.engine
+    :param store: 行情存储，默认golden.store
+    :return: dict(version -> 新增信号数量)
+    """
+    engine = golden.engine if engine is None else engine
+    store = golden.store if store is None else store
+    migrate_golden_results(engine)
+    configs = load_versions(engine, versions)
+    if len(configs) == 0:
+        return {}
+    latest = store.last_dates(end_date)
+    if len(latest) == 0:
+        return {c['version']: 0 for c in configs}
+    end_date = int_to_date([max(latest.values())])[0] if end_date is None else end_date
+    marks = load_watermarks(engine, [c['version'] for c in configs])
+    floor = date_to_int(start_date - datetime.timedelta(days=1))
+
+    # 各股票取全部版本中最低的水位，有新K线的股票一次读取尾部，所有版本共用
+    since = {}
+    for t, last in latest.items():
+        _mark = min(marks.get((c['version'], t), floor) for c in configs)
+        if _mark < last:
+            since[t] = _mark
+    if len(since) == 0:
+        return {c['version']: 0 for c in configs}
+    fresh = [t for t, d in since.items() if d == floor]
+    bars = max(int(c['end_window']) for c in configs) + int(lookback)
+    tails = [store.load_tail({t: int_to_date([since[t]])[0] for t in since if since[t] != floor}, bars, end_date)]
+    if len(fresh) > 0:
+        tails.append(store.load_tail({t: start_date - datetime.timedelta(days=1) for t in fresh}, 0, end_date))
+    arrays = {c: np.concatenate([x[c] for x in tails]) for c in tails[0]}
+    order = np.lexsort((arrays['tradeDate'], arrays['ticker']))
+    ctx = ScanContext({c: v[order] for c, v in arrays.items()})
+
+    now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    counts = {}
+    for config in configs:
+        version = config['version']
+        with profiling.stage('incremental.detect'):
+            records = pd.DataFrame(golden_detector(ctx, **_params(config)), columns=RECORD_COLUMNS)
+        _mark = int_to_str([marks.get((version, t), floor) for t in records['ticker']])
+        records = records[records['signal'].to_numpy() > np.array(_mark, dtype=object)]
+        with profiling.stage('incremental.write'), engine.begin() as conn:
+            counts[version] = upsert_results(conn, version, records)
+            conn.exec_driver_sql(
+                "INSERT INTO golden_watermark (version, ticker, tradeDate, updatetime) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (version, ticker) DO UPDATE SET tradeDate = excluded.tradeDate, "
+                "updatetime = excluded.updatetime",
+                [(version, t, int(latest[t]), now) for t in since]
+            )
+    return counts
+
+
+if __name__ == '__main__':
+    build_grid(golden.engine, amplitude=[10, 15], tao=[0.3, 0.5], box_upper=[0.5, 0.8])
+    print(golden_sweep(datetime.date(2024, 1, 1), datetime.date(2024, 12, 31)))
@@ -0,0 +1,117 @@
+"""
+    @author: caitao
+    @feature:
+        * 后台行情同步任务：抓取、分批写入及增量识别在独立线程中执行，调用方（streamlit页面）只读取状态快照
+        * 进度：阶段、已完成 / 总股票数、写入行数、失败股票；cancel()后不再发起新请求，已抓取的行情照常写入
+        * 中断或取消后再次同步时，经sync_progress跳过已提交的股票
+"""
+import datetime
+import threading
+import traceback
+
+import akshare as ak
+
+import profiling
+from ingestion import ingest
+from storage import SQLiteStore
+from sweep import golden_incremental
+from utilities import MarketWriter, get_universe
+
+
+class SyncJob:
+    """
+    :param engine: sqlalchemy engine
+    :param start_date: datetime.date
+    :param end_date: datetime.date
+    :param source: 同ak.stock_zh_a_hist签名的数据源
+    :param incremental: 写入完成后是否增量识别黄金台信号
+    :param profile: 是否记录profiling，结果见snapshot()['profile']
+    :param codes: 股票代码列表，为None时为全A股票池
+    """
+
+    def __init__(self, engine, start_date, end_date, source=ak.stock_zh_a_hist, incremental=True, profile=False,
+                 codes=None):
+        self.engine = engine
+        self.start_date = start_date
+        self.end_date = end_date
+        self.source = source
+        self.incremental = incremental
+        self.profile = profile
+        self.codes = codes
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._state = {'status': 'pending', 'stage': '', 'done': 0, 'total': 0, 'rows': 0, 'errors': [],
+                       'counts': {}, 'error': None, 'profile': None, 'started': None, 'finished': None}
+
+    def _update(self, **kwargs):
+        with self._lock:
+            self._state.update(kwargs)
+
+    def snapshot(self):
+        """
+        :return: dict，状态status（pending / running / done / cancelled / failed）、阶段及进度的副本
+        """
+        with self._lock:
+            return dict(self._state, errors=list(self._state['errors']), counts=dict(self._state['counts']))
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self._thread is not None:
+            raise RuntimeError("同步任务已启动")
+        self._update(status='running', started=datetime.datetime.now())
+        self._thread = threading.Thread(target=self._run, name='SyncJob', daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        if self.profile:
+            profiling.enable()
+        try:
+            self._sync()
+            self._update(status='cancelled' if self._cancel.is_set() else 'done')
+        except Exception:
+            self._update(status='failed', error=traceback.format_exc())
+        finally:
+            if self.profile:
+                profiling.disable()
+                self._update(profile=profiling.summary())
+            self._update(finished=datetime.datetime.now())
+
+    def _sync(self):
+        _start, _end = self.start_date.strftime('%Y%m%d'), self.end_date.strftime('%Y%m%d')
+        self._update(stage='股票池')
+        codes = get_universe(self.engine)['code'].to_list() if self.codes is None else list(self.codes)
+
+        # 并发抓取，每批股票下载完成即分批事务写入数据库；中断后再次更新时跳过已提交的股票
+        writer = MarketWriter(self.engine, job=f"{_start}-{_end}")
+        done = writer.completed()
+        codes = [i for i in codes if i not in done]
+        self._update(stage='行情数据爬取中', total=len(codes))
+
+        def _progress(n, total):
+            self._update(done=n, rows=writer.rows)
+
+        try:
+            _, errors = ingest(codes, _start, _end, sink=writer.write, source=self.source, progress=_progress,
+                               cancel=self._cancel)
+        finally:
+            writer.flush()
+        self._update(rows=writer.rows, errors=errors)
+        if self._cancel.is_set() or not self.incremental:
+            return
+
+        # 增量识别：各参数版本只扫描有新K线股票的尾部
+        self._update(stage='增量识别黄金台信号')
+        counts = golden_incremental(engine=self.engine, store=SQLiteStore(self.engine))
+        self._update(counts=counts)
@@ -0,0 +1,112 @@
+"""
+    @author: caitao
+    @feature:
+        * 一致性测试的参照：重构前golden_filter、trigger_v2逐窗口循环及amplitude_convergence收敛判断的原实现
+        * make_bars：指定涨停日（可连续、可贴近序列末尾）及其后窄幅横盘的随机K线
+"""
+import numpy as np
+import pandas as pd
+
+from storage import PRICE_COLUMNS
+
+
+def golden_filter(price, start_window, amplitude=15.00, boxrange_bottom=-0.01, boxrange_upper=0.8, v=0.6):
+    """
+    原golden_filter：price字段顺序同PRICE_COLUMNS
+    """
+    if price.shape[0] < start_window:
+        return False
+    # 振幅合集
+    amplitude_list = price.iloc[1:, 7].to_list()
+    price['vollage'] = abs(price['open'] - price['close'])
+    if all(_ <= amplitude for _ in amplitude_list):
+        # 确定箱体上下界
+        _close1 = price.iloc[0, 3]
+        _open1 = price.iloc[0, 2]
+        _v1 = price.iloc[0, -1]
+        # 2-窗口末尾 K线柱的开盘价、收盘价合集
+        a = price.iloc[1:, 2].to_list() + price.iloc[1:, 3].to_list()
+        # 箱体上下限
+        bottom = _v1 * boxrange_bottom + _open1
+        upper = _v1 * boxrange_upper + _close1
+        # 柱体大小限制
+        vollage = _v1 * v
+        # 2-10K线柱体大小
+        b = price.iloc[1:, -1].to_list()
+        return (max(a) <= upper) and (min(a) >= bottom) and (max(b) <= vollage) and (_close1 > _open1)
+    return False
+
+
+def converged(price, tao=0.5):
+    """
+    原trigger_v2的收敛判断：第2根起上下影距离全为0，或均值小于tao
+    """
+    _distance = [a - b for a, b in zip(price['high'].to_list()[1:], price['low'].to_list()[1:])]
+    return all(item == 0 for item in _distance) or np.mean(_distance) < tao
+
+
+def trigger_windows(stockprice, quota='normal', main_bottom=9.97, main_upper=11.00, star_bottom=19.97,
+                    star_upper=21.00, amplitude=15.00, boxrange_bottom=-0.01, boxrange_upper=0.8, v=0.6,
+                    tao=0.5, start_window=5, end_window=11):
+    """
+    原trigger_v2._core：逐涨停日、逐窗口复制DataFrame判断
+    :return: list of (涨停日行索引, 信号日行索引)，顺序同原实现的输出
+    """
+    _perf = stockprice['perf_percent']
+    if quota == 'normal':
+        _raw = stockprice[(_perf > main_bottom) & (_perf < main_upper)].index
+    else:
+        _raw = stockprice[(_perf > star_bottom) & (_perf < star_upper)].index
+    results = []
+    for i in _raw:
+        for w in range(int(start_window), int(end_window), 1):
+            _price = stockprice.iloc[i:i + w, :].copy()
+            if len(_price) < start_window:
+                continue
+            _x = golden_filter(_price, start_window, amplitude, boxrange_bottom, boxrange_upper, v)
+            if _x or converged(_price, tao):
+                results.append((i, i + len(_price) - 1))
+    return results
+
+
+def convergence_window(high, low, tao=0.5):
+    """
+    原amplitude_convergence的单窗口收敛判断：第2根起上下影距离均值小于tao
+    """
+    _distance = [a - b for a, b in zip(high.tolist()[1:], low.tolist()[1:])]
+    return np.mean(_distance) < tao
+
+
+def make_bars(rng, n, limit_ups=(), platform=8, radical=False, ticker='000001', start_date='2024-01-02'):
+    """
+    :param limit_ups: 涨停日行索引，其后platform根K线窄幅横盘
+    :return: pd.DataFrame，字段顺序同PRICE_COLUMNS，tradeDate为整数yyyymmdd，价格为两位小数
+    """
+    limit = 0.2 if radical else 0.1
+    ret = np.clip(rng.normal(0, 0.02, n), -limit + 0.01, limit - 0.01)
+    body = rng.normal(0, 0.01, n)
+    shadow = np.abs(rng.normal(0, 0.01, (2, n)))
+    for i in limit_ups:
+        flat = slice(i + 1, i + 1 + platform)
+        ret[flat] = rng.normal(0, 0.003, ret[flat].size)
+        body[flat] = rng.normal(0, 0.002, body[flat].size)
+        shadow[:, flat] = np.abs(rng.normal(0, 0.001, shadow[:, flat].shape))
+    for i in limit_ups:
+        ret[i] = limit + 0.0005
+        body[i] = -rng.uniform(0.01, 0.05)
+
+    close = np.round(20 * np.cumprod(1 + ret), 2)
+    prev = np.r_[20.0, close[:-1]]
+    _open = np.round(close * (1 + body), 2)
+    high = np.round(np.maximum(_open, close) * (1 + shadow[0]), 2)
+    low = np.round(np.minimum(_open, close) * (1 - shadow[1]), 2)
+    return pd.DataFrame({
+        'tradeDate': pd.bdate_range(start_date, periods=n).strftime('%Y%m%d').astype(int),
+        'ticker': ticker, 'open': _open, 'close': close, 'high': high, 'low': low,
+        'amount': np.round(rng.uniform(1e6, 1e8, n), 2),
+        'amplitude': np.round((high - low) / prev * 100, 2),
+        'perf_percent': np.round((close / prev - 1) * 100, 2),
+        'perf_amount': np.round(close - prev, 2),
+        'volumn': np.round(rng.uniform(1e4, 1e6, n)),
+        'turnover': np.round(rng.uniform(0.2, 8, n), 2),
+    })[PRICE_COLUMNS]
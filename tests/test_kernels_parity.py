@@ -0,0 +1,133 @@
+"""
+    @author: caitao
+    @feature:
+        * kernels各后端（numpy、python、numba）的golden_mask、distance_mean、convergence_mask与原逐窗口实现的一致性测试
+        * 覆盖：随机窗口、长度不足2的窗口、在序列末尾截断的窗口、上下影距离全为0、距离均值恰为tao
+        * 未安装numba时numba用例跳过
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import kernels
+from tests import reference
+
+COLUMNS = ['open', 'close', 'high', 'low', 'amplitude']
+
+
+@pytest.fixture(params=['numpy', 'python', 'numba'])
+def backend(request, monkeypatch):
+    # 先登记原后端，用例结束后恢复
+    monkeypatch.setattr(kernels, 'backend', kernels.backend)
+    if request.param == 'numba':
+        pytest.importorskip('numba')
+    return kernels.use_backend(request.param)
+
+
+def _market(seed, count=20):
+    """
+    :return: 多只股票拼接的K线，部分涨停日后的横盘K线上下影距离为0
+    """
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(count):
+        n = int(rng.integers(8, 60))
+        limit_ups = sorted(set(rng.integers(0, n, int(rng.integers(1, 5))).tolist()))
+        frame = reference.make_bars(rng, n, limit_ups, platform=int(rng.integers(3, 10)))
+        for i in limit_ups[:1]:
+            flat = frame.index[i + 1:i + 6]
+            for c in ['open', 'high', 'low']:
+                frame.loc[flat, c] = frame.loc[flat, 'close']
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _windows(market, seed):
+    """
+    :return: 涨停日起各尺寸窗口及随机窗口的(starts, lengths)，长度在序列末尾截断，含长度0、1的窗口
+    """
+    rng = np.random.default_rng(seed)
+    n = len(market)
+    cand = np.r_[np.flatnonzero(market['perf_percent'].to_numpy() > 9.97), rng.integers(0, n, 50), n - 3, n - 1]
+    starts = np.repeat(cand, 12)
+    lengths = np.minimum(np.tile(np.arange(12), cand.size), n - starts)
+    return starts, lengths
+
+
+def _arrays(market):
+    return [market[c].to_numpy(dtype=np.float64) for c in COLUMNS]
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_golden_mask(backend, seed):
+    market = _market(seed)
+    starts, lengths = _windows(market, seed)
+    _o, _c, _h, _l, _a = _arrays(market)
+    mask = kernels.golden_mask(_o, _h, _l, _c, _a, starts, lengths)
+    expected = [reference.golden_filter(market.iloc[s:s + n].copy(), 2) for s, n in zip(starts, lengths)]
+    assert mask.tolist() == expected
+    assert mask.any()
+
+
+@pytest.mark.parametrize('params', [
+    dict(amplitude=10.0, v=0.4), dict(boxrange_bottom=-0.05, boxrange_upper=1.2), dict(v=1.0),
+])
+def test_golden_mask_parameters(backend, params):
+    market = _market(10)
+    starts, lengths = _windows(market, 10)
+    _o, _c, _h, _l, _a = _arrays(market)
+    mask = kernels.golden_mask(_o, _h, _l, _c, _a, starts, lengths, **params)
+    expected = [reference.golden_filter(market.iloc[s:s + n].copy(), 2, **params) for s, n in zip(starts, lengths)]
+    assert mask.tolist() == expected
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_distance_mean(backend, seed):
+    market = _market(seed)
+    starts, lengths = _windows(market, seed)
+    _o, _c, _h, _l, _a = _arrays(market)
+    mean, nonzero = kernels.distance_mean(_h, _l, starts, lengths)
+    for i, (s, n) in enumerate(zip(starts, lengths)):
+        if n < 2:
+            assert np.isnan(mean[i])
+            continue
+        _distance = _h[s + 1:s + n] - _l[s + 1:s + n]
+        assert mean[i] == pytest.approx(np.mean(_distance), rel=1e-12, abs=1e-12)
+        assert nonzero[i] == bool((_distance != 0).any())
+    assert not nonzero[lengths >= 2].all()
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('tao', [0.0, 0.1, 0.5])
+def test_convergence_mask(backend, seed, tao):
+    market = _market(seed)
+    starts, lengths = _windows(market, seed)
+    _o, _c, _h, _l, _a = _arrays(market)
+    full = lengths >= 2
+    mask = kernels.convergence_mask(_o, _h, _l, _c, starts, lengths, tao)
+    zero = kernels.convergence_mask(_o, _h, _l, _c, starts, lengths, tao, zero=True)
+    expected = np.array([reference.convergence_window(_h[s:s + n], _l[s:s + n], tao) if n >= 2 else False
+                         for s, n in zip(starts, lengths)])
+    flat = np.array([n >= 2 and bool((_h[s + 1:s + n] == _l[s + 1:s + n]).all()) for s, n in zip(starts, lengths)])
+    assert mask.tolist() == expected.tolist()
+    # zero=True为trigger_v2的规则：距离全为0或均值小于tao
+    assert zero.tolist() == (expected | flat).tolist()
+    assert flat.any()
+    assert not mask[~full].any() and not zero[~full].any()
+    # 预先计算的distance_mean与内部计算一致
+    mean = kernels.distance_mean(_h, _l, starts, lengths)
+    assert kernels.convergence_mask(_o, _h, _l, _c, starts, lengths, tao, mean=mean).tolist() == mask.tolist()
+
+
+def test_convergence_mean_equals_tao(backend):
+    """
+    np.mean恰等于tao、逐根累计和的均值略小于tao：各后端须按np.mean判断，不收敛
+    """
+    low = np.array([0.0, 3.69, 80.84, 78.79, 91.57, 67.2, 69.44, 16.79, 2.88, 7.02])
+    high = np.array([0.0, 4.31, 81.09, 79.75, 91.98, 67.84, 70.39, 17.73, 2.97, 7.37])
+    tao = float(np.mean(high[1:] - low[1:]))
+    assert np.cumsum(high[1:] - low[1:])[-1] / 9 < tao
+    assert not reference.convergence_window(high, low, tao)
+    mask = kernels.convergence_mask(low, high, low, low, [0], 10, tao)
+    assert mask.tolist() == [False]
+    assert kernels.convergence_mask(low, high, low, low, [0], 10, np.nextafter(tao, np.inf)).tolist() == [True]
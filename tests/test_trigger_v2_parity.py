@@ -0,0 +1,132 @@
+"""
+    @author: caitao
+    @feature:
+        * window_signals / trigger_v2与原逐窗口实现（golden_filter + 收敛判断）的一致性测试
+        * 覆盖：随机行情、窗口在序列末尾截断、连续涨停、上下影距离均值恰为tao（均值贴近阈值时按np.mean重算）
+        * 分别经numpy分支及numba分支（编译内核；未安装numba时以未编译的同一循环走该分支，编译内核用例跳过）
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import golden
+import kernels
+from panel import MarketPanel
+from tests import reference
+
+PARAMS = dict(amplitude=15.00, boxrange_bottom=-0.01, boxrange_upper=0.8, v=0.6, tao=0.5, start_window=5,
+              end_window=11)
+
+
+@pytest.fixture(params=['numpy', 'numba', 'numba-loop'])
+def backend(request, monkeypatch):
+    """
+    numba-loop：window_signals走numba分支，内核为未编译的同一循环，无需安装numba
+    """
+    # 先登记原后端，用例结束后恢复
+    monkeypatch.setattr(kernels, 'backend', kernels.backend)
+    if request.param == 'numba':
+        pytest.importorskip('numba')
+        kernels.use_backend('numba')
+    elif request.param == 'numba-loop':
+        monkeypatch.setitem(kernels._KERNELS, 'numba', kernels._KERNELS['python'])
+        kernels.backend = 'numba'
+    else:
+        kernels.use_backend('numpy')
+    return request.param
+
+
+def _signals(frame, quota='normal', **params):
+    """
+    :return: list of (涨停日行索引, 信号日行索引)，顺序同trigger_v2的输出
+    """
+    params = dict(PARAMS, **params)
+    _perf = frame['perf_percent'].to_numpy()
+    bottom, upper = (9.97, 11.00) if quota == 'normal' else (19.97, 21.00)
+    cand = np.flatnonzero((_perf > bottom) & (_perf < upper))
+    hit, length = golden.window_signals(*(frame[c].to_numpy(dtype=np.float64)
+                                          for c in ['open', 'close', 'high', 'low', 'amplitude']),
+                                        cand, _perf.size - cand, **params)
+    _i, _w = np.nonzero(hit)
+    return list(zip(cand[_i].tolist(), (cand[_i] + length[_i, _w] - 1).tolist()))
+
+
+def _frames(seed, count=40):
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        n = int(rng.integers(8, 60))
+        limit_ups = sorted(set(rng.integers(0, n, int(rng.integers(1, 5))).tolist()))
+        yield reference.make_bars(rng, n, limit_ups, platform=int(rng.integers(3, 10)))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_random_frames(backend, seed):
+    for frame in _frames(seed):
+        assert _signals(frame) == reference.trigger_windows(frame)
+
+
+@pytest.mark.parametrize('params', [
+    dict(amplitude=10.0, v=0.4), dict(boxrange_bottom=-0.05, boxrange_upper=1.2), dict(tao=0.1),
+    dict(start_window=2, end_window=6), dict(start_window=6, end_window=12),
+])
+def test_parameters(backend, params):
+    for frame in _frames(100, count=20):
+        assert _signals(frame, **params) == reference.trigger_windows(frame, **params)
+
+
+def test_truncated_at_series_end(backend):
+    rng = np.random.default_rng(1)
+    # 涨停日之后不足最大窗口：部分窗口截断为相同长度（原实现重复输出），不足start_window的窗口不输出
+    frame = reference.make_bars(rng, 30, [21, 24, 26, 29])
+    expected = reference.trigger_windows(frame)
+    assert _signals(frame) == expected
+    assert any(s == 29 for _, s in expected)
+    assert not any(i in (26, 29) for i, _ in expected)
+
+
+def test_back_to_back_limit_ups(backend):
+    rng = np.random.default_rng(2)
+    frame = reference.make_bars(rng, 40, [10, 11, 12, 25, 26])
+    assert _signals(frame) == reference.trigger_windows(frame)
+
+
+def test_mean_equals_tao(backend):
+    """
+    窗口上下影距离的np.mean恰等于tao，而逐根累计和的均值略小于tao：须按np.mean判断，与原实现一致不输出信号
+    """
+    low = [3.69, 80.84, 78.79, 91.57, 67.2, 69.44, 16.79, 2.88, 7.02]
+    high = [4.31, 81.09, 79.75, 91.98, 67.84, 70.39, 17.73, 2.97, 7.37]
+    frame = reference.make_bars(np.random.default_rng(3), 10, [0])
+    frame.loc[1:, 'low'] = low
+    frame.loc[1:, 'high'] = high
+    frame.loc[1:, 'open'] = low
+    frame.loc[1:, 'close'] = low
+    frame.loc[1:, 'perf_percent'] = 0.0
+    _distance = np.array(high) - np.array(low)
+    tao = float(np.mean(_distance))
+    assert np.cumsum(_distance)[-1] / _distance.size < tao
+    assert (0, 9) not in reference.trigger_windows(frame, tao=tao)
+    assert _signals(frame, tao=tao) == reference.trigger_windows(frame, tao=tao)
+
+
+def test_golden_filter_windows(backend):
+    for frame in _frames(7, count=20):
+        for i in np.flatnonzero(frame['perf_percent'] > 9.97):
+            for w in range(5, 11):
+                window = frame.iloc[i:i + w].reset_index(drop=True)
+                assert golden.golden_filter(window, 5) == reference.golden_filter(window.copy(), 5)
+
+
+def test_trigger_v2(backend):
+    rng = np.random.default_rng(4)
+    frames = [reference.make_bars(rng, 50, [3, 20, 21, 44], ticker='000001'),
+              reference.make_bars(rng, 50, [10, 30, 47], radical=True, ticker='300001'),
+              reference.make_bars(rng, 50, [], ticker='600000')]
+    market = pd.concat(frames, ignore_index=True)
+    panel = MarketPanel.from_arrays({c: market[c].to_numpy() for c in market.columns}, float_dtype=np.float64)
+    for frame in frames:
+        code = frame['ticker'].iloc[0]
+        quota = golden.stockIncrease_type(code)
+        expected = [{'ticker': code, 'signal': pd.to_datetime(str(frame['tradeDate'].iloc[s])).date()}
+                    for _, s in reference.trigger_windows(frame, quota)]
+        assert golden.trigger_v2(code, '2024-01-01', '2024-12-31', panel=panel) == expected
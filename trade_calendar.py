@@ -0,0 +1,133 @@
+"""
+    @author: caitao
+    @feature:
+        * 交易日历本地缓存：文件过期（ttl）后才重新下载新浪交易日历，下载失败时沿用本地文件
+        * 排序数组 + 二分查找：前一交易日、N个交易日前、后一交易日均为O(log n)
+        * 离线使用：python trade_calendar.py seed [trade_calendar.csv] 生成种子文件，TradingCalendar(offline=True)
+"""
+import datetime
+import os
+import sys
+import time
+
+import akshare as ak
+import numpy as np
+import pandas as pd
+
+CALENDAR_PATH = 'trade_calendar.csv'
+
+
+def _to_day(date):
+    return np.datetime64(pd.to_datetime(date).date(), 'D')
+
+
+class TradingCalendar:
+    """
+    :param path: 本地缓存文件，单列trade_date
+    :param ttl: 缓存有效期，超过后重新下载
+    :param offline: 为True时只读取本地文件，不访问网络
+    :param fetch: 交易日历数据源，返回含trade_date列的pd.DataFrame
+    """
+
+    def __init__(self, path=CALENDAR_PATH, ttl=datetime.timedelta(days=1), offline=False,
+                 fetch=ak.tool_trade_date_hist_sina):
+        self.path = path
+        self.ttl = ttl
+        self.offline = offline
+        self.fetch = fetch
+        self.days = None
+        self.loaded = 0.0
+        self.refresh()
+
+    def _stale(self):
+        if not os.path.exists(self.path):
+            return True
+        return time.time() - os.path.getmtime(self.path) > self.ttl.total_seconds()
+
+    def refresh(self, force=False):
+        """
+        缓存过期或force时重新下载并写入本地文件；下载失败且本地文件存在时沿用本地文件
+        """
+        if not self.offline and (force or self._stale()):
+            try:
+                trade = pd.to_datetime(self.fetch()['trade_date'])
+                pd.DataFrame({'trade_date': trade.dt.strftime('%Y-%m-%d')}).to_csv(self.path, index=False)
+            except Exception as e:
+                if not os.path.exists(self.path):
+                    raise
+                print(f"交易日历更新失败，沿用本地缓存：{e}")
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"交易日历缓存不存在：{self.path}")
+        self.days = np.unique(pd.read_csv(self.path)['trade_date'].to_numpy(dtype='datetime64[D]'))
+        self.loaded = time.time()
+        return self
+
+    def _check(self):
+        if not self.offline and time.time() - self.loaded > self.ttl.total_seconds():
+            self.refresh()
+
+    def _date(self, pos):
+        if pos < 0 or pos >= self.days.shape[0]:
+            return None
+        return self.days[pos].astype(datetime.date)
+
+    def is_trading_day(self, date):
+        self._check()
+        day = _to_day(date)
+        pos = np.searchsorted(self.days, day)
+        return bool(pos < self.days.shape[0] and self.days[pos] == day)
+
+    def floor(self, date):
+        """
+        :return: 不晚于date的最近交易日，datetime.date
+        """
+        self._check()
+        return self._date(np.searchsorted(self.days, _to_day(date), side='right') - 1)
+
+    def previous(self, date):
+        """
+        :return: 早于date的前一交易日，datetime.date
+        """
+        self._check()
+        return self._date(np.searchsorted(self.days, _to_day(date), side='left') - 1)
+
+    def next(self, date):
+        """
+        :return: 晚于date的后一交易日，不存在时返回None
+        """
+        self._check()
+        return self._date(np.searchsorted(self.days, _to_day(date), side='right'))
+
+    def shift(self, date, n):
+        """
+        :return: 自不晚于date的最近交易日起，向前（n<0）或向后（n>0）第n个交易日
+        """
+        self._check()
+        return self._date(np.searchsorted(self.days, _to_day(date), side='right') - 1 + n)
+
+    def period(self, end_date, n):
+        """
+        :return: 以end_date为最后一个交易日、长度为n个交易日的区间 (start_date, end_date)
+        """
+        return self.shift(end_date, -(n - 1)), self.floor(end_date)
+
+
+_calendar = None
+
+
+def get_calendar(**kwargs):
+    """
+    进程内共享的交易日历
+    """
+    global _calendar
+    if _calendar is None:
+        _calendar = TradingCalendar(**kwargs)
+    return _calendar
+
+
+if __name__ == '__main__':
+    if len(sys.argv) >= 2 and sys.argv[1] == 'seed':
+        _c = TradingCalendar(sys.argv[2] if len(sys.argv) >= 3 else CALENDAR_PATH).refresh(force=True)
+        print(f"交易日历{_c.days[0]} 至 {_c.days[-1]}，共{_c.days.shape[0]}个交易日")
+    else:
+        print("用法：python trade_calendar.py seed [trade_calendar.csv]")
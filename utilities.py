@@ -1,11 +1,34 @@
 import akshare as ak
+import numpy as np
 import pandas as pd
+import math
 import time
 import threading
 import datetime
+import traceback
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, Integer, REAL, Text
+from sqlalchemy import Column, Integer, REAL, Text, Index
+from sqlalchemy import types, select, inspect, text
 from retrying import retry
+import profiling
+
+# akshare日行情字段 -> marketData_daily字段
+MARKET_COLUMNS = {
+    '日期': 'tradeDate', '股票代码': 'ticker', '开盘': 'open', '收盘': 'close',
+    '最高': 'high', '最低': 'low', '成交量': 'volumn', '成交额': 'amount',
+    '振幅': 'amplitude', '涨跌幅': 'perf_percent', '涨跌额': 'perf_amount',
+    '换手率': 'turnover'
+}
+
+MARKET_DTYPE = {
+    'tradeDate': types.Text, 'ticker': types.Text, 'open': types.REAL,
+    'close': types.REAL, 'high': types.REAL, 'low': types.REAL,
+    'volumn': types.REAL, 'amount': types.REAL, 'amplitude': types.REAL,
+    'perf_percent': types.REAL, 'perf_amount': types.REAL,
+    'turnover': types.REAL,
+    'createtime': types.Text, 'updatetime': types.Text
+}
 
 
 def stock_markert(code):
@@ -22,21 +45,180 @@ def stock_markert(code):
         return 'bj'
 
 
-def update_marketdata_daily(start_date: str, end_date: str):
-    stock = ak.stock_zh_a_spot_em()[['代码', '名称']]
-    stock['market'] = stock['代码'].apply(lambda x: stock_markert(x))
-    stock = stock[stock['market'] != 'bj']
+def classify_market(codes):
+    """
+    向量化判断市场类型，与stock_markert一致
+    :param codes: pd.Series / list 股票代码
+    :return: np.ndarray of 'sz' / 'sh' / 'bj'
+    """
+    codes = pd.Series(codes, dtype=object).astype(str)
+    first = codes.str[0]
+    return np.select([first.isin(['3', '0']), first == '6'], ['sz', 'sh'], default='bj')
 
-    results = []
+
+def classify_quota(codes):
+    """
+    向量化判断涨跌停板类型：创业板、科创板为'radical'，其余为'normal'
+    :param codes: pd.Series / list 股票代码
+    :return: np.ndarray of 'radical' / 'normal'
+    """
+    codes = pd.Series(codes, dtype=object).astype(str)
+    return np.where((codes.str[0] == '3') | (codes.str[:3] == '688'), 'radical', 'normal')
+
+
+def _list_date(code):
+    """
+    :return: 上市日期"YYYY-MM-DD"，获取失败返回None
+    """
+    try:
+        info = ak.stock_individual_info_em(symbol=code, timeout=30)
+        value = str(info.loc[info['item'] == '上市时间', 'value'].iloc[0])
+        return pd.to_datetime(value, format='%Y%m%d').strftime('%Y-%m-%d')
+    except Exception:
+        return None
+
+
+def migrate_security_master(engine):
+    """
+    建表，旧版security_master补充list_date_checked字段（最近一次获取上市日期的时间）
+    """
+    Base.metadata.create_all(engine, tables=[SecurityMaster.__table__])
+    with engine.begin() as conn:
+        if 'list_date_checked' not in {c['name'] for c in inspect(conn).get_columns(SecurityMaster.__tablename__)}:
+            conn.execute(text("ALTER TABLE security_master ADD COLUMN list_date_checked TEXT"))
+
+
+def backfill_list_dates(engine, source=_list_date, workers=4, rate=5.0, retry_after=datetime.timedelta(days=7),
+                        progress=None):
+    """
+    多线程限速补充缺失的上市日期；获取失败的股票记录尝试时间，retry_after内不再重复请求
+    :param source: 获取函数 source(code) -> "YYYY-MM-DD"，失败返回None
+    :param rate: 每秒请求数上限（全部线程合计）
+    :param retry_after: 获取失败的股票再次尝试的间隔
+    :return: 补充的股票数
+    """
+    migrate_security_master(engine)
+    now = datetime.datetime.now()
+    with engine.connect() as conn:
+        missing = [r[0] for r in conn.exec_driver_sql(
+            "SELECT code FROM security_master WHERE list_date IS NULL AND delist_date IS NULL "
+            "AND (list_date_checked IS NULL OR list_date_checked < ?)",
+            ((now - retry_after).strftime('%Y-%m-%d %H:%M:%S'),)).fetchall()]
+    if len(missing) == 0:
+        return 0
+
+    _lock = threading.Lock()
+    _next = [time.monotonic()]
+
+    def _fetch(code):
+        # 各线程按1 / rate的间隔依次领取请求时刻
+        with _lock:
+            _wait = _next[0] - time.monotonic()
+            _next[0] = max(_next[0], time.monotonic()) + 1.0 / rate
+        if _wait > 0:
+            time.sleep(_wait)
+        return source(code)
+
+    dates = []
+    run_tasks(_fetch, missing, backend='thread', workers=workers, progress=progress,
+              on_result=lambda code, d: d is not None and dates.append((d, code)))
+    with engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE security_master SET list_date_checked = ? WHERE code = ?",
+                             [(now.strftime('%Y-%m-%d %H:%M:%S'), c) for c in missing])
+        if len(dates) > 0:
+            conn.exec_driver_sql("UPDATE security_master SET list_date = ? WHERE code = ?", dates)
+    return len(dates)
+
+
+def refresh_security_master(engine, spot=None, list_date=False):
+    """
+    增量刷新证券主表：新增股票写入、名称等变化覆盖、快照中消失的股票记录退市日期
+    :param engine: sqlalchemy engine
+    :param spot: pd.DataFrame(columns=['代码', '名称'])，默认取ak.stock_zh_a_spot_em()
+    :param list_date: 是否经backfill_list_dates补充缺失的上市日期；首次补充约需数千次请求，默认不补充
+    :return: 证券主表行数
+    """
+    if spot is None:
+        spot = ak.stock_zh_a_spot_em()
+    spot = spot[['代码', '名称']].drop_duplicates('代码')
+    now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    records = list(zip(spot['代码'].tolist(), spot['名称'].tolist(), classify_market(spot['代码']).tolist(),
+                       classify_quota(spot['代码']).tolist(), [now] * spot.shape[0], [now] * spot.shape[0]))
+    migrate_security_master(engine)
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO security_master (code, name, market, quota, delist_date, createtime, updatetime) "
+            "VALUES (?, ?, ?, ?, NULL, ?, ?) "
+            "ON CONFLICT (code) DO UPDATE SET name = excluded.name, market = excluded.market, "
+            "quota = excluded.quota, delist_date = NULL, updatetime = excluded.updatetime",
+            records
+        )
+        conn.exec_driver_sql(
+            "UPDATE security_master SET delist_date = ?, updatetime = ? WHERE updatetime < ? AND delist_date IS NULL",
+            (now[:10], now, now)
+        )
+
+    if list_date:
+        backfill_list_dates(engine)
+
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("SELECT COUNT(*) FROM security_master").scalar()
+
+
+def get_universe(engine, max_age=datetime.timedelta(days=1), include_bj=False, include_delisted=False,
+                 refresh=True):
+    """
+    从证券主表读取股票池，主表为空或超过max_age未刷新时先增量刷新
+    :param engine: sqlalchemy engine
+    :param refresh: 为False时只读本地主表，不访问网络
+    :return: pd.DataFrame(columns=['code', 'name', 'market', 'quota', 'list_date', 'delist_date'])
+    """
+    Base.metadata.create_all(engine, tables=[SecurityMaster.__table__])
+    with engine.connect() as conn:
+        last = conn.exec_driver_sql("SELECT MAX(updatetime) FROM security_master").scalar()
+    if refresh and (last is None or
+                    datetime.datetime.now() - datetime.datetime.strptime(last, '%Y-%m-%d %H:%M:%S') > max_age):
+        refresh_security_master(engine)
+
+    sql = "SELECT code, name, market, quota, list_date, delist_date FROM security_master WHERE 1 = 1"
+    if not include_bj:
+        sql += " AND market != 'bj'"
+    if not include_delisted:
+        sql += " AND delist_date IS NULL"
+    with engine.connect() as conn:
+        return pd.DataFrame(conn.exec_driver_sql(sql + " ORDER BY code").fetchall(),
+                            columns=['code', 'name', 'market', 'quota', 'list_date', 'delist_date'])
+
+
+def update_marketdata_daily(start_date: str, end_date: str, engine, batch_rows=50000, adjust='hfq'):
+    """
+    逐只股票下载日行情，按批次流式写入marketData_daily，中断后重新执行时跳过已提交的股票
+    :param start_date: "YYYYMMDD"
+    :param end_date: "YYYYMMDD"
+    :param engine: sqlalchemy engine
+    :param adjust: 'hfq' 下载后复权行情写入marketData_daily；'' 下载不复权行情写入marketData_raw，并同步复权因子
+    :return: 写入行数, 重试后仍失败的股票代码
+    """
+    if adjust not in ('hfq', ''):
+        raise ValueError(f"adjust只支持'hfq'或''：{adjust}")
+    stock = get_universe(engine)
+
+    if adjust == 'hfq':
+        writer = MarketWriter(engine, job=f"{start_date}-{end_date}", batch_rows=batch_rows)
+    else:
+        writer = MarketWriter(engine, job=f"{start_date}-{end_date}-raw", batch_rows=batch_rows,
+                              table=MarketRaw.__tablename__)
+    done = writer.completed()
     errorlist = []
     errorlist2 = []
 
     def _get_data(codelist, errorlist: list):
-        for i in stock['代码'].to_list():
+        for i in codelist:
             try:
                 _b = ak.stock_zh_a_hist(symbol=i, period='daily', start_date=start_date,
                                         end_date=end_date,
-                                        adjust='hfq', timeout=30)
+                                        adjust=adjust, timeout=30)
             except Exception as e:
                 print(e)
                 errorlist.append(i)
@@ -44,34 +226,431 @@ def update_marketdata_daily(start_date: str, end_date: str):
             if _b.empty:
                 continue
             else:
-                results.append(_b)
+                writer.write(format_marketdata(_b))
 
-    _get_data(stock['代码'].to_list(), errorlist)
+    _get_data([i for i in stock['code'].to_list() if i not in done], errorlist)
 
     if len(errorlist) > 0:
         time.sleep(10)
         _get_data(errorlist, errorlist2)
 
-    a = pd.concat(results)
-    a.reset_index(inplace=True, drop=True)
-    a = a.rename(columns={
-        '日期': 'tradeDate', '股票代码': 'ticker', '开盘': 'open', '收盘': 'close',
-        '最高': 'high', '最低': 'low', '成交量': 'volumn', '成交额': 'amount',
-        '振幅': 'amplitude', '涨跌幅': 'perf_percent', '涨跌额': 'perf_amount',
-        '换手率': 'turnover'
-    })
-    a['createtime'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    a['updatetime'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    return a, errorlist2
+    writer.flush()
+    if adjust == '':
+        # 除权除息只改写adj_factor中对应股票的因子行，不复权行情无需重新下载
+        _, errors = sync_factors(engine, stock['code'].to_list())
+        errorlist2 += [e['item'] for e in errors if e['item'] not in errorlist2]
+    return writer.rows, errorlist2
+
+
+def format_marketdata(price):
+    """
+    akshare日行情转换为marketData_daily字段，补充创建、更新时间
+    :param price: pd.DataFrame，ak.stock_zh_a_hist返回结果
+    :return: pd.DataFrame
+    """
+    price = price.rename(columns=MARKET_COLUMNS)
+    price['createtime'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    price['updatetime'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return price
+
+
+def migrate_marketdata(engine):
+    """
+    旧版stockwatcher.db迁移：删除(ticker, tradeDate)重复行（保留最新写入的一行），并建立唯一索引
+    :param engine: sqlalchemy engine
+    :return: 删除的重复行数，索引均已存在时返回0
+    """
+    _unique = {
+        Market.__tablename__: ('ux_marketdata_ticker_date', ('ticker', 'tradeDate')),
+        SyncProgress.__tablename__: ('ux_syncprogress_job_ticker', ('job', 'ticker')),
+    }
+    removed = 0
+    with engine.begin() as conn:
+        _inspector = inspect(conn)
+        for table, (name, columns) in _unique.items():
+            if not _inspector.has_table(table) or name in {i['name'] for i in _inspector.get_indexes(table)}:
+                continue
+            removed += conn.execute(text(
+                f"DELETE FROM {table} WHERE id NOT IN (SELECT MAX(id) FROM {table} GROUP BY {', '.join(columns)})"
+            )).rowcount
+            conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+    return removed
+
+
+# 涨停事件表收录的涨幅下限：检测器的涨停、涨幅阈值不低于该值时，可经事件表直接定位候选窗口
+EVENT_FLOOR = 9.5
+
+
+def limitup_records(price, floor=EVENT_FLOOR):
+    """
+    :param price: 行情pd.DataFrame，含ticker、tradeDate（"YYYY-MM-DD"）、perf_percent
+    :return: list of tuple(ticker, tradeDate yyyymmdd, quota, perf_percent)，涨幅超过floor的K线
+    """
+    event = price[price['perf_percent'] > floor]
+    if event.empty:
+        return []
+    dates = event['tradeDate'].astype(str).str[:10].str.replace('-', '', regex=False).astype(int)
+    return list(zip(event['ticker'].tolist(), dates.tolist(), classify_quota(event['ticker']).tolist(),
+                    event['perf_percent'].tolist()))
+
+
+def rebuild_limitup_events(engine, batch_rows=200000):
+    """
+    按marketData_daily全量重建limitup_events，用于建表后的回填及绕过MarketWriter直接写入行情之后
+    :return: 事件数
+    """
+    Base.metadata.create_all(engine, tables=[LimitUpEvent.__table__])
+    events = 0
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM limitup_events"))
+        result = conn.execute(text("SELECT ticker, tradeDate, perf_percent FROM marketData_daily "
+                                   "WHERE perf_percent > :floor"), {'floor': EVENT_FLOOR})
+        while True:
+            rows = result.fetchmany(batch_rows)
+            if not rows:
+                break
+            records = limitup_records(pd.DataFrame(rows, columns=['ticker', 'tradeDate', 'perf_percent']))
+            conn.exec_driver_sql("INSERT INTO limitup_events (ticker, tradeDate, quota, perf_percent) "
+                                 "VALUES (?, ?, ?, ?)", records)
+            events += len(records)
+    return events
+
+
+def migrate_limitup_events(engine):
+    """
+    limitup_events不存在时建表并按已有行情回填；此后由MarketWriter随行情写入同步维护
+    :return: 回填的事件数，表已存在时返回0
+    """
+    if inspect(engine).has_table(LimitUpEvent.__tablename__):
+        return 0
+    return rebuild_limitup_events(engine)
+
+
+def upsert_factors(engine, factors):
+    """
+    写入复权因子：与库内不一致的股票整体替换其因子行，一致的股票不写入；不涉及行情数据
+    :param factors: pd.DataFrame(columns=['ticker', 'tradeDate', 'factor'])，tradeDate为整数yyyymmdd
+    :return: 因子发生变化的股票数
+    """
+    Base.metadata.create_all(engine, tables=[AdjFactor.__table__])
+    if factors.empty:
+        return 0
+    factors = factors.sort_values(['ticker', 'tradeDate'])
+    codes = factors['ticker'].unique().tolist()
+    with engine.connect() as conn:
+        stored = pd.DataFrame(conn.execute(
+            select(AdjFactor.ticker, AdjFactor.tradeDate, AdjFactor.factor)
+            .where(AdjFactor.ticker.in_(codes)).order_by(AdjFactor.ticker, AdjFactor.tradeDate)
+        ).fetchall(), columns=['ticker', 'tradeDate', 'factor'])
+    _stored = {t: list(zip(g['tradeDate'].tolist(), g['factor'].tolist())) for t, g in stored.groupby('ticker')}
+    now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    changed = []
+    for code, group in factors.groupby('ticker', sort=False):
+        rows = list(zip(group['tradeDate'].astype(int).tolist(), group['factor'].astype(float).tolist()))
+        if _stored.get(code) != rows:
+            changed.append((code, rows))
+    if len(changed) == 0:
+        return 0
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM adj_factor WHERE ticker = ?", [(code,) for code, _ in changed])
+        conn.exec_driver_sql("INSERT INTO adj_factor (ticker, tradeDate, factor, updatetime) VALUES (?, ?, ?, ?)",
+                             [(code, d, f, now) for code, rows in changed for d, f in rows])
+    return len(changed)
+
+
+RESULT_COLUMNS = ['version', 'ticker', 'trigger_date', 'signal', 'metric']
+
+
+def migrate_golden_results(engine):
+    """
+    旧版golden_results迁移：补充trigger_date、metric字段，删除(version, ticker, signal)重复行（保留最新写入的一行），
+    并建立唯一索引
+    :return: 删除的重复行数
+    """
+    Base.metadata.create_all(engine, tables=[GoldenResults.__table__])
+    removed = 0
+    with engine.begin() as conn:
+        _inspector = inspect(conn)
+        _columns = {c['name'] for c in _inspector.get_columns(GoldenResults.__tablename__)}
+        for name, kind in (('trigger_date', 'TEXT'), ('metric', 'REAL')):
+            if name not in _columns:
+                conn.execute(text(f"ALTER TABLE golden_results ADD COLUMN {name} {kind}"))
+        if 'ux_goldenresults_version_ticker_signal' not in \
+                {i['name'] for i in _inspector.get_indexes(GoldenResults.__tablename__)}:
+            removed = conn.execute(text(
+                "DELETE FROM golden_results WHERE id NOT IN "
+                "(SELECT MAX(id) FROM golden_results GROUP BY version, ticker, signal)"
+            )).rowcount
+            conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ux_goldenresults_version_ticker_signal "
+                              "ON golden_results (version, ticker, signal)"))
+    return removed
+
+
+def upsert_results(conn, version, results):
+    """
+    在调用方事务内批量写入识别结果，按(version, ticker, signal)覆盖trigger_date、metric，保留首次创建时间
+    :param conn: sqlalchemy Connection，如engine.begin()返回的连接
+    :param results: pd.DataFrame / list of dict / dict of list，含ticker、signal，可选trigger_date、metric；
+                    日期为datetime.date或"YYYY-MM-DD"
+    :return: 写入行数
+    """
+    frame = results if isinstance(results, pd.DataFrame) else pd.DataFrame(results)
+    if frame.empty:
+        return 0
+    frame = frame.reindex(columns=['ticker', 'trigger_date', 'signal', 'metric'])
+    for c in ('trigger_date', 'signal'):
+        frame[c] = [None if pd.isna(d) else str(d)[:10] for d in frame[c].tolist()]
+    metric = [None if pd.isna(m) else float(m) for m in frame['metric'].tolist()]
+    now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    conn.exec_driver_sql(
+        "INSERT INTO golden_results (version, ticker, trigger_date, signal, metric, createtime, updatetime) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (version, ticker, signal) DO UPDATE SET "
+        "trigger_date = excluded.trigger_date, metric = excluded.metric, updatetime = excluded.updatetime",
+        list(zip([version] * frame.shape[0], frame['ticker'].tolist(), frame['trigger_date'], frame['signal'],
+                 metric, [now] * frame.shape[0], [now] * frame.shape[0]))
+    )
+    return frame.shape[0]
+
+
+class ResultWriter:
+    """
+    识别结果批量写入golden_results：缓存至batch_rows行后在单个事务内写入，按(version, ticker, signal)去重
+    :param engine: sqlalchemy engine
+    :param version: 参数版本或策略标识，如golden_version中的版本号、"convergence"
+    :param batch_rows: 每个事务写入的行数上限
+    """
+
+    def __init__(self, engine, version, batch_rows=10000):
+        self.engine = engine
+        self.version = version
+        self.batch_rows = batch_rows
+        self.rows = 0
+        self._buffer = []
+        self._buffer_rows = 0
+        self._lock = threading.Lock()
+        migrate_golden_results(engine)
+
+    def write(self, results):
+        """
+        :param results: 同upsert_results，如goldenFilterThreads的输出、golden.convergence_records的输出
+        """
+        frame = results if isinstance(results, pd.DataFrame) else pd.DataFrame(results)
+        if frame.empty:
+            return
+        with self._lock:
+            self._buffer.append(frame)
+            self._buffer_rows += frame.shape[0]
+            if self._buffer_rows >= self.batch_rows:
+                self._commit()
+
+    def flush(self):
+        with self._lock:
+            self._commit()
+
+    def _commit(self):
+        if self._buffer_rows == 0:
+            return
+        with self.engine.begin() as conn:
+            self.rows += upsert_results(conn, self.version, pd.concat(self._buffer, ignore_index=True))
+        self._buffer = []
+        self._buffer_rows = 0
+
+
+def load_results(engine, version=None, start_date=None, end_date=None, tickers=None):
+    """
+    查询识别结果，一次返回完整DataFrame
+    :param version: 版本号或版本号列表，为None时返回全部版本
+    :param start_date: 信号日下限 "YYYY-MM-DD"
+    :param end_date: 信号日上限 "YYYY-MM-DD"
+    :param tickers: 股票代码列表
+    :return: pd.DataFrame(columns=['version', 'ticker', 'trigger_date', 'signal', 'metric'])，按版本、股票、信号日排序
+    """
+    migrate_golden_results(engine)
+    query = select(*[GoldenResults.__table__.c[c] for c in RESULT_COLUMNS])
+    if version is not None:
+        query = query.where(GoldenResults.version.in_([version] if isinstance(version, str) else list(version)))
+    if start_date is not None:
+        query = query.where(GoldenResults.signal >= str(start_date)[:10])
+    if end_date is not None:
+        query = query.where(GoldenResults.signal <= str(end_date)[:10])
+    if tickers is not None:
+        query = query.where(GoldenResults.ticker.in_(list(tickers)))
+    query = query.order_by(GoldenResults.version, GoldenResults.ticker, GoldenResults.signal)
+    with engine.connect() as conn:
+        return pd.read_sql(query, conn)
+
+
+class MarketWriter:
+    """
+    行情流式写入：缓存至batch_rows行后在单个事务内批量写入marketData_daily，
+    同时记录本批次已完成的股票至sync_progress，同步中断后可据此续传
+    同一事务内维护limitup_events（仅marketData_daily）：先删除本批次各股票日期区间内的旧事件，再写入涨幅超过EVENT_FLOOR的K线
+    已存在的(ticker, tradeDate)行情按最新下载结果覆盖，重复同步不会产生重复行；
+    同一批次内重复的(ticker, tradeDate)（如重试、HistCache回写）只保留最后写入的一行
+    :param engine: sqlalchemy engine
+    :param job: 同步任务标识，如"20241201-20241213"；为None时不记录进度
+    :param batch_rows: 每个事务写入的行数上限
+    :param table: 'marketData_daily'（后复权下载）或'marketData_raw'（不复权，另经upsert_factors写入复权因子）
+    """
+
+    def __init__(self, engine, job=None, batch_rows=50000, table=None):
+        self.engine = engine
+        self.job = job
+        self.batch_rows = batch_rows
+        self.table = Market.__tablename__ if table is None else table
+        self.rows = 0
+        self._buffer = []
+        self._buffer_rows = 0
+        self._columns = list(MARKET_DTYPE.keys())
+        # 按(ticker, tradeDate)幂等写入：重复同步时覆盖行情字段，保留首次创建时间
+        _update = [c for c in self._columns if c not in ('ticker', 'tradeDate', 'createtime')]
+        self._upsert = (
+            f"INSERT INTO {self.table} ({', '.join(self._columns)}) "
+            f"VALUES ({', '.join(['?'] * len(self._columns))}) "
+            f"ON CONFLICT (ticker, tradeDate) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in _update)}"
+        )
+        self._lock = threading.Lock()
+        Base.metadata.create_all(engine, tables=[Market.__table__, MarketRaw.__table__, SyncProgress.__table__])
+        migrate_marketdata(engine)
+        migrate_limitup_events(engine)
+        self._events = self.table == Market.__tablename__
+        # 已转换为整数交易日存储时，后复权行情同步写入marketData_daily_int
+        self._typed = self._events and inspect(engine).has_table(MarketTyped.__tablename__)
+        _typed_columns = [c for c in self._columns if c not in ('createtime', 'updatetime')]
+        self._typed_index = [self._columns.index(c) for c in _typed_columns]
+        self._typed_upsert = (
+            f"INSERT INTO marketData_daily_int ({', '.join(_typed_columns)}) "
+            f"VALUES ({', '.join(['?'] * len(_typed_columns))}) "
+            f"ON CONFLICT (ticker, tradeDate) DO UPDATE SET "
+            f"{', '.join(f'{c} = excluded.{c}' for c in _typed_columns if c not in ('ticker', 'tradeDate'))}"
+        )
+
+    def completed(self):
+        """
+        :return: 当前任务已提交的股票代码集合
+        """
+        if self.job is None:
+            return set()
+        with self.engine.connect() as conn:
+            rows = conn.execute(select(SyncProgress.ticker).where(SyncProgress.job == self.job)).fetchall()
+        return {r[0] for r in rows}
+
+    def write(self, price):
+        """
+        :param price: pd.DataFrame，format_marketdata处理后的行情，单只股票的行情需在同一次调用中写入
+        """
+        if price.empty:
+            return
+        with self._lock:
+            self._buffer.append(price)
+            self._buffer_rows += price.shape[0]
+            if self._buffer_rows >= self.batch_rows:
+                self._commit()
+
+    def flush(self):
+        with self._lock:
+            self._commit()
+
+    def _commit(self):
+        if self._buffer_rows == 0:
+            return
+        with profiling.stage('marketwriter.commit'):
+            self._write()
+        profiling.count('marketwriter.rows', self._buffer_rows)
+        self._buffer = []
+        self._buffer_rows = 0
+
+    def _write(self):
+        price = pd.concat(self._buffer, ignore_index=True)
+        price['tradeDate'] = price['tradeDate'].astype(str)
+        _date = price['tradeDate'].str[:10].str.replace('-', '', regex=False).astype(int)
+        # 同一批次内重复的股票日期只保留最后一行，避免limitup_events唯一索引冲突使整批回滚
+        _last = ~pd.DataFrame({'ticker': price['ticker'], '_date': _date}).duplicated(keep='last')
+        price, _date = price[_last].reset_index(drop=True), _date[_last].reset_index(drop=True)
+        records = list(zip(*[price[c].tolist() for c in self._columns]))
+        now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        progress = [(self.job, t, n, now) for t, n in price.groupby('ticker', sort=False).size().items()]
+        _span = _date.groupby(price['ticker'], sort=False).agg(['min', 'max'])
+        events = limitup_records(price)
+
+        conn = self.engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.executemany(self._upsert, records)
+            if self._typed:
+                _date = self._columns.index('tradeDate')
+                cursor.executemany(self._typed_upsert, [
+                    tuple(int(r[i][:10].replace('-', '')) if i == _date else r[i] for i in self._typed_index)
+                    for r in records
+                ])
+            if self._events:
+                cursor.executemany("DELETE FROM limitup_events WHERE ticker = ? AND ? <= tradeDate AND tradeDate <= ?",
+                                   list(zip(_span.index.tolist(), _span['min'].tolist(), _span['max'].tolist())))
+                cursor.executemany("INSERT INTO limitup_events (ticker, tradeDate, quota, perf_percent) "
+                                   "VALUES (?, ?, ?, ?) ON CONFLICT (ticker, tradeDate) DO UPDATE SET "
+                                   "quota = excluded.quota, perf_percent = excluded.perf_percent", events)
+            if self.job is not None:
+                cursor.executemany(
+                    "INSERT INTO sync_progress (job, ticker, rows, createtime) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (job, ticker) DO UPDATE SET rows = excluded.rows, createtime = excluded.createtime",
+                    progress
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        self.rows += price.shape[0]
 
 
 @retry(stop_max_attempt_number=3, wait_fixed=3000)
-def get_price(code, start_date: str, end_date: str):
+def get_price(code, start_date: str, end_date: str, adjust='hfq'):
     _b = ak.stock_zh_a_hist(symbol=code, period='daily', start_date=start_date,
-                            end_date=end_date, adjust='hfq', timeout=30)
+                            end_date=end_date, adjust=adjust, timeout=30)
     return _b
 
 
+@retry(stop_max_attempt_number=3, wait_fixed=3000)
+def get_factors(code):
+    """
+    新浪后复权因子，每个因子自其日期起生效
+    :return: pd.DataFrame(columns=['ticker', 'tradeDate', 'factor'])，tradeDate为整数yyyymmdd，按日期升序
+    """
+    _f = ak.stock_zh_a_daily(symbol=stock_markert(code) + code, adjust='hfq-factor')
+    return pd.DataFrame({
+        'ticker': code,
+        'tradeDate': pd.to_datetime(_f['date']).dt.strftime('%Y%m%d').astype(int),
+        'factor': _f['hfq_factor'].astype(float),
+    }).sort_values('tradeDate', ignore_index=True)
+
+
+def sync_factors(engine, codes, source=get_factors, workers=8, batch_size=200, progress=None):
+    """
+    多线程下载复权因子，每batch_size只股票经upsert_factors写入一次；因子未变化的股票不写入
+    :param source: 下载函数 source(code) -> pd.DataFrame(columns=['ticker', 'tradeDate', 'factor'])
+    :return: changed: 因子发生变化的股票数, errors: list of dict('item', 'error', 'traceback')
+    """
+    pending = []
+    state = {'changed': 0}
+
+    def _flush():
+        if len(pending) > 0:
+            state['changed'] += upsert_factors(engine, pd.concat(pending, ignore_index=True))
+            pending.clear()
+
+    def _on_result(code, factors):
+        if factors is not None and not factors.empty:
+            pending.append(factors)
+        if len(pending) >= batch_size:
+            _flush()
+
+    _, errors = run_tasks(source, codes, backend='thread', workers=workers, progress=progress,
+                          on_result=_on_result)
+    _flush()
+    return state['changed'], errors
+
+
 class MyThread(threading.Thread):
     def __init__(self, func, args=()):
         super(MyThread, self).__init__()
@@ -89,6 +668,90 @@ class MyThread(threading.Thread):
             return None
 
 
+def _run_chunk(func, chunk):
+    """
+    在工作线程/进程中逐个执行任务，单个任务异常记录为结构化错误，不中断整个分片
+    :return: list of tuple(item, ok, result / error)
+    """
+    _results = []
+    for item in chunk:
+        try:
+            _results.append((item, True, func(item)))
+        except Exception as e:
+            _results.append((item, False, {'item': item, 'error': repr(e), 'traceback': traceback.format_exc()}))
+    return _results
+
+
+def run_tasks(func, items, backend='thread', workers=20, chunksize=None, initializer=None, progress=None,
+              on_result=None):
+    """
+    可插拔执行器：按分片将任务分配至线程池/进程池/串行执行
+    :param func: 单个任务函数 func(item)，进程模式下需可被pickle（模块级函数或functools.partial）
+    :param items: 任务列表，如股票代码
+    :param backend: 'thread' / 'process' / 'serial'
+    :param workers: 工作线程/进程数量
+    :param chunksize: 每个分片的任务数，默认按workers * 4均分
+    :param initializer: 工作进程初始化函数，如为每个进程重建数据库连接
+    :param progress: 进度回调 progress(done, total)，始终在调用线程中执行，可直接更新streamlit进度条
+    :param on_result: 单个任务成功回调 on_result(item, result)，分片完成后在调用线程中执行，可用于逐批落库
+    :return: results: 与items顺序一致的成功结果列表, errors: list of dict('item', 'error', 'traceback')
+    """
+    items = list(items)
+    total = len(items)
+    if total == 0:
+        return [], []
+    workers = max(int(workers), 1)
+    if chunksize is None:
+        chunksize = math.ceil(total / (workers * 4))
+    chunksize = max(int(chunksize), 1)
+    chunks = [items[i: i + chunksize] for i in range(0, total, chunksize)]
+
+    done = 0
+    outputs = [None] * len(chunks)
+
+    def _collect(n):
+        if on_result is not None:
+            for item, ok, value in outputs[n]:
+                if ok:
+                    on_result(item, value)
+
+    if backend == 'serial':
+        if initializer is not None:
+            initializer()
+        for n, chunk in enumerate(chunks):
+            outputs[n] = _run_chunk(func, chunk)
+            _collect(n)
+            done += len(chunk)
+            if progress is not None:
+                progress(done, total)
+    else:
+        if backend == 'thread':
+            pool = ThreadPoolExecutor(max_workers=workers)
+        elif backend == 'process':
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=initializer)
+        else:
+            raise ValueError(f"不支持的执行模式：{backend}")
+        with pool:
+            futures = {pool.submit(_run_chunk, func, chunk): n for n, chunk in enumerate(chunks)}
+            for future in as_completed(futures):
+                n = futures[future]
+                outputs[n] = future.result()
+                _collect(n)
+                done += len(chunks[n])
+                if progress is not None:
+                    progress(done, total)
+
+    results = []
+    errors = []
+    for output in outputs:
+        for item, ok, value in output:
+            if ok:
+                results.append(value)
+            else:
+                errors.append(value)
+    return results, errors
+
+
 """
     创建ORM映射对象
 """
@@ -97,6 +760,9 @@ Base = declarative_base()
 
 class Market(Base):
     __tablename__ = 'marketData_daily'
+    __table_args__ = (
+        Index('ux_marketdata_ticker_date', 'ticker', 'tradeDate', unique=True),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     tradeDate = Column(Text)
     ticker = Column(Text)
@@ -117,6 +783,98 @@ class Market(Base):
         return "<Market(name=marketData_daily, comment=记录全A日行情数据)>"
 
 
+class MarketRaw(Base):
+    """
+    不复权日行情，字段同marketData_daily；复权价格由adj_factor在读取时计算
+    """
+    __tablename__ = 'marketData_raw'
+    __table_args__ = (
+        Index('ux_marketdataraw_ticker_date', 'ticker', 'tradeDate', unique=True),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    tradeDate = Column(Text)
+    ticker = Column(Text)
+    open = Column(REAL)
+    close = Column(REAL)
+    high = Column(REAL)
+    low = Column(REAL)
+    amount = Column(REAL)
+    amplitude = Column(REAL)
+    perf_percent = Column(REAL)
+    perf_amount = Column(REAL)
+    createtime = Column(Text)
+    updatetime = Column(Text)
+    volumn = Column(REAL)
+    turnover = Column(REAL)
+
+    def __repr__(self):
+        return "<MarketRaw(name=marketData_raw, comment=记录全A不复权日行情数据)>"
+
+
+class AdjFactor(Base):
+    """
+    后复权因子：自tradeDate（整数yyyymmdd）起生效，后复权价 = 不复权价 * factor，
+    前复权价 = 不复权价 * factor / 最新factor；除权除息只改写该股票的因子行
+    """
+    __tablename__ = 'adj_factor'
+    __table_args__ = (
+        Index('ux_adjfactor_ticker_date', 'ticker', 'tradeDate', unique=True),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ticker = Column(Text)
+    tradeDate = Column(Integer)
+    factor = Column(REAL)
+    updatetime = Column(Text)
+
+    def __repr__(self):
+        return "<AdjFactor(name=adj_factor, comment=后复权因子)>"
+
+
+class LimitUpEvent(Base):
+    """
+    涨停事件：涨幅超过EVENT_FLOOR的K线，交易日为整数yyyymmdd，quota为涨跌停板类型
+    """
+    __tablename__ = 'limitup_events'
+    __table_args__ = (
+        Index('ux_limitupevents_ticker_date', 'ticker', 'tradeDate', unique=True),
+        Index('ix_limitupevents_date', 'tradeDate'),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ticker = Column(Text)
+    tradeDate = Column(Integer)
+    quota = Column(Text)
+    perf_percent = Column(REAL)
+
+    def __repr__(self):
+        return "<LimitUpEvent(name=limitup_events, comment=涨停事件索引)>"
+
+
+class MarketTyped(Base):
+    """
+    marketData_daily的紧凑存储：交易日存为整数yyyymmdd，不含审计字段
+    """
+    __tablename__ = 'marketData_daily_int'
+    __table_args__ = (
+        Index('ux_marketdataint_ticker_date', 'ticker', 'tradeDate', unique=True),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    tradeDate = Column(Integer)
+    ticker = Column(Text)
+    open = Column(REAL)
+    close = Column(REAL)
+    high = Column(REAL)
+    low = Column(REAL)
+    amount = Column(REAL)
+    amplitude = Column(REAL)
+    perf_percent = Column(REAL)
+    perf_amount = Column(REAL)
+    volumn = Column(REAL)
+    turnover = Column(REAL)
+
+    def __repr__(self):
+        return "<Market(name=marketData_daily_int, comment=记录全A日行情数据，整数交易日)>"
+
+
 class GoldenVersion(Base):
     __tablename__ = 'golden_version'
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -141,12 +899,67 @@ class GoldenVersion(Base):
 
 class GoldenResults(Base):
     __tablename__ = 'golden_results'
+    __table_args__ = (
+        Index('ux_goldenresults_version_ticker_signal', 'version', 'ticker', 'signal', unique=True),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     ticker = Column(Text)
     signal = Column(Text)
     version = Column(Text)
+    trigger_date = Column(Text)
+    metric = Column(REAL)
     createtime = Column(Text)
     updatetime = Column(Text)
 
     def __repr__(self):
         return "<Market(name=golden_results, comment=记录黄金台识别结果)>"
+
+
+class GoldenWatermark(Base):
+    """
+    增量识别水位：各参数版本、各股票已识别至的最新交易日（整数yyyymmdd）
+    """
+    __tablename__ = 'golden_watermark'
+    __table_args__ = (
+        Index('ux_goldenwatermark_version_ticker', 'version', 'ticker', unique=True),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    version = Column(Text)
+    ticker = Column(Text)
+    tradeDate = Column(Integer)
+    updatetime = Column(Text)
+
+    def __repr__(self):
+        return "<Market(name=golden_watermark, comment=记录黄金台增量识别水位)>"
+
+
+class SyncProgress(Base):
+    __tablename__ = 'sync_progress'
+    __table_args__ = (
+        Index('ux_syncprogress_job_ticker', 'job', 'ticker', unique=True),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job = Column(Text)
+    ticker = Column(Text)
+    rows = Column(Integer)
+    createtime = Column(Text)
+
+    def __repr__(self):
+        return "<Market(name=sync_progress, comment=记录行情同步已提交的股票)>"
+
+
+class SecurityMaster(Base):
+    __tablename__ = 'security_master'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    code = Column(Text, unique=True)
+    name = Column(Text)
+    market = Column(Text)
+    quota = Column(Text)
+    list_date = Column(Text)
+    list_date_checked = Column(Text)
+    delist_date = Column(Text)
+    createtime = Column(Text)
+    updatetime = Column(Text)
+
+    def __repr__(self):
+        return "<Market(name=security_master, comment=记录证券代码、市场及涨跌停板类型)>"